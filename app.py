@@ -2,30 +2,65 @@
 Moon Tasker - Flask Application
 HTMX + Static CSS based web application (Full Feature Version)
 """
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, g
+from flask import (Flask, render_template, request, jsonify, redirect, url_for, session, g, Response,
+                   stream_with_context, send_file, abort)
 from datetime import datetime, timedelta
+from functools import wraps
+from markupsafe import Markup
 import os
 import sys
 import json
+import asyncio
+import hashlib
+import hmac
+import mimetypes
+import time
+import threading
 import uuid
 
 # Add moon_tasker to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from moon_tasker.database import Database
-from moon_tasker.models import Task, Playlist, MoonCycle, LifestyleSettings
+from moon_tasker.models import Task, Playlist, MoonCycle, LifestyleSettings, TaskCompletion
 from moon_tasker.logic.creature_logic import CreatureSystem
 from moon_tasker.logic.moon_cycle import MoonCycleCalculator
 from moon_tasker.logic.badge_logic import BadgeSystem
-from moon_tasker.logic.schedule_ai import ScheduleOptimizer, GeneticScheduleOptimizer
+from moon_tasker.logic.schedule_ai import ScheduleOptimizer, GeneticScheduleOptimizer, AnnealingScheduleOptimizer
+from moon_tasker.logic.schedule_cache import ScheduleCache
+from moon_tasker.logic.fragment_cache import FragmentCache
+from moon_tasker.logic.static_assets import AssetManifest
+from moon_tasker.logic.session_store import DatabaseSessionInterface
+from moon_tasker.logic.timeline import DailyTimeline
+from moon_tasker.logic.cycle_planner import CyclePlanner, parse_date
+from moon_tasker.logic.event_bus import EventBus
+from moon_tasker.logic.broadcaster import Broadcaster, EventRelay, EventStream
+from moon_tasker.logic.timer_sessions import TimerSessionManager, TimerSessionError
+from moon_tasker.logic.metrics import metrics, instrument_database, stats_collector
 
 app = Flask(__name__, 
             template_folder='templates',
             static_folder='static')
 app.secret_key = os.environ.get('SECRET_KEY', 'moon-tasker-secret-key-2024')
+# セッションの中身はDBに置き、CookieにはIDだけ（secret_keyは以前のCookieの引き継ぎに使う）
+app.session_interface = DatabaseSessionInterface(lambda: Database(),
+                                                 skip_prefixes=('/static/', '/assets/', '/metrics'))
 
 # グローバルインスタンス（guest_id不要なもの）
 moon_calc = MoonCycleCalculator()
+schedule_cache = ScheduleCache(max_entries=256)
+fragment_cache = FragmentCache(max_bytes=8 * 1024 * 1024)
+asset_manifest = AssetManifest.load(app.static_folder)  # 未ビルドなら空（通常の /static/ を使う）
+event_bus = EventBus()
+timer_sessions = TimerSessionManager(lambda: Database(), event_bus)
+broadcaster = Broadcaster(max_queue=100)
+event_relay = EventRelay(broadcaster, lambda: Database())  # DB経由でどのワーカーの購読者にも配る
+
+# 計測（/metrics）: DBのメソッドごとの時間・接続数・SQL文の数と、キャッシュ・配信の統計
+instrument_database(Database)
+metrics.add_collector(stats_collector('fragment_cache', fragment_cache.get_stats))
+metrics.add_collector(stats_collector('schedule_cache', schedule_cache.get_stats))
+metrics.add_collector(stats_collector('broadcaster', broadcaster.get_stats))
 
 
 def get_guest_id():
@@ -42,7 +77,7 @@ def get_guest_id():
 def get_db():
     """リクエストごとのDatabaseインスタンスを取得"""
     if 'db' not in g:
-        g.db = Database(guest_id=get_guest_id())
+        g.db = Database(guest_id=get_guest_id(), memoize=True)
     return g.db
 
 
@@ -79,26 +114,446 @@ def get_creature_context(creature):
         'creature': creature,
         'emotion': emotion,
         'warning': warning,
-        'creature_image': f'/static/images/creature/{image_filename}'
+        'creature_image': asset_url('static', filename=f'images/creature/{image_filename}')
     }
 
 
+def get_timer_owner():
+    """タイマーセッションの所有者キー（ログインユーザー / ゲスト）"""
+    user_id = session.get('user_id')
+    if user_id:
+        return f"user:{user_id}"
+    return f"guest:{get_guest_id()}"
+
+
+# ===== 静的ファイル（ハッシュ付きのURL・事前圧縮） =====
+
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+
+def asset_url(endpoint, **values):
+    """
+    url_for と同じ引数で、ビルド済みの静的ファイルはハッシュ付きのURLを返す
+    
+        asset_url('static', filename='css/style.css') -> /assets/css/style.1a2b3c4d5e.css
+    
+    未ビルド・ビルド対象外のファイルは url_for の結果をそのまま返す。
+    """
+    if endpoint == 'static' and 'filename' in values:
+        output = asset_manifest.lookup(values['filename'])
+        if output:
+            values = dict(values, filename=output)
+            return url_for('assets', **values)
+    return url_for(endpoint, **values)
+
+
+app.jinja_env.globals['asset_url'] = asset_url
+
+
+@app.route('/assets/<path:filename>')
+def assets(filename):
+    """ハッシュ付きの静的ファイル（中身が変わればURLも変わるので1年キャッシュ）"""
+    chosen = asset_manifest.resolve(filename,
+                                    request.headers.get('Accept', ''),
+                                    request.headers.get('Accept-Encoding', ''))
+    if chosen is None:
+        abort(404)
+    response = send_file(chosen['path'],
+                         mimetype=chosen['mimetype'] or mimetypes.guess_type(filename)[0],
+                         max_age=ASSET_MAX_AGE)
+    if chosen['encoding']:
+        response.headers['Content-Encoding'] = chosen['encoding']
+    response.vary.update(chosen['vary'])
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    return response
+
+
+# ===== 冪等キー（再送されたPOSTを二重に処理しない） =====
+
+IDEMPOTENCY_TTL_SECONDS = 24 * 3600
+IDEMPOTENCY_PURGE_INTERVAL = 600  # 期限切れキーの掃除間隔（秒）
+IDEMPOTENCY_PENDING_TIMEOUT = 60  # 処理中のまま応答が保存されない予約を取り直せるまでの秒数
+IDEMPOTENCY_REPLAYED_HEADERS = ('Location', 'Content-Type', 'HX-Redirect', 'HX-Trigger')
+idempotency_state = {'last_purge': 0.0}
+
+# フォームに埋め込む冪等キー（描画ごとに新しいキー、同じフォームの再送では同じキー）
+app.jinja_env.globals['new_idempotency_key'] = lambda: uuid.uuid4().hex
+
+
+def get_idempotency_key():
+    """Idempotency-Key ヘッダー、またはフォームの idempotency_key"""
+    key = request.headers.get('Idempotency-Key') or request.form.get('idempotency_key')
+    if key and key.strip():
+        return key.strip()[:128]
+    return None
+
+
+def idempotent(view):
+    """
+    冪等キー付きのPOSTを1回だけ処理するデコレータ
+    
+    初回はキーを予約してハンドラを実行し、成功したレスポンス（2xx/3xx）を保存する。
+    同じキーの再送にはハンドラを呼ばずに保存済みのレスポンスを返す。
+    キーがなければ従来どおり処理する。
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = get_idempotency_key()
+        if not key:
+            return view(*args, **kwargs)
+        
+        db = get_db()
+        owner = get_timer_owner()
+        now = time.time()
+        if now - idempotency_state['last_purge'] > IDEMPOTENCY_PURGE_INTERVAL:
+            idempotency_state['last_purge'] = now
+            db.purge_idempotency_keys(now - IDEMPOTENCY_TTL_SECONDS)
+        
+        if not db.reserve_idempotency_key(owner, key, request.path, now,
+                                          stale_before=now - IDEMPOTENCY_PENDING_TIMEOUT):
+            stored = db.get_idempotent_response(owner, key)
+            if stored is None:
+                # 直前に予約が取り消された
+                return view(*args, **kwargs)
+            if stored['route'] != request.path:
+                return jsonify({'success': False, 'error': 'この冪等キーは別の操作で使われています'}), 422
+            if stored['status_code'] is None:
+                return (jsonify({'success': False, 'error': '同じリクエストを処理中です'}), 409,
+                        {'Retry-After': str(IDEMPOTENCY_PENDING_TIMEOUT)})
+            response = Response(stored['body'], status=stored['status_code'],
+                                headers=json.loads(stored['headers'] or '{}'))
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except Exception:
+            db.release_idempotency_key(owner, key)
+            raise
+        
+        if response.status_code < 400:
+            headers = {k: v for k, v in response.headers.items() if k in IDEMPOTENCY_REPLAYED_HEADERS}
+            db.save_idempotent_response(owner, key, response.status_code,
+                                        json.dumps(headers), response.get_data())
+        else:
+            # エラー（まだ早い・一時的な失敗など）は同じキーで再試行できるようにする
+            db.release_idempotency_key(owner, key)
+        return response
+    return wrapper
+
+
+
+# ===== 条件付きGET（データが変わっていなければ304） =====
+
+def get_build_stamp():
+    """テンプレート・app.py・静的ファイルのmanifestの最終更新時刻（デプロイでETagが変わるように）"""
+    paths = [os.path.abspath(__file__)]
+    manifest_path = os.path.join(asset_manifest.dist_dir, 'manifest.json')
+    if os.path.exists(manifest_path):
+        paths.append(manifest_path)
+    for root, _, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+        paths.extend(os.path.join(root, name) for name in files)
+    return format(int(max(os.path.getmtime(path) for path in paths)), 'x')
+
+
+BUILD_STAMP = get_build_stamp()
+
+
+def get_data_version():
+    """このリクエストで見ているデータ版数（このリクエストで書き込んだら読み直す）"""
+    db = get_db()
+    cached = g.get('data_version')
+    if cached is None or cached[0] != db.write_count:
+        g.data_version = (db.write_count, db.get_data_version())
+    return g.data_version[1]
+
+
+def get_fragment_scope():
+    """ゲストごとの断片キャッシュのスコープ（所有者とデータ版数）"""
+    version = get_data_version()
+    return [get_timer_owner(), version['version'], version['shared_version']]
+
+
+def cached_fragment(name, *args, shared=False, enabled=True, caller=None):
+    """
+    テンプレートの一部をキャッシュする（Jinjaのcallブロック用）
+    
+        {% call cached_fragment('badge_grid') %}...{% endcall %}
+    
+    shared=True は全ゲスト共有（argsだけで中身が決まる断片）。
+    enabled=False ならキャッシュせずに描画する（ログイン中のクラウドデータなど）。
+    """
+    if not enabled:
+        return caller()
+    scope = None if shared else get_fragment_scope()
+    return Markup(fragment_cache.get_or_render(name, args, caller, scope))
+
+
+app.jinja_env.globals['cached_fragment'] = cached_fragment
+
+
+def conditional(period=3600, cloud=False):
+    """
+    ゲストのデータ版数からETag/Last-Modifiedを付け、変わっていなければ304を返すデコレータ
+    
+    版数はDatabaseの書き込みのたびに増えるので、304はデータを読む前に返せる。
+    月齢や時刻の表示はperiod秒ごとに変わるものとしてETagに含める。
+    cloud=True の画面はログイン中はSupabaseのデータなので対象外。
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # 1回だけ表示するメッセージが残っていれば必ず描画する
+            if (cloud and session.get('user_id')) or session.get('new_badges'):
+                return view(*args, **kwargs)
+            
+            def validators():
+                version = get_data_version()
+                bucket = int(time.time() // period)
+                source = (f"{get_timer_owner()}:{version['version']}:{version['shared_version']}:"
+                          f"{bucket}:{BUILD_STAMP}")
+                etag = hashlib.sha1(source.encode()).hexdigest()[:20]
+                return etag, datetime.utcfromtimestamp(max(version['updated_at'], bucket * period))
+            
+            etag, last_modified = validators()
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = (request.if_modified_since is not None and
+                                last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None))
+            if not_modified:
+                response = Response(status=304)
+            else:
+                writes = get_db().write_count
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                if get_db().write_count != writes:
+                    # 描画中の書き込み（放置チェック・計画の保存など）を反映した版数にする
+                    etag, last_modified = validators()
+            
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
+
+def record_task_completion(db, creature_system, badge_system, task_id, duration, user_id=None,
+                           timer_credit=None):
+    """
+    タスク完了を記録し、獲得したバッジ・進化・プレゼントを返す
+    
+    timer_credit=(タイマーセッションID, 位置) があれば記録権の取得と完了の記録を同時に行い、
+    記録済み（クライアントとサーバーの両方から報告された）ならNoneを返す。
+    アクティブなサイクルのタスクなら、サイクルの進捗も同じトランザクションで進める。
+    """
+    completed = db.complete_task(task_id, timer_credit=timer_credit)
+    if completed is None:
+        return None
+    if task_id and task_id > 0:
+        schedule_cache.invalidate_task(task_id)
+    
+    creature_system.on_task_completed(duration)
+    
+    # バッジチェック
+    newly_unlocked = badge_system.check_all_badges()
+    
+    # ログインユーザー: Supabaseにも保存
+    if newly_unlocked and user_id:
+        from moon_tasker.cloud.supabase_client import get_cloud_db
+        cloud_db = get_cloud_db()
+        for badge in newly_unlocked:
+            cloud_db.save_user_badge(user_id, badge.name)
+    
+    # 進化チェック
+    creature = creature_system.get_creature()
+    evolutions = []
+    if creature:
+        old_stage = creature.evolution_stage
+        creature_system._check_evolution(creature)
+        if creature.evolution_stage > old_stage:
+            evolutions.append({
+                'from': old_stage,
+                'to': creature.evolution_stage,
+                'name': creature_system.get_stage_name(creature)
+            })
+    
+    # プレゼントチェック
+    present = creature_system.last_present
+    
+    return {
+        'badges': [{'name': b.name, 'constellation': b.constellation_name} for b in newly_unlocked],
+        'evolutions': evolutions,
+        'present': {'name': present[0], 'emoji': present[1], 'desc': present[2]} if present else None,
+        'cycle': get_cycle_progress(db, completed['cycle_id']) if completed['cycle_id'] else None
+    }
+
+
+def get_cycle_progress(db, cycle_id):
+    """サイクルの進捗（完了数 / 全体）"""
+    cycle_tasks = db.get_cycle_tasks(cycle_id)
+    return {
+        'cycle_id': cycle_id,
+        'completed': sum(1 for t in cycle_tasks if t._cycle_completed),
+        'total': len(cycle_tasks)
+    }
+
+
+# オフラインでためた完了を受け付ける期間（これより古い完了時刻はストリーク・統計に入れない）
+MAX_COMPLETION_AGE = timedelta(days=3)
+
+
+def parse_client_timestamp(value, not_before=None):
+    """
+    クライアントの完了時刻（ISO 8601 またはUNIXミリ秒）をローカル時刻に変換
+    
+    未来の時刻は今にする。not_before（省略時は MAX_COMPLETION_AGE 前）より古ければNone。
+    """
+    now = datetime.now()
+    if value is None:
+        return now
+    try:
+        if isinstance(value, (int, float)):
+            parsed = datetime.fromtimestamp(value / 1000)
+        else:
+            parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+            if parsed.tzinfo:
+                parsed = parsed.astimezone().replace(tzinfo=None)
+    except (ValueError, OverflowError, OSError):
+        return now
+    if parsed < (not_before or now - MAX_COMPLETION_AGE):
+        return None
+    return min(parsed, now)
+
+
+def on_timer_credit_due(event_type, payload):
+    """クライアントから完了報告がなかったタスクをサーバー側で記録（タイマースレッドから呼ばれる）"""
+    kind, _, ident = payload['owner'].partition(':')
+    db = Database(guest_id=ident if kind == 'guest' else None)
+    result = record_task_completion(db, CreatureSystem(db), BadgeSystem(db),
+                                    payload['task_id'], payload['duration'],
+                                    user_id=ident if kind == 'user' else None,
+                                    timer_credit=(payload['session_id'], payload['index']))
+    if result is None:
+        return
+    event_bus.publish('timer.task_completed', owner=payload['owner'],
+                      session_id=payload['session_id'], task_id=payload['task_id'],
+                      source='server', **result)
+
+
+event_bus.subscribe('timer.credit_due', on_timer_credit_due)
+
+
+def timer_state(timer_session):
+    """SSEで送るタイマーの状態"""
+    return {
+        'session_id': timer_session.id,
+        'status': timer_session.status,
+        'task_index': timer_session.task_index,
+        'is_break': timer_session.is_break,
+        'deadline': timer_session.deadline,
+    }
+
+
+def forward_to_subscribers(event_type, payload):
+    """内部イベントをSSE購読者向けのイベントに変換してDBに書く（各ワーカーの EventRelay が配る）"""
+    owner = payload.get('owner')
+    if not owner:
+        return
+    
+    events = []
+    if event_type in ('timer.started', 'timer.resumed', 'timer.phase_started',
+                      'timer.paused', 'timer.completed', 'timer.aborted'):
+        events.append(('timer', {
+            'session_id': payload['session_id'],
+            'status': payload['status'],
+            'task_index': payload['task_index'],
+            'is_break': payload['is_break'],
+            'deadline': payload['deadline'],
+        }))
+    
+    elif event_type == 'timer.task_completed':
+        events.append(('task_completed', {
+            'task_id': payload['task_id'],
+            'task_ids': payload.get('task_ids') or [payload['task_id']],
+            'source': payload['source']
+        }))
+        events += [('badge', badge) for badge in payload.get('badges') or []]
+        events += [('evolution', evolution) for evolution in payload.get('evolutions') or []]
+        if payload.get('present'):
+            events.append(('present', payload['present']))
+        if payload.get('cycle'):
+            events.append(('cycle', payload['cycle']))
+    
+    if events:
+        event_relay.publish((owner, event, data) for event, data in events)
+
+
+event_bus.subscribe('*', forward_to_subscribers)
+
+
+@app.before_request
+def start_timer_sessions():
+    """タイマーセッションの処理スレッドを起動（初回のみ・再起動時は実行中のセッションを復元）"""
+    timer_sessions.start()
+
+
+# ===== メトリクス =====
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def remember_response_status(response):
+    g.response_status = response.status_code
+    return response
+
+
+@app.teardown_request
+def record_request_metrics(exc):
+    """ルート（URLルール）ごとの処理時間とステータスを記録"""
+    started = g.pop('request_started', None)
+    if started is None:
+        return
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.observe('moon_tasker_http_request_duration_seconds',
+                    (('route', route), ('method', request.method)), time.perf_counter() - started)
+    metrics.inc('moon_tasker_http_requests_total',
+                (('route', route), ('method', request.method), ('status', str(g.get('response_status', 500)))))
+    metrics.maybe_flush()
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """
+    Prometheus形式のメトリクス（全ワーカーの合計）
+    
+    METRICS_TOKEN のBearerトークンが必要。設定されていなければ公開しない（404）。
+    """
+    token = os.environ.get('METRICS_TOKEN')
+    if not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 # ============ ROUTES ============
 
 @app.route('/')
+@conditional()
 def home():
     """ホーム画面"""
-    creature = get_creature_system().get_creature()
+    # 未完了数・完了数・ストリーク・生命体を1回のクエリで
+    summary = get_db().get_dashboard_summary()
     moon_phase = moon_calc.get_moon_phase_name()
     moon_emoji = moon_calc.get_moon_emoji()
     
-    tasks = get_db().get_all_tasks()
-    pending_count = len([t for t in tasks if t.status == "pending"])
-    completed_count = get_db().get_completed_task_count()
-    
-    streak_data = get_db().get_streak_data()
-    
-    ctx = get_creature_context(creature)
+    ctx = get_creature_context(summary.creature)
     
     return render_template('pages/home.html',
                          creature=ctx['creature'],
@@ -107,9 +562,9 @@ def home():
                          creature_image=ctx['creature_image'],
                          moon_phase=moon_phase,
                          moon_emoji=moon_emoji,
-                         pending_count=pending_count,
-                         completed_count=completed_count,
-                         streak_data=streak_data)
+                         pending_count=summary.pending_count,
+                         completed_count=summary.completed_count,
+                         streak_data=summary.streak)
 
 
 @app.route('/timer')
@@ -136,9 +591,8 @@ def timer():
                          is_logged_in=bool(user_id))
 
 
-@app.route('/timer/playlist/<playlist_id>/tasks')
-def get_playlist_tasks(playlist_id):
-    """プレイリストのタスク一覧を取得（HTMX用）"""
+def load_playlist_tasks(playlist_id):
+    """プレイリストのタスクを取得（ログインユーザーはSupabase、ゲストはローカルDB）"""
     user_id = session.get('user_id')
     
     if user_id:
@@ -163,27 +617,60 @@ def get_playlist_tasks(playlist_id):
     else:
         # ゲスト: ローカルDBから取得
         tasks = get_db().get_playlist_tasks(int(playlist_id))
-    
+    return tasks
+
+
+def load_pending_tasks():
+    """未完了のタスクを取得（ログインユーザーはSupabase、ゲストはローカルDB）"""
+    user_id = session.get('user_id')
+
+    if user_id:
+        from moon_tasker.cloud.supabase_client import get_cloud_db
+        cloud_tasks = get_cloud_db().get_user_tasks(user_id)
+        tasks = [type('Task', (), {
+            'id': t['id'], 'title': t['title'], 'duration': t.get('duration', 25),
+            'break_duration': t.get('break_duration', 5), 'difficulty': t.get('difficulty', 3),
+            'priority': t.get('priority', 0), 'status': t.get('status', 'pending')
+        })() for t in cloud_tasks]
+    else:
+        tasks = get_db().get_all_tasks()
+    return [t for t in tasks if t.status == 'pending']
+
+
+@app.route('/timer/playlist/<playlist_id>/tasks')
+@conditional(period=60, cloud=True)
+def get_playlist_tasks(playlist_id):
+    """プレイリストのタスク一覧を取得（HTMX用）"""
     # 日本標準時（JST、UTC+9）を使用
     from datetime import timezone
     JST = timezone(timedelta(hours=9))
+    now = datetime.now(JST)
     
-    schedule = []
-    time_cursor = datetime.now(JST)
-    
-    for idx, task in enumerate(tasks):
-        is_last = idx == len(tasks) - 1
-        # 最後のタスクは休憩時間をカット
-        break_time = 0 if is_last else task.break_duration
-        task_end = time_cursor + timedelta(minutes=task.duration + break_time)
-        schedule.append({
-            'task': task,
-            'start': time_cursor.strftime('%H:%M'),
-            'end': task_end.strftime('%H:%M')
-        })
-        time_cursor = task_end
+    if session.get('user_id'):
+        return render_playlist_tasks(playlist_id, now)
+    # ゲストはデータ版数と時刻（分）が同じなら描画済みのHTMLを返す（タスクも読まない）
+    return fragment_cache.get_or_render('playlist_tasks', (playlist_id, now.strftime('%Y-%m-%d %H:%M')),
+                                        lambda: render_playlist_tasks(playlist_id, now),
+                                        scope=get_fragment_scope())
+
+
+def render_playlist_tasks(playlist_id, now):
+    """プレイリストのタスクと予定時刻を描画"""
+    tasks = load_playlist_tasks(playlist_id)
+    
+    # 生活時間のブロックを避けてタスクを配置（最後のタスクは休憩時間をカット）
+    timeline = DailyTimeline(get_db().get_lifestyle_settings())
+    entries = timeline.project(tasks, now, skip_last_break=True)
+    
+    schedule = [{
+        'type': entry.type,
+        'name': entry.name,
+        'task': entry.task,
+        'start': entry.start.strftime('%H:%M'),
+        'end': entry.end.strftime('%H:%M')
+    } for entry in entries]
     
-    estimated_end = time_cursor.strftime('%H:%M')
+    estimated_end = timeline.estimated_end(entries, now).strftime('%H:%M')
     
     return render_template('partials/playlist_tasks.html',
                          tasks=tasks,
@@ -191,67 +678,314 @@ def get_playlist_tasks(playlist_id):
                          estimated_end=estimated_end)
 
 
+@app.route('/timer/session/start', methods=['POST'])
+def start_timer_session():
+    """サーバー側タイマーセッションを開始"""
+    if request.form.get('quick'):
+        tasks = [Task(id=-1, title='クイック集中タイム', duration=25, break_duration=5, difficulty=3)]
+    else:
+        tasks = load_playlist_tasks(request.form.get('playlist_id', ''))
+    
+    try:
+        timer_session = timer_sessions.create(get_timer_owner(), tasks)
+    except TimerSessionError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'session': timer_sessions.to_dict(timer_session)})
+
+
+@app.route('/timer/session/<session_id>')
+def get_timer_session(session_id):
+    """タイマーセッションの状態を取得"""
+    try:
+        timer_session = timer_sessions.get(get_timer_owner(), session_id)
+    except TimerSessionError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    return jsonify({'success': True, 'session': timer_sessions.to_dict(timer_session)})
+
+
+@app.route('/timer/session/<session_id>/<action>', methods=['POST'])
+def update_timer_session(session_id, action):
+    """タイマーセッションの一時停止・再開"""
+    operations = {'pause': timer_sessions.pause, 'resume': timer_sessions.resume}
+    if action not in operations:
+        return jsonify({'success': False, 'error': 'unknown action'}), 404
+    try:
+        timer_session = operations[action](get_timer_owner(), session_id)
+    except TimerSessionError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    return jsonify({'success': True, 'session': timer_sessions.to_dict(timer_session)})
+
+
+# WSGIではSSEの接続1本がスレッドを1つ占有するので、ワーカーごとの本数と接続時間を制限する
+# （上限を超えたら503。切れた接続はクライアントが Last-Event-ID を付けて再接続する）
+SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', '2'))
+SSE_MAX_SECONDS = float(os.environ.get('SSE_MAX_SECONDS', '120'))
+sse_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+
+
+def prepare_event_stream(last_event_id=None):
+    """
+    SSE接続の準備（リクエストの中で呼ぶ）: (所有者, 再送するイベント, タイマーの状態)
+    
+    asgi.py の非同期の /events からも呼ばれる。
+    """
+    owner = get_timer_owner()
+    event_relay.start()
+    db = Database()
+    try:
+        after = int(last_event_id) if last_event_id else 0
+    except ValueError:
+        after = 0
+    backlog = db.get_events_after(after, owner=owner) if after else []
+    active = db.get_active_timer_session(owner)
+    return owner, backlog, timer_state(active) if active else None
+
+
+@app.route('/events')
+def event_stream():
+    """SSE: タイマーのtick・バッジ獲得・進化・サイクル進捗をプッシュ"""
+    if not sse_slots.acquire(blocking=False):
+        return Response('', status=503, headers={'Retry-After': '30'})
+    try:
+        owner, backlog, timer = prepare_event_stream(request.headers.get('Last-Event-ID'))
+        stream = EventStream(broadcaster, owner, backlog, timer, max_seconds=SSE_MAX_SECONDS)
+    except Exception:
+        sse_slots.release()
+        raise
+    
+    def generate():
+        yield stream.opening()
+        while not stream.closed:
+            for frame in stream.poll(timeout=1.0):
+                yield frame
+    
+    closed = []
+    
+    def on_close():
+        # 送信前に切断された場合もサーバーが閉じるので、ここで1回だけ片付ける
+        if not closed:
+            closed.append(True)
+            stream.close()
+            sse_slots.release()
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(on_close)
+    return response
+
+
 @app.route('/timer/complete', methods=['POST'])
+@idempotent
 def complete_task():
     """タスク完了処理"""
     task_id = request.form.get('task_id', type=int)
     duration = request.form.get('duration', 25, type=int)
+    session_id = request.form.get('session_id')
+    already_recorded = {'success': True, 'already_recorded': True,
+                        'badges': [], 'evolutions': [], 'present': None, 'cycle': None}
     
-    if task_id and task_id > 0:
-        get_db().update_task_status(task_id, "completed")
-        get_db().log_activity(task_id, "completed")
-    
-    get_creature_system().on_task_completed(duration)
-    
-    # バッジチェック
-    newly_unlocked = get_badge_system().check_all_badges()
+    timer_credit = None
+    if session_id:
+        # サーバー側セッションがある場合は、サーバーの時刻で作業が終わったかを検証する
+        try:
+            outcome, index, entry = timer_sessions.verify_task(get_timer_owner(), session_id, task_id)
+        except TimerSessionError as e:
+            return jsonify({'success': False, 'error': str(e)}), 404
+        if outcome == 'too_early':
+            return jsonify({'success': False, 'error': 'まだ作業時間が終わっていません'}), 409
+        if outcome == 'recorded':
+            # 猶予を過ぎてサーバー側で記録済み（結果はイベントで通知済み）
+            return jsonify(already_recorded)
+        duration = entry[1]
+        timer_credit = (session_id, index)
+    
+    result = record_task_completion(get_db(), get_creature_system(), get_badge_system(),
+                                    task_id, duration, user_id=session.get('user_id'),
+                                    timer_credit=timer_credit)
+    if result is None:
+        return jsonify(already_recorded)
+    if timer_credit:
+        timer_sessions.credit_recorded(*timer_credit)
     
     # 新しいバッジをセッションに保存（星座図鑑で演出表示用）
-    if newly_unlocked:
-        new_badge_names = [b.name for b in newly_unlocked]
+    if result['badges']:
         existing = session.get('new_badges', [])
-        session['new_badges'] = existing + new_badge_names
-        
-        # ログインユーザー: Supabaseにも保存
-        user_id = session.get('user_id')
-        if user_id:
-            from moon_tasker.cloud.supabase_client import get_cloud_db
-            cloud_db = get_cloud_db()
-            for badge_name in new_badge_names:
-                cloud_db.save_user_badge(user_id, badge_name)
+        session['new_badges'] = existing + [b['name'] for b in result['badges']]
     
-    # 進化チェック
-    creature = get_creature_system().get_creature()
+    # タイマーのセッションがない完了も、ほかのタブ（ホーム・図鑑・ムーンサイクル）に知らせる
+    event_bus.publish('timer.task_completed', owner=get_timer_owner(), session_id=session_id,
+                      task_id=task_id, source='client', **result)
+    
+    return jsonify({'success': True, **result})
+
+
+MAX_BATCH_COMPLETIONS = 50
+
+
+@app.route('/timer/complete-batch', methods=['POST'])
+def complete_task_batch():
+    """
+    複数のタスク完了をまとめて記録
+    
+    完了は1トランザクションで書き込み、バッジ・進化の判定は最後に1回だけ行う。
+    冪等キーが記録済みの完了（再送）は duplicates として返し、二重には数えない。
+    完了時刻が MAX_COMPLETION_AGE より古い完了は rejected（too_old）として記録しない。
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('completions')
+    session_id = data.get('session_id')
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'error': '完了データがありません'}), 400
+    if len(items) > MAX_BATCH_COMPLETIONS:
+        return jsonify({'success': False, 'error': f'一度に記録できるのは{MAX_BATCH_COMPLETIONS}件までです'}), 400
+    
+    db = get_db()
+    creature_system = get_creature_system()
+    badge_system = get_badge_system()
+    owner = get_timer_owner()
+    
+    completions, duplicates, rejected = [], [], []
+    seen_keys = set()
+    session_started = {}
+    for item in items:
+        key = str(item.get('idempotency_key') or '')[:128] if isinstance(item, dict) else ''
+        try:
+            task_id = int(item['task_id'])
+            duration = int(item.get('duration', 25))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            rejected.append({'idempotency_key': key, 'reason': 'invalid'})
+            continue
+        if key and key in seen_keys:
+            duplicates.append(key)
+            continue
+        seen_keys.add(key)
+        completed_at = parse_client_timestamp(item.get('completed_at'))
+        if completed_at is None:
+            rejected.append({'idempotency_key': key, 'reason': 'too_old'})
+            continue
+        
+        timer_credit = None
+        item_session_id = item.get('session_id') or session_id
+        if item_session_id:
+            # サーバー側セッションがある場合は、サーバーの時刻で作業が終わったかを検証する
+            try:
+                outcome, index, entry = timer_sessions.verify_task(owner, item_session_id, task_id)
+            except TimerSessionError:
+                rejected.append({'idempotency_key': key, 'reason': 'session_not_found'})
+                continue
+            if outcome == 'too_early':
+                rejected.append({'idempotency_key': key, 'reason': 'too_early'})
+                continue
+            if outcome == 'recorded':
+                duplicates.append(key)
+                continue
+            duration = entry[1]
+            # 記録権は完了と同じトランザクションで取る
+            timer_credit = (item_session_id, index)
+            # セッションの作業はセッション開始より前には終わらない
+            if item_session_id not in session_started:
+                started_at = timer_sessions.get(owner, item_session_id).started_at
+                session_started[item_session_id] = datetime.fromtimestamp(started_at) if started_at else None
+            if session_started[item_session_id]:
+                completed_at = max(completed_at, session_started[item_session_id])
+        
+        completions.append(TaskCompletion(task_id=task_id, duration=duration, completed_at=completed_at,
+                                          idempotency_key=key, timer_credit=timer_credit))
+    
+    # 記録済みのキー（再送）を除く
+    recorded = db.get_recorded_completion_keys([c.idempotency_key for c in completions if c.idempotency_key])
+    fresh = [c for c in completions if not c.idempotency_key or c.idempotency_key not in recorded]
+    duplicates += [c.idempotency_key for c in completions if c.idempotency_key and c.idempotency_key in recorded]
+    
+    # 生命体のパラメータは実際に記録できた完了の分だけ反映し、同じトランザクションで保存
+    creature = creature_system.get_creature()
+    old_stage = creature.evolution_stage if creature else None
+    presents = []
+    
+    def update_creature(applied_completions):
+        if not creature:
+            return None
+        presents.extend(creature_system.apply_task_completions(creature, [c.duration for c in applied_completions]))
+        return creature
+    
+    applied = db.complete_tasks_batch(fresh, update_creature)
+    applied_keys = {a['idempotency_key'] for a in applied}
+    duplicates += [c.idempotency_key for c in fresh if c.idempotency_key and c.idempotency_key not in applied_keys]
+    for entry in applied:
+        if entry['task_id'] > 0:
+            schedule_cache.invalidate_task(entry['task_id'])
+    for completion in fresh:
+        if completion.timer_credit:
+            timer_sessions.credit_recorded(*completion.timer_credit)
+    
+    # 進化・バッジは最後に1回だけ判定
     evolutions = []
-    if creature:
-        old_stage = creature.evolution_stage
-        get_creature_system()._check_evolution(creature)
-        if creature.evolution_stage > old_stage:
-            evolutions.append({
-                'from': old_stage,
-                'to': creature.evolution_stage,
-                'name': get_creature_system().get_stage_name(creature)
-            })
+    newly_unlocked = []
+    if applied:
+        if creature:
+            creature_system._check_evolution(creature)
+            if creature.evolution_stage > old_stage:
+                db.update_creature(creature)
+                evolutions.append({
+                    'from': old_stage,
+                    'to': creature.evolution_stage,
+                    'name': creature_system.get_stage_name(creature)
+                })
+        newly_unlocked = badge_system.check_all_badges()
     
-    # プレゼントチェック
-    present = get_creature_system().last_present
+    user_id = session.get('user_id')
+    if newly_unlocked and user_id:
+        from moon_tasker.cloud.supabase_client import get_cloud_db
+        cloud_db = get_cloud_db()
+        for badge in newly_unlocked:
+            cloud_db.save_user_badge(user_id, badge.name)
+    
+    badges = [{'name': b.name, 'constellation': b.constellation_name} for b in newly_unlocked]
+    if badges:
+        existing = session.get('new_badges', [])
+        session['new_badges'] = existing + [b['name'] for b in badges]
+    
+    cycle_ids = list(dict.fromkeys(a['cycle_id'] for a in applied if a['cycle_id']))
+    cycles = [get_cycle_progress(db, cycle_id) for cycle_id in cycle_ids]
+    present_list = [{'name': p[0], 'emoji': p[1], 'desc': p[2]} for p in presents]
+    result = {
+        'badges': badges,
+        'evolutions': evolutions,
+        'present': present_list[-1] if present_list else None,
+        'cycle': cycles[-1] if cycles else None
+    }
+    
+    if applied:
+        event_bus.publish('timer.task_completed', owner=owner, session_id=session_id,
+                          task_id=applied[-1]['task_id'], task_ids=[a['task_id'] for a in applied],
+                          source='client', **result)
     
     return jsonify({
         'success': True,
-        'badges': [{'name': b.name, 'constellation': b.constellation_name} for b in newly_unlocked],
-        'evolutions': evolutions,
-        'present': {'name': present[0], 'emoji': present[1], 'desc': present[2]} if present else None
+        'applied': [a['idempotency_key'] for a in applied],
+        'duplicates': duplicates,
+        'rejected': rejected,
+        'presents': present_list,
+        'cycles': cycles,
+        **result
     })
 
 
 @app.route('/timer/abort', methods=['POST'])
 def abort_task():
     """タイマー中止処理 - 生命体の機嫌が30%下がる"""
+    session_id = request.form.get('session_id')
+    if session_id:
+        try:
+            timer_sessions.abort(get_timer_owner(), session_id)
+        except TimerSessionError:
+            pass
     get_creature_system().on_task_failed()
     return jsonify({'success': True})
 
 
 @app.route('/playlist')
+@conditional(cloud=True)
 def playlist():
     """プレイリスト管理画面"""
     user_id = session.get('user_id')
@@ -263,45 +997,14 @@ def playlist():
         
         cloud_playlists = cloud_db.get_user_playlists(user_id)
         playlists = [type('Playlist', (), {'id': p['id'], 'name': p['name'], 'description': p.get('description', '')})() for p in cloud_playlists]
-        
-        cloud_tasks = cloud_db.get_user_tasks(user_id)
-        tasks = [type('Task', (), {
-            'id': t['id'], 'title': t['title'], 'duration': t.get('duration', 25),
-            'break_duration': t.get('break_duration', 5), 'difficulty': t.get('difficulty', 3),
-            'priority': t.get('priority', 0), 'status': t.get('status', 'pending')
-        })() for t in cloud_tasks]
-        pending_tasks = [t for t in tasks if t.status == 'pending']
-        
         selected_id = request.args.get('selected')
-        selected_tasks = []
-        
-        # クラウドプレイリストのタスクを取得
-        if selected_id:
-            playlist_task_data = cloud_db.get_playlist_tasks(selected_id)
-            # JOINされたuser_tasksデータを直接使用
-            for pt in playlist_task_data:
-                user_task = pt.get('user_tasks')
-                if user_task:
-                    selected_tasks.append(type('Task', (), {
-                        'id': user_task['id'],
-                        'title': user_task['title'],
-                        'duration': user_task.get('duration', 25),
-                        'break_duration': user_task.get('break_duration', 5),
-                        'difficulty': user_task.get('difficulty', 3),
-                        'priority': user_task.get('priority', 0),
-                        'status': user_task.get('status', 'pending')
-                    })())
     else:
         # ゲスト: ローカルDBから取得
         playlists = get_db().get_all_playlists()
-        tasks = get_db().get_all_tasks()
-        pending_tasks = [t for t in tasks if t.status == "pending"]
-        
         selected_id = request.args.get('selected', type=int)
-        selected_tasks = []
-        if selected_id:
-            selected_tasks = get_db().get_playlist_tasks(selected_id)
     
+    pending_tasks = load_pending_tasks()
+    selected_tasks = load_playlist_tasks(selected_id) if selected_id else []
     lifestyle = get_db().get_lifestyle_settings()
     
     return render_template('pages/playlist.html',
@@ -313,6 +1016,25 @@ def playlist():
                          is_logged_in=bool(user_id))
 
 
+def is_htmx_request():
+    """HTMXからのリクエストか（部分更新で応答する）"""
+    return request.headers.get('HX-Request') == 'true'
+
+
+def render_playlist_update(playlist_id, pending=False, refresh_keys=()):
+    """
+    プレイリスト編集の部分更新（HTMX）
+    
+    ページ全体を描画し直さず、変わったリスト（プレイリストの内容、pending=Trueなら
+    利用可能なタスクも）と、使い終わった冪等キーの入れ替えだけを hx-swap-oob で返す。
+    """
+    return render_template('partials/playlist_update.html',
+                         selected_id=playlist_id,
+                         selected_tasks=load_playlist_tasks(playlist_id) if playlist_id else None,
+                         pending_tasks=load_pending_tasks() if pending else None,
+                         refresh_keys=refresh_keys)
+
+
 @app.route('/playlist/create', methods=['POST'])
 def create_playlist():
     """プレイリスト作成"""
@@ -348,6 +1070,7 @@ def delete_playlist(playlist_id):
 
 
 @app.route('/playlist/<playlist_id>/add/<task_id>', methods=['POST'])
+@idempotent
 def add_to_playlist(playlist_id, task_id):
     """タスクをプレイリストに追加"""
     print(f"[ADD_TO_PLAYLIST] playlist_id={playlist_id}, task_id={task_id}")
@@ -359,6 +1082,8 @@ def add_to_playlist(playlist_id, task_id):
         print(f"[ADD_TO_PLAYLIST] Result: {result}")
     else:
         get_db().add_task_to_playlist(int(playlist_id), int(task_id))
+    if is_htmx_request():
+        return render_playlist_update(playlist_id, refresh_keys=[f'add-key-{task_id}'])
     return redirect(url_for('playlist', selected=playlist_id))
 
 
@@ -372,6 +1097,8 @@ def remove_from_playlist(playlist_id, task_id):
         cloud_db.remove_task_from_playlist(playlist_id, task_id)
     else:
         get_db().remove_task_from_playlist(int(playlist_id), int(task_id))
+    if is_htmx_request():
+        return render_playlist_update(playlist_id)
     return redirect(url_for('playlist', selected=playlist_id))
 
 
@@ -390,14 +1117,34 @@ def move_task_in_playlist(playlist_id, task_id, direction):
         
         get_db().reorder_playlist_tasks(playlist_id, task_ids)
     
+    if is_htmx_request():
+        return render_playlist_update(playlist_id)
     return redirect(url_for('playlist', selected=playlist_id))
 
 
+def run_optimizer(mode, tasks, lifestyle, time_limit=None, seed=None):
+    """モードに応じた最適化を実行"""
+    if mode == 'balanced':
+        optimizer = ScheduleOptimizer()
+        return optimizer.generate_balanced_schedule(tasks)
+    elif mode == 'time_limited' and time_limit:
+        optimizer = ScheduleOptimizer()
+        return optimizer.optimize_schedule(tasks, time_limit)
+    elif mode == 'genetic':
+        genetic = GeneticScheduleOptimizer(lifestyle, seed=seed)
+        return genetic.optimize(tasks)
+    elif mode == 'annealing':
+        annealing = AnnealingScheduleOptimizer(seed=seed)
+        return annealing.optimize(tasks)
+    return tasks
+
+
 @app.route('/playlist/<int:playlist_id>/optimize', methods=['POST'])
 def optimize_playlist(playlist_id):
     """AIでプレイリストを最適化"""
     mode = request.form.get('mode', 'balanced')
     time_limit = request.form.get('time_limit', type=int)
+    seed = request.form.get('seed', type=int)
     
     tasks = get_db().get_playlist_tasks(playlist_id)
     if not tasks:
@@ -405,17 +1152,14 @@ def optimize_playlist(playlist_id):
     
     lifestyle = get_db().get_lifestyle_settings()
     
-    if mode == 'balanced':
-        optimizer = ScheduleOptimizer()
-        optimized = optimizer.generate_balanced_schedule(tasks)
-    elif mode == 'time_limited' and time_limit:
-        optimizer = ScheduleOptimizer()
-        optimized = optimizer.optimize_schedule(tasks, time_limit)
-    elif mode == 'genetic':
-        genetic = GeneticScheduleOptimizer(lifestyle)
-        optimized = genetic.optimize(tasks)
-    else:
-        optimized = tasks
+    # 同じタスク集合・生活設定での再最適化はキャッシュから返す
+    cache_key = schedule_cache.make_key(tasks, lifestyle, mode, time_limit, seed)
+    cached_ids = schedule_cache.get(cache_key)
+    optimized = schedule_cache.apply(cached_ids, tasks) if cached_ids is not None else None
+    
+    if optimized is None:
+        optimized = run_optimizer(mode, tasks, lifestyle, time_limit, seed)
+        schedule_cache.put(cache_key, tasks, lifestyle, optimized)
     
     task_ids = [t.id for t in optimized]
     get_db().reorder_playlist_tasks(playlist_id, task_ids)
@@ -438,12 +1182,14 @@ def save_lifestyle():
         meal_duration=request.form.get('meal_duration', 30, type=int)
     )
     get_db().save_lifestyle_settings(settings)
+    schedule_cache.invalidate_lifestyle()
     
     selected_id = request.form.get('selected_playlist', type=int)
     return redirect(url_for('playlist', selected=selected_id))
 
 
 @app.route('/task/create', methods=['POST'])
+@idempotent
 def create_task():
     """タスク作成"""
     title = request.form.get('title', '').strip()
@@ -489,6 +1235,8 @@ def create_task():
         if selected_id:
             get_db().add_task_to_playlist(int(selected_id), new_task_id)
     
+    if is_htmx_request():
+        return render_playlist_update(selected_id or None, pending=True, refresh_keys=['create-task-key'])
     return redirect(url_for('playlist', selected=selected_id))
 
 
@@ -503,11 +1251,62 @@ def delete_task(task_id):
         cloud_db.delete_user_task(user_id, task_id)
     else:
         # ゲスト: ローカルDBから削除
-        get_db().delete_task(int(task_id))
+        db = get_db()
+        cycle_id = db.is_task_in_active_cycle(int(task_id))
+        if cycle_id:
+            # 空いた容量にまだ日が決まっていないタスクを入れてからサイクルから外す
+            sync_cycle_plan(db.get_active_moon_cycle(), removed=[int(task_id)])
+            db.remove_task_from_cycle(cycle_id, int(task_id))
+        db.delete_task(int(task_id))
+        schedule_cache.invalidate_task(int(task_id))
     return redirect(url_for('playlist'))
 
 
+def load_cycle_plan(cycle):
+    """保存済みの割り当てからサイクルのタスク一覧と計画を返す（書き込みはしない）"""
+    db = get_db()
+    tasks = db.get_cycle_tasks(cycle.id)
+    planner = CyclePlanner(db.get_lifestyle_settings(), db.get_weekday_throughput())
+    return tasks, planner.from_assignments(tasks, cycle.cycle_start, cycle.cycle_end)
+
+
+def sync_cycle_plan(cycle, full=False, removed=(), changed=()):
+    """
+    サイクルのタスクを日ごとに割り当てて保存し、タスク一覧と計画を返す（変更系のルートから呼ぶ）
+
+    full=False の場合は差分で更新する: removed（タスクID）は割り当てを外し、changed（Task）は
+    入れ直し、未割り当てのタスクは空いている日に入れる（他の日は変更しない）
+    """
+    from datetime import timezone
+    today = datetime.now(timezone(timedelta(hours=9))).date()
+    
+    db = get_db()
+    tasks = db.get_cycle_tasks(cycle.id)
+    planner = CyclePlanner(db.get_lifestyle_settings(), db.get_weekday_throughput())
+    
+    if full:
+        plan = planner.plan(tasks, cycle.cycle_start, cycle.cycle_end, today=today)
+    else:
+        plan = planner.from_assignments(tasks, cycle.cycle_start, cycle.cycle_end)
+        skip = set(removed) | {t.id for t in changed}
+        unplanned = [t for t in tasks
+                     if t.id not in plan.assignments and t.id not in skip and not t._cycle_completed]
+        planner.replan(plan, added=unplanned, removed=removed, changed=changed, today=today)
+    
+    # 日付が変わったタスクだけ保存
+    changes = {}
+    for task in tasks:
+        planned = plan.day_of(task.id)
+        if parse_date(task._planned_date) != planned:
+            changes[task.id] = planned
+            task._planned_date = planned.isoformat() if planned else None
+    db.set_cycle_task_dates(cycle.id, changes)
+    
+    return tasks, plan
+
+
 @app.route('/moon-cycle')
+@conditional()
 def moon_cycle():
     """月のサイクル画面"""
     active_cycle = get_db().get_active_moon_cycle()
@@ -517,13 +1316,22 @@ def moon_cycle():
     moon_emoji = moon_calc.get_moon_emoji()
     moon_phase = moon_calc.get_moon_phase_name()
     
+    # 今月の月齢カレンダー（1回の計算で1か月分）
+    today = datetime.now().date()
+    month_start = today.replace(day=1)
+    month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    moon_days = moon_calc.get_phase_calendar(month_start, month_end).to_rows()
+    
     cycle_tasks = []
+    day_loads = []
     progress = 0
     completed_count = 0
     total_count = 0
     
     if active_cycle:
-        cycle_tasks = get_db().get_cycle_tasks(active_cycle.id)
+        cycle_tasks, cycle_plan = load_cycle_plan(active_cycle)
+        cycle_tasks.sort(key=lambda t: (t._planned_date or '9999-12-31'))
+        day_loads = [load for _, load in sorted(cycle_plan.days.items()) if load.task_ids]
         completed_count = sum(1 for t in cycle_tasks if getattr(t, '_cycle_completed', False))
         total_count = len(cycle_tasks)
         if total_count > 0:
@@ -536,9 +1344,12 @@ def moon_cycle():
     return render_template('pages/moon_cycle.html',
                          active_cycle=active_cycle,
                          cycle_tasks=cycle_tasks,
+                         day_loads=day_loads,
                          completed_cycles=completed_cycles,
                          moon_emoji=moon_emoji,
                          moon_phase=moon_phase,
+                         moon_days=moon_days,
+                         today=today,
                          progress=progress,
                          completed_count=completed_count,
                          total_count=total_count,
@@ -571,6 +1382,19 @@ def add_task_to_cycle(cycle_id):
     task_ids = request.form.getlist('task_ids')
     for task_id in task_ids:
         get_db().add_task_to_cycle(cycle_id, int(task_id))
+    # 追加されたタスクだけを空いている日に入れる
+    cycle = next((c for c in get_db().get_all_moon_cycles() if c.id == cycle_id), None)
+    if cycle and task_ids:
+        sync_cycle_plan(cycle)
+    return redirect(url_for('moon_cycle'))
+
+
+@app.route('/moon-cycle/<int:cycle_id>/replan', methods=['POST'])
+def replan_moon_cycle(cycle_id):
+    """サイクルのタスクを全日程で再割り当て"""
+    cycle = next((c for c in get_db().get_all_moon_cycles() if c.id == cycle_id), None)
+    if cycle:
+        sync_cycle_plan(cycle, full=True)
     return redirect(url_for('moon_cycle'))
 
 
@@ -594,6 +1418,7 @@ def delete_moon_cycle(cycle_id):
 
 
 @app.route('/collection')
+@conditional(cloud=True)
 def collection():
     """星座図鑑画面"""
     user_id = session.get('user_id')
@@ -642,7 +1467,8 @@ def collection():
                          unlocked_badges=unlocked,
                          locked_badges=locked,
                          categories=categories,
-                         new_badges=new_badges)
+                         new_badges=new_badges,
+                         is_logged_in=bool(user_id))
 
 
 @app.route('/creature')
@@ -664,7 +1490,7 @@ def creature():
             img, name = stage_info.get(stage, ("stage1_content.png", "不明"))
             evolution_history.append({
                 'stage': stage, 
-                'image': f'/static/images/creature/{img}', 
+                'image': asset_url('static', filename=f'images/creature/{img}'), 
                 'name': name
             })
     
@@ -708,11 +1534,10 @@ def start_creature():
 
 
 @app.route('/friends')
-def friends():
-    """フレンド画面"""
-    from moon_tasker.cloud.supabase_client import get_auth, get_cloud_db
+async def friends():
+    """フレンド画面（Supabaseへのリクエストは同時に送り、SQLiteはスレッドで読む）"""
+    from moon_tasker.cloud.supabase_client import get_auth, AsyncSupabaseDB, new_async_client
     
-    auth = get_auth()
     is_logged_in = session.get('user_id') is not None
     user_profile = None
     friends_list = []
@@ -720,55 +1545,32 @@ def friends():
     my_friend_code = None
     my_creature_cloud = None
     
-    # ローカルの生命体を取得
-    local_creature = get_creature_system().get_creature()
-    has_local_creature = local_creature and local_creature.status in ['active', 'completed']
-    
-    # 獲得済みバッジ（称号選択用）
-    unlocked_badges = []
-    try:
-        from moon_tasker.logic.titles import get_title_for_constellation
-        all_badges = get_db().get_all_badges()
-        for b in all_badges:
-            if b.unlocked_at:
-                # 称号を追加（辞書に変換）
-                badge_dict = {
-                    'id': b.id,
-                    'name': b.name,
-                    'constellation_name': b.constellation_name,
-                    'title': get_title_for_constellation(b.constellation_name)
-                }
-                unlocked_badges.append(badge_dict)
-    except Exception as e:
-        print(f"Badge title error: {e}")
+    # ローカルの生命体と獲得済みバッジ（クラウドの応答待ちの間にスレッドで読む）
+    local = asyncio.ensure_future(asyncio.to_thread(load_friends_local))
     
     if is_logged_in:
+        user_id = session.get('user_id')
+        # フレンドコード（ユーザーID短縮版）
+        my_friend_code = user_id[:8].upper() if user_id else None
         try:
-            cloud_db = get_cloud_db()
-            user_id = session.get('user_id')
-            
-            # プロフィール取得
-            user_profile = cloud_db.get_profile(user_id)
+            # プロフィール・フレンド一覧・承認待ち・クラウドの生命体を同時に取得
+            async with new_async_client() as client:
+                cloud = await AsyncSupabaseDB(get_auth(), client).get_friends_page(user_id)
+            user_profile = cloud['profile']
+            friends_list = cloud['friends_list']
+            pending_requests = cloud['pending_requests']
+            my_creature_cloud = cloud['creature']
             
             # セッションにプロフィールデータを同期
             if user_profile:
                 session['user_nickname'] = user_profile.get('nickname', '')
                 session['user_title'] = user_profile.get('constellation_badge', '')
-            
-            # フレンドコード（ユーザーID短縮版）
-            my_friend_code = user_id[:8].upper() if user_id else None
-            
-            # フレンド一覧取得（承認済み）
-            friends_list = cloud_db.get_friends_list(user_id) or []
-            
-            # 承認待ちリクエスト取得
-            pending_requests = cloud_db.get_pending_requests(user_id) or []
-            
-            # クラウドの生命体取得
-            my_creature_cloud = cloud_db.get_creature(user_id)
         except Exception as e:
             print(f"Friend data error: {e}")
     
+    local_creature, unlocked_badges = await local
+    has_local_creature = local_creature and local_creature.status in ['active', 'completed']
+    
     return render_template('pages/friends.html',
                          is_logged_in=is_logged_in,
                          user_profile=user_profile,
@@ -783,6 +1585,29 @@ def friends():
                          user_nickname=session.get('user_nickname'))
 
 
+def load_friends_local():
+    """フレンド画面のローカルデータ（生命体と、称号選択用の獲得済みバッジ）"""
+    local_creature = get_creature_system().get_creature()
+    
+    unlocked_badges = []
+    try:
+        from moon_tasker.logic.titles import get_title_for_constellation
+        all_badges = get_db().get_all_badges()
+        for b in all_badges:
+            if b.unlocked_at:
+                # 称号を追加（辞書に変換）
+                badge_dict = {
+                    'id': b.id,
+                    'name': b.name,
+                    'constellation_name': b.constellation_name,
+                    'title': get_title_for_constellation(b.constellation_name)
+                }
+                unlocked_badges.append(badge_dict)
+    except Exception as e:
+        print(f"Badge title error: {e}")
+    return local_creature, unlocked_badges
+
+
 @app.route('/friends/login', methods=['POST'])
 def friends_login():
     """ログイン処理"""
@@ -801,7 +1626,8 @@ def friends_login():
         if result.get('error'):
             return render_template('partials/login_error.html', error=result['error'])
         
-        # セッションにユーザー情報を保存
+        # セッションにユーザー情報を保存（ログイン前のセッションIDは使えなくする）
+        session.regenerate()
         session['user_id'] = auth.user_id
         session['user_email'] = email
         session['access_token'] = auth._access_token
@@ -852,6 +1678,7 @@ def friends_signup():
             cloud_db = get_cloud_db()
             cloud_db.upsert_profile(auth.user_id, nickname)
             
+            session.regenerate()
             session['user_id'] = auth.user_id
             session['user_email'] = email
             session['user_nickname'] = nickname
@@ -1054,7 +1881,7 @@ def view_friend_creature(friend_id):
                 emotion = 'content'
             else:
                 emotion = 'sad'
-            creature_image = f'/static/images/creature/stage{stage}_{emotion}.png'
+            creature_image = asset_url('static', filename=f'images/creature/stage{stage}_{emotion}.png')
         
         return render_template('pages/friend_creature.html',
                              friend_creature=friend_creature,
@@ -1165,6 +1992,44 @@ def sync_download():
 
 # ============ LOCAL STORAGE API ============
 
+MOON_CALENDAR_MAX_DAYS = {'day': 3660, 'hour': 366}
+
+
+@app.route('/api/moon-calendar')
+def api_moon_calendar():
+    """期間内の月齢をまとめて返す（?start=YYYY-MM-DD&end=YYYY-MM-DD&resolution=day|hour）"""
+    resolution = request.args.get('resolution', 'day')
+    if resolution not in MOON_CALENDAR_MAX_DAYS:
+        return jsonify({'success': False, 'error': 'resolution は day か hour です'}), 400
+    
+    today = datetime.now().date()
+    start = parse_date(request.args.get('start')) or today.replace(day=1)
+    end = parse_date(request.args.get('end')) or (start + timedelta(days=30))
+    if end < start or (end - start).days >= MOON_CALENDAR_MAX_DAYS[resolution]:
+        return jsonify({'success': False, 'error': '期間が長すぎるか、終了日が開始日より前です'}), 400
+    
+    try:
+        calendar = moon_calc.get_phase_calendar(start, end, resolution)
+    except (OverflowError, ValueError):
+        # 西暦1年付近などでローカル時刻に変換できない
+        return jsonify({'success': False, 'error': '対応していない日付です'}), 400
+    return jsonify({
+        'success': True,
+        'resolution': resolution,
+        'days': [
+            {
+                'time': row['time'].isoformat(timespec='minutes'),
+                'phase': row['phase'],
+                'emoji': row['emoji'],
+                'name': row['name'],
+                'is_new_moon': row['is_new_moon'],
+                'is_full_moon': row['is_full_moon'],
+            }
+            for row in calendar.to_rows()
+        ]
+    })
+
+
 @app.route('/api/restore-local', methods=['POST'])
 def restore_from_local():
     """localStorageからデータを復元"""
@@ -1247,9 +2112,67 @@ def server_error(e):
     return render_template('pages/500.html'), 500
 
 
+# ============ APP FACTORY / WARMUP ============
+
+def precompile_templates():
+    """全テンプレートをコンパイルしてJinjaのキャッシュに載せる"""
+    names = app.jinja_env.list_templates(extensions=['html'])
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def load_catalogs():
+    """バッジ・称号・月相表の定義を読み込む（生命体の定義はクラス属性なので読み込み済み）"""
+    import moon_tasker.logic.titles  # 称号の定義（ハンドラの中で遅延importしている）
+    badges = Database().get_all_badges()
+    today = datetime.now().date()
+    moon_calc.get_phase_calendar(today, today)  # 月相表とNumPy
+    return len(badges)
+
+
+def open_http_pools():
+    """Supabaseクライアント（.envの読み込み）とSSLコンテキストを用意（接続はワーカーごと）"""
+    from moon_tasker.cloud.supabase_client import get_ssl_context
+    get_ssl_context()
+
+
+def warmup_app():
+    """
+    最初のリクエストより前に行う準備（gunicorn --preload ならforkの前に1回だけ）
+    
+    スキーマの作成・マイグレーション、テンプレートのコンパイル、定義の読み込み、
+    HTTPの準備を行い、各段階の所要時間（ミリ秒）を返す。
+    """
+    timings = {}
+    for name, step in (('schema', Database),
+                       ('templates', precompile_templates),
+                       ('catalogs', load_catalogs),
+                       ('http', open_http_pools)):
+        t0 = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"Warmup error ({name}): {e}")
+        timings[name] = (time.perf_counter() - t0) * 1000
+    print("Warmup: " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in timings.items()))
+    return timings
+
+
+def create_app(warmup: bool = True):
+    """
+    アプリを返す（gunicorn --preload "app:create_app()" で使う）
+    
+    ルートはこのモジュールの読み込み時に登録済み。warmup=True なら準備を済ませてから返す。
+    """
+    if warmup:
+        warmup_app()
+    return app
+
+
 # ============ MAIN ============
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8080))
     debug = os.environ.get('FLASK_DEBUG', 'false').lower() == 'true'
-    app.run(host='0.0.0.0', port=port, debug=debug)
+    create_app().run(host='0.0.0.0', port=port, debug=debug)
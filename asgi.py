@@ -0,0 +1,86 @@
+"""
+Moon Tasker - ASGIエントリポイント（Dockerfile の既定の起動方法）
+
+    uvicorn asgi:application --host 0.0.0.0 --port 8080 --workers 2
+
+Flaskアプリをスレッドプール（ASGI_THREADS、既定16）で動かす。async のルート（/friends）は
+Supabaseへのリクエストを同時に送るので、スレッドを持つ時間が最も遅い1本分になる。
+SSE（/events）はここで非同期に配信し、接続中もスレッドを占有しない（ワーカーごとの上限は
+SSE_ASYNC_MAX_STREAMS）。ホーム・図鑑・ムーンサイクル・タイマーの画面はどれも /events に
+接続するので、SSEを使うならこちらで動かす。gunicorn（スレッド）で動かす場合は gunicorn.conf.py を使う。
+"""
+import asyncio
+import os
+
+from a2wsgi import WSGIMiddleware
+from werkzeug.test import EnvironBuilder
+
+import app as web
+
+SSE_ASYNC_MAX_STREAMS = int(os.environ.get('SSE_ASYNC_MAX_STREAMS', '1000'))
+SSE_ASYNC_MAX_SECONDS = float(os.environ.get('SSE_ASYNC_MAX_SECONDS', '3600'))
+SSE_POLL_SECONDS = 0.25
+
+flask_app = web.create_app()
+wsgi_application = WSGIMiddleware(flask_app, workers=int(os.environ.get('ASGI_THREADS', '16')))
+sse_streams = {'open': 0}
+
+
+def open_event_stream(scope):
+    """リクエストのCookieからセッションを開き、SSE接続の準備をする（スレッドで呼ぶ）"""
+    headers = {key.decode('latin-1'): value.decode('latin-1') for key, value in scope['headers']}
+    environ = EnvironBuilder(path=scope['path'], headers=headers).get_environ()
+    with flask_app.request_context(environ):
+        return web.prepare_event_stream(headers.get('last-event-id'))
+
+
+async def event_stream(scope, receive, send):
+    """SSE: タイマーのtick・バッジ獲得・進化・サイクル進捗をプッシュ（/events の非同期版）"""
+    if sse_streams['open'] >= SSE_ASYNC_MAX_STREAMS:
+        await send({'type': 'http.response.start', 'status': 503, 'headers': [(b'retry-after', b'30')]})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    sse_streams['open'] += 1
+    try:
+        owner, backlog, timer = await asyncio.to_thread(open_event_stream, scope)
+        stream = web.EventStream(web.broadcaster, owner, backlog, timer, max_seconds=SSE_ASYNC_MAX_SECONDS)
+        disconnected = asyncio.Event()
+
+        async def watch_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            disconnected.set()
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ]})
+            await send({'type': 'http.response.body', 'body': stream.opening().encode('utf-8'),
+                        'more_body': True})
+            while not stream.closed and not disconnected.is_set():
+                frames = stream.poll(timeout=0)
+                if frames:
+                    await send({'type': 'http.response.body', 'body': ''.join(frames).encode('utf-8'),
+                                'more_body': True})
+                try:
+                    await asyncio.wait_for(disconnected.wait(), SSE_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+            if not disconnected.is_set():
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            watcher.cancel()
+            stream.close()
+    finally:
+        sse_streams['open'] -= 1
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == '/events':
+        await event_stream(scope, receive, send)
+    else:
+        await wsgi_application(scope, receive, send)
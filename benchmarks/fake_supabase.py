@@ -0,0 +1,226 @@
+"""
+ベンチマーク用の偽Supabase（PostgRESTと認証の、SupabaseDB・SupabaseAuthが使う範囲だけ）
+
+- GET    /rest/v1/<テーブル>?列=eq.値&列=in.(a,b)&order=列.desc&limit=N&select=task_id,user_tasks(*)
+- POST   /rest/v1/<テーブル>（Prefer: return=representation / resolution=merge-duplicates・on_conflict）
+- PATCH / DELETE /rest/v1/<テーブル>?列=eq.値
+- POST   /auth/v1/token?grant_type=password・/auth/v1/signup（どのパスワードでも通る）
+
+latency 秒待ってから応答し、リクエスト数をメソッド・テーブルごとに数える。
+単体でも起動できる（別プロセスのサーバーを向けるとき）:
+
+    python -m benchmarks.fake_supabase --port 54321 --latency 0.05
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+# select=...,user_tasks(*) の埋め込み: テーブル → 参照する列
+EMBEDS = {"user_tasks": "task_id"}
+# resolution=merge-duplicates で on_conflict がないときの重複判定の列
+UNIQUE_COLUMNS = {"profiles": ("user_id",), "creatures": ("user_id",)}
+USER_NAMESPACE = uuid.UUID("8f3b6a52-4c1e-4d5e-9a7b-2f1c0d9e8a61")
+
+
+def fake_user_id(email: str) -> str:
+    """偽の認証が返すユーザーID（メールアドレスから決まる）"""
+    return str(uuid.uuid5(USER_NAMESPACE, email))
+
+
+def _matches(row: dict, column: str, expression: str) -> bool:
+    op, _, value = expression.partition(".")
+    if op == "eq":
+        return str(row.get(column)) == value
+    if op == "in":
+        return str(row.get(column)) in value.strip("()").split(",")
+    return True
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # 同時接続が多いので待ち行列を広げる（既定の5では接続が1秒単位で再送される）
+    request_queue_size = 128
+
+
+class FakeSupabase:
+    """別スレッドで動く偽のSupabaseサーバー"""
+
+    def __init__(self, tables: Dict[str, List[dict]], latency: float = 0.05, port: int = 0):
+        self.tables = tables
+        self.latency = latency
+        self.requests = 0
+        self.counts = Counter()  # "GET profiles" などごとのリクエスト数
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def do_PATCH(self):
+                self._handle("PATCH")
+
+            def do_DELETE(self):
+                self._handle("DELETE")
+
+            def _handle(self, method: str):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or "null") if length else None
+                endpoint = parts.path.rsplit("/", 1)[-1]
+                with fake._lock:
+                    fake.requests += 1
+                    fake.counts[f"{method} {endpoint}"] += 1
+                time.sleep(fake.latency)
+
+                if parts.path.startswith("/auth/v1/"):
+                    status, body = fake._auth(endpoint, payload or {})
+                else:
+                    params = parse_qsl(parts.query)
+                    prefer = self.headers.get("Prefer", "")
+                    with fake._lock:
+                        status, body = fake._rest(method, endpoint, params, payload, prefer)
+                data = b"" if body is None else json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = _Server(("127.0.0.1", port), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    # ===== 認証 =====
+
+    def _auth(self, endpoint: str, payload: dict):
+        email = payload.get("email", "")
+        if not email:
+            return 400, {"error_description": "email required"}
+        user_id = fake_user_id(email)
+        return 200, {"access_token": f"fake-{user_id}",
+                     "user": {"id": user_id, "email": email, "user_metadata": {}}}
+
+    # ===== PostgREST =====
+
+    def _rest(self, method: str, table: str, params: list, payload, prefer: str):
+        rows = self.tables.setdefault(table, [])
+        filters = [(k, v) for k, v in params if k not in ("select", "order", "limit", "on_conflict")]
+        matched = [r for r in rows if all(_matches(r, k, v) for k, v in filters)]
+        representation = "return=representation" in prefer
+
+        if method == "GET":
+            return 200, self._select(matched, dict(params))
+        if method == "POST":
+            conflict = dict(params).get("on_conflict")
+            columns = tuple(conflict.split(",")) if conflict else UNIQUE_COLUMNS.get(table, ("id",))
+            merge = "merge-duplicates" in prefer
+            written = [self._insert(rows, dict(new), columns, merge)
+                       for new in (payload if isinstance(payload, list) else [payload])]
+            return 201, written if representation else None
+        if method == "PATCH":
+            for row in matched:
+                row.update(payload or {})
+            return (200, matched) if representation else (204, None)
+        if method == "DELETE":
+            self.tables[table] = [r for r in rows if not any(r is m for m in matched)]
+            return 204, None
+        return 405, {"message": "method not allowed"}
+
+    def _insert(self, rows: List[dict], new: dict, columns: tuple, merge: bool) -> dict:
+        if merge:
+            for row in rows:
+                if all(c in new and str(row.get(c)) == str(new[c]) for c in columns):
+                    row.update(new)
+                    return row
+        new.setdefault("id", str(uuid.uuid4()))
+        new.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+        rows.append(new)
+        return new
+
+    def _select(self, rows: List[dict], params: dict) -> List[dict]:
+        rows = list(rows)
+        order = params.get("order")
+        if order:
+            column, _, direction = order.partition(".")
+            rows.sort(key=lambda r: str(r.get(column)), reverse=direction == "desc")
+        if params.get("limit"):
+            rows = rows[:int(params["limit"])]
+        embeds = [item[:-3] for item in params.get("select", "").split(",") if item.endswith("(*)")]
+        if not embeds:
+            return rows
+        result = []
+        for row in rows:
+            row = dict(row)
+            for table in embeds:
+                key = row.get(EMBEDS.get(table, f"{table}_id"))
+                row[table] = next((r for r in self.tables.get(table, []) if str(r.get("id")) == str(key)), None)
+            result.append(row)
+        return result
+
+    def add_rows(self, tables: Dict[str, List[dict]]):
+        """行を追加する（起動後でもよい）"""
+        with self._lock:
+            for table, rows in tables.items():
+                self.tables.setdefault(table, []).extend(rows)
+
+    def start(self) -> "FakeSupabase":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def friends_tables(user_id: str, friends: int = 5, pending: int = 3,
+                   prefix: str = "user") -> Dict[str, List[dict]]:
+    """フレンド画面用のデータ（承認済み friends 人・承認待ち pending 件）"""
+    profiles = [{"user_id": user_id, "nickname": "me", "constellation_badge": ""}]
+    requests = []
+    for i in range(friends + pending):
+        other = f"{prefix}-{i:04d}"
+        profiles.append({"user_id": other, "nickname": f"friend{i}", "constellation_badge": "オリオン座"})
+        accepted = i < friends
+        # 承認済みは送信・受信を半々に
+        sender, receiver = (user_id, other) if accepted and i % 2 == 0 else (other, user_id)
+        requests.append({"id": f"{prefix}-req-{i}", "from_user_id": sender, "to_user_id": receiver,
+                         "status": "accepted" if accepted else "pending"})
+    creatures = [{"user_id": user_id, "name": "ルナ", "evolution_stage": 2, "created_at": "2026-01-01"}]
+    return {"profiles": profiles, "friend_requests": requests, "creatures": creatures}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="偽のSupabase（PostgREST・認証）を起動")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency", type=float, default=0.05, help="応答時間（秒）")
+    args = parser.parse_args(argv)
+
+    fake = FakeSupabase({}, args.latency, port=args.port)
+    print(f"fake supabase on {fake.url} (latency {args.latency * 1000:.0f} ms)")
+    print(f"  SUPABASE_URL={fake.url} SUPABASE_KEY=benchmark")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake.server.server_close()
+        print(json.dumps(dict(fake.counts), ensure_ascii=False, indent=1))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
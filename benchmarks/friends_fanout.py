@@ -0,0 +1,117 @@
+"""
+フレンド画面のクラウド取得の負荷テスト
+
+偽のSupabase（1リクエスト latency 秒）に対して、gunicornのスレッド数と同じ
+ワーカー数で requests 回ずつ取得し、スループットと待ち時間を比べる。
+
+- sequential: 従来のスレッド実行（get_profile → get_friends_list → get_pending_requests
+  → get_creature を順番に。フレンドのプロフィールは1人1リクエスト）
+- concurrent: AsyncSupabaseDB.get_friends_page（同時に送り、プロフィールはまとめて取得）
+- /friends:   Flaskのテストクライアントで async の /friends 全体（SQLite・描画を含む）
+
+同じプロセスの中の比較なので、gunicorn と uvicorn の違いは benchmarks/server_compare.py で見る。
+
+    python -m benchmarks.friends_fanout --latency 0.05 --threads 4 --requests 40
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_supabase import FakeSupabase, friends_tables
+
+USER_ID = "me-0000"
+
+
+def measure(label: str, fn: Callable, fake: FakeSupabase, threads: int, requests: int) -> dict:
+    fn()  # 接続・インポートのウォームアップ
+    before = fake.requests
+    latencies: List[float] = []
+
+    def one(_):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "label": label,
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "upstream_per_request": (fake.requests - before) / requests,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="フレンド画面のクラウド取得の負荷テスト")
+    parser.add_argument("--latency", type=float, default=0.05, help="偽Supabaseの応答時間（秒）")
+    parser.add_argument("--threads", type=int, default=4, help="ワーカースレッド数（gunicornの--threads）")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--friends", type=int, default=5)
+    parser.add_argument("--pending", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    fake = FakeSupabase(friends_tables(USER_ID, args.friends, args.pending), args.latency).start()
+    os.environ["SUPABASE_URL"] = fake.url
+    os.environ["SUPABASE_KEY"] = "benchmark"
+    os.chdir(tempfile.mkdtemp())
+
+    import app as web
+    from moon_tasker.cloud.supabase_client import AsyncSupabaseDB, get_auth, get_cloud_db, new_async_client
+
+    web.timer_sessions._thread = object()  # タイマーのバックグラウンドスレッドは起動しない
+    cloud_db = get_cloud_db()
+
+    def sequential():
+        cloud_db.get_profile(USER_ID)
+        cloud_db.get_friends_list(USER_ID)
+        cloud_db.get_pending_requests(USER_ID)
+        cloud_db.get_creature(USER_ID)
+
+    async def fetch():
+        async with new_async_client() as client:
+            return await AsyncSupabaseDB(get_auth(), client).get_friends_page(USER_ID)
+
+    def concurrent():
+        asyncio.run(fetch())
+
+    client = web.app.test_client()
+    with client.session_transaction() as s:
+        s["user_id"] = USER_ID
+
+    def page():
+        assert client.get("/friends").status_code == 200
+
+    try:
+        results = [
+            measure("sequential", sequential, fake, args.threads, args.requests),
+            measure("concurrent", concurrent, fake, args.threads, args.requests),
+            measure("/friends", page, fake, args.threads, args.requests),
+        ]
+    finally:
+        fake.stop()
+
+    print(f"latency={args.latency * 1000:.0f} ms  threads={args.threads}  requests={args.requests}  "
+          f"friends={args.friends}  pending={args.pending}")
+    for r in results:
+        print(f"{r['label']:<11} {r['rps']:7.1f} req/s  p50={r['p50_ms']:7.1f} ms  "
+              f"p95={r['p95_ms']:7.1f} ms  upstream={r['upstream_per_request']:.0f}/req")
+    speedup = results[1]["rps"] / results[0]["rps"]
+    print(f"concurrent vs sequential throughput: x{speedup:.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+"""
+シナリオ付きの負荷テスト
+
+仮想ユーザー（スレッド）がそれぞれのCookieを持ち、重み付きで次のシナリオを繰り返す。
+Supabaseは偽のサーバー（benchmarks/fake_supabase.py、latency 秒）に向ける。
+
+- guest:    ゲストの閲覧（ホーム・月の周期・星座図鑑・生命体・タスク管理・フレンド）
+- focus:    集中セッション（タイマー画面 → プレイリストのタスク → /timer/complete を繰り返す）
+- playlist: プレイリスト編集（作成・タスク作成・追加・並べ替え・削除、HTMXの部分更新）
+- cloud:    ログインユーザー（ログイン → フレンド → 生命体の同期 → アップロード/ダウンロード → ログアウト）
+
+ルートごとの p50/p95/p99・エラー数、シナリオごとの所要時間、全体のスループット、
+偽Supabaseへのリクエスト数をJSONで出力する。
+
+    # アプリを同じプロセスで動かす（Flaskのテストクライアント）
+    python -m benchmarks.load_test --users 8 --duration 20 --latency 0.05
+
+    # 起動中のサーバーに対して（サーバーは SUPABASE_URL=http://127.0.0.1:54321 で起動しておく）
+    python -m benchmarks.load_test --url http://127.0.0.1:8080 --supabase-port 54321
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_supabase import FakeSupabase, fake_user_id, friends_tables
+
+HTMX = {"HX-Request": "true"}
+DEFAULT_MIX = "guest=4,focus=3,playlist=2,cloud=1"
+
+
+class Recorder:
+    """ルート・シナリオごとの応答時間とエラー"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.journeys: Dict[str, List[float]] = defaultdict(list)
+        self.journey_errors: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, route: str, seconds: float, ok: bool):
+        with self._lock:
+            self.latencies[route].append(seconds)
+            if not ok:
+                self.errors[route] += 1
+
+    def add_journey(self, name: str, seconds: float, ok: bool):
+        with self._lock:
+            self.journeys[name].append(seconds)
+            if not ok:
+                self.journey_errors[name] += 1
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """最近順位法のパーセンタイル"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def summarize(values: List[float], errors: int) -> dict:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+    }
+
+
+class JourneyFailed(Exception):
+    """シナリオを続けられない応答（想定外のステータス）"""
+
+
+class VirtualUser:
+    """
+    Cookieを持つ1人のユーザー
+
+    client はFlaskのテストクライアントか httpx.Client（どちらも get/post と
+    status_code・headers・text を持つ）。route にはIDを伏せたルート名を渡す。
+    """
+
+    def __init__(self, index: int, client, recorder: Recorder, seed: int, focus_loops: int):
+        self.index = index
+        self.client = client
+        self.recorder = recorder
+        self.random = random.Random(seed + index)
+        self.focus_loops = focus_loops
+        self.email = f"load-{seed}-{index}@example.com"
+        self.has_creature = False
+
+    def request(self, method: str, route: str, path: str, data: dict = None,
+                headers: dict = None, expect=(200, 302, 304)):
+        t0 = time.perf_counter()
+        try:
+            if method == "GET":
+                response = self.client.get(path, headers=headers)
+            else:
+                response = self.client.post(path, data=data or {}, headers=headers)
+        except Exception as e:
+            self.recorder.add(f"{method} {route}", time.perf_counter() - t0, False)
+            raise JourneyFailed(f"{method} {path}: {e}")
+        ok = response.status_code in expect
+        self.recorder.add(f"{method} {route}", time.perf_counter() - t0, ok)
+        if not ok:
+            raise JourneyFailed(f"{method} {path}: {response.status_code}")
+        return response
+
+    def text(self, response) -> str:
+        return response.get_data(as_text=True) if hasattr(response, "get_data") else response.text
+
+    def new_key(self) -> str:
+        return f"{self.index}-{self.random.getrandbits(64):x}"
+
+    # ===== シナリオ =====
+
+    def guest(self):
+        for page in ("/", "/moon-cycle", "/collection", "/creature", "/playlist", "/friends"):
+            self.request("GET", page, page)
+
+    def _create_playlist_with_tasks(self, count: int):
+        """プレイリストとタスクを作り (playlist_id, [task_id]) を返す"""
+        response = self.request("POST", "/playlist/create", "/playlist/create",
+                                {"name": f"load {self.new_key()}"})
+        playlist_id = response.headers["Location"].rsplit("=", 1)[-1]
+        body = ""
+        for i in range(count):
+            response = self.request("POST", "/task/create", "/task/create",
+                                    {"title": f"task {i}", "difficulty": str(self.random.randint(1, 5)),
+                                     "duration": "25", "break_duration": "5",
+                                     "selected_playlist": playlist_id, "idempotency_key": self.new_key()},
+                                    headers=HTMX)
+            body = self.text(response)
+        task_ids = list(dict.fromkeys(re.findall(r"/remove/([\w-]+)\"", body)))
+        return playlist_id, task_ids
+
+    def focus(self):
+        if not self.has_creature:
+            self.request("POST", "/creature/start", "/creature/start", {"name": "ルナ"})
+            self.has_creature = True
+        self.request("GET", "/timer", "/timer")
+        playlist_id, task_ids = self._create_playlist_with_tasks(2)
+        self.request("GET", "/timer/playlist/<id>/tasks", f"/timer/playlist/{playlist_id}/tasks")
+        for i in range(self.focus_loops):
+            task_id = task_ids[i % len(task_ids)]
+            self.request("POST", "/timer/complete", "/timer/complete", {"task_id": task_id, "duration": "25"})
+        self.request("POST", "/playlist/<id>/delete", f"/playlist/{playlist_id}/delete")
+
+    def playlist(self):
+        playlist_id, task_ids = self._create_playlist_with_tasks(3)
+        self.request("GET", "/playlist?selected=<id>", f"/playlist?selected={playlist_id}")
+        base = f"/playlist/{playlist_id}"
+        self.request("POST", "/playlist/<id>/add/<task_id>", f"{base}/add/{task_ids[0]}",
+                     {"idempotency_key": self.new_key()}, headers=HTMX)
+        for direction in ("down", "up"):
+            self.request("POST", "/playlist/<id>/move/<task_id>/<direction>",
+                         f"{base}/move/{self.random.choice(task_ids)}/{direction}", headers=HTMX)
+        self.request("POST", "/playlist/<id>/remove/<task_id>", f"{base}/remove/{task_ids[-1]}", headers=HTMX)
+        self.request("POST", "/playlist/<id>/delete", f"{base}/delete")
+
+    def cloud(self):
+        self.request("POST", "/friends/login", "/friends/login",
+                     {"email": self.email, "password": "benchmark"}, expect=(302,))
+        try:
+            self.request("GET", "/friends", "/friends")
+            self.request("GET", "/playlist", "/playlist")
+            self.request("POST", "/friends/sync-creature", "/friends/sync-creature")
+            self.request("POST", "/sync/upload", "/sync/upload", expect=(200,))
+            self.request("POST", "/sync/download", "/sync/download", expect=(200,))
+        finally:
+            self.request("POST", "/friends/logout", "/friends/logout")
+
+
+JOURNEYS = ("guest", "focus", "playlist", "cloud")
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in JOURNEYS:
+            raise argparse.ArgumentTypeError(f"unknown journey: {name}")
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+def run_user(user: VirtualUser, mix: Dict[str, int], deadline: float, iterations: int):
+    names = [name for name, weight in mix.items() if weight > 0]
+    weights = [mix[name] for name in names]
+    done = 0
+    while time.perf_counter() < deadline and (not iterations or done < iterations):
+        name = user.random.choices(names, weights)[0]
+        t0 = time.perf_counter()
+        ok = True
+        try:
+            getattr(user, name)()
+        except JourneyFailed as e:
+            ok = False
+            print(f"[LOAD_TEST] {name} failed: {e}", file=sys.stderr)
+        user.recorder.add_journey(name, time.perf_counter() - t0, ok)
+        done += 1
+
+
+def make_client_factory(url: Optional[str]) -> Callable:
+    """仮想ユーザーごとのクライアントを作る関数"""
+    if url:
+        import httpx
+        return lambda: httpx.Client(base_url=url, follow_redirects=False, timeout=30.0)
+
+    os.chdir(tempfile.mkdtemp())
+    import app as web
+    web.timer_sessions._thread = object()  # タイマーのバックグラウンドスレッドは起動しない
+    web.create_app()
+    return web.app.test_client
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="シナリオ付きの負荷テスト（偽のSupabaseを使う）")
+    parser.add_argument("--users", type=int, default=8, help="同時に動く仮想ユーザー数")
+    parser.add_argument("--duration", type=float, default=20.0, help="実行時間（秒）")
+    parser.add_argument("--iterations", type=int, default=0, help="1ユーザーあたりのシナリオ数（0なら時間まで）")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"シナリオの重み（既定: {DEFAULT_MIX}）")
+    parser.add_argument("--focus-loops", type=int, default=5, help="focus で /timer/complete を送る回数")
+    parser.add_argument("--latency", type=float, default=0.05, help="偽Supabaseの応答時間（秒）")
+    parser.add_argument("--url", help="起動中のサーバー（省略時は同じプロセスでテストクライアント）")
+    parser.add_argument("--supabase-port", type=int, default=0, help="偽Supabaseのポート（--url のときに固定する）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSONの出力先（省略時は標準出力）")
+    args = parser.parse_args(argv)
+
+    fake = FakeSupabase({}, args.latency, port=args.supabase_port).start()
+    # ログインするユーザーのフレンド・プロフィール
+    for index in range(args.users):
+        user_id = fake_user_id(f"load-{args.seed}-{index}@example.com")
+        fake.add_rows(friends_tables(user_id, prefix=f"friend-{index}"))
+    os.environ["SUPABASE_URL"] = fake.url
+    os.environ["SUPABASE_KEY"] = "benchmark"
+    if args.url:
+        print(f"fake supabase: {fake.url} (start the server with SUPABASE_URL={fake.url})", file=sys.stderr)
+
+    # アプリのログ（print）でJSONの出力が崩れないよう、実行中の標準出力は標準エラーに回す
+    with contextlib.redirect_stdout(sys.stderr):
+        new_client = make_client_factory(args.url)
+        recorder = Recorder()
+        users = [VirtualUser(i, new_client(), recorder, args.seed, args.focus_loops) for i in range(args.users)]
+
+        t0 = time.perf_counter()
+        deadline = t0 + args.duration
+        threads = [threading.Thread(target=run_user, args=(user, args.mix, deadline, args.iterations))
+                   for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - t0
+        fake.stop()
+
+    total = sum(len(values) for values in recorder.latencies.values())
+    report = {
+        "config": {"target": args.url or "in-process", "users": args.users, "duration_s": args.duration,
+                   "iterations": args.iterations, "mix": args.mix, "focus_loops": args.focus_loops,
+                   "supabase_latency_ms": args.latency * 1000, "seed": args.seed},
+        "elapsed_s": round(elapsed, 3),
+        "requests": total,
+        "errors": sum(recorder.errors.values()),
+        "throughput_rps": round(total / elapsed, 2),
+        "routes": {route: summarize(values, recorder.errors[route])
+                   for route, values in sorted(recorder.latencies.items())},
+        "journeys": {name: summarize(values, recorder.journey_errors[name])
+                     for name, values in sorted(recorder.journeys.items())},
+        "supabase": {"requests": fake.requests, "by_endpoint": dict(sorted(fake.counts.items()))},
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+月齢カレンダーのベンチマーク
+
+1年分（毎日・毎正時）の月齢と名前・絵文字を、1日ずつの計算（従来）と
+まとめて計算する get_phase_calendar で求め、時間と結果の一致を比べる。
+あわせて、平均周期（29.53日）による近似と月相表の新月・満月の時刻の差を求める。
+
+    python -m benchmarks.moon_calendar_benchmark --year 2026
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moon_tasker.logic.moon_cycle import MoonCycleCalculator
+from moon_tasker.logic.lunation_table import NEW_MOON, FULL_MOON, get_lunation_table
+
+
+def scalar(calc: MoonCycleCalculator, times: List[datetime]) -> List[tuple]:
+    return [(calc.get_moon_emoji(t), calc.get_moon_phase_name(t)) for t in times]
+
+
+def run(year: int, resolution: str) -> dict:
+    calc = MoonCycleCalculator()
+    start, end = date(year, 1, 1), date(year, 12, 31)
+    # NumPyの読み込み（初回のみ）は計測に含めない
+    calc.get_phase_calendar(start, start)
+
+    t0 = time.perf_counter()
+    calendar = calc.get_phase_calendar(start, end, resolution)
+    batch = list(zip(calendar.emojis(), calendar.names()))
+    batch_s = time.perf_counter() - t0
+
+    times = calendar.times.astype(datetime).tolist()
+    t0 = time.perf_counter()
+    expected = scalar(calc, times)
+    scalar_s = time.perf_counter() - t0
+
+    return {
+        "resolution": resolution,
+        "points": len(times),
+        "scalar_ms": scalar_s * 1000,
+        "batch_ms": batch_s * 1000,
+        "speedup": scalar_s / batch_s if batch_s else float("inf"),
+        "mismatches": sum(1 for a, b in zip(batch, expected) if a != b),
+    }
+
+
+def approximation_error(start_year: int, end_year: int) -> dict:
+    """平均周期で求めた新月・満月と月相表（ephem）の時刻の差（時間）"""
+    table = get_lunation_table()
+    cycle = MoonCycleCalculator.LUNAR_CYCLE
+    epoch = MoonCycleCalculator.KNOWN_NEW_MOON.replace(tzinfo=timezone.utc)
+    start = datetime(start_year, 1, 1, tzinfo=timezone.utc).timestamp()
+    end = datetime(end_year + 1, 1, 1, tzinfo=timezone.utc).timestamp()
+
+    errors = {NEW_MOON: [], FULL_MOON: []}
+    for index in range(len(table)):
+        ts = table.time_at(index)
+        kind = table.kind_at(index)
+        if kind not in errors or not start <= ts < end:
+            continue
+        # 近似: 基準の新月から周期の整数倍（満月は半周期ずらす）で最も近い時刻
+        offset = 0.5 if kind == FULL_MOON else 0.0
+        days = (datetime.fromtimestamp(ts, timezone.utc) - epoch).total_seconds() / 86400
+        approx = (round(days / cycle - offset) + offset) * cycle
+        errors[kind].append(abs(approx - days) * 24)
+
+    return {
+        "new_moon_max_h": max(errors[NEW_MOON]),
+        "full_moon_max_h": max(errors[FULL_MOON]),
+        "mean_h": sum(errors[NEW_MOON] + errors[FULL_MOON]) / len(errors[NEW_MOON] + errors[FULL_MOON]),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="月齢カレンダーのベンチマーク")
+    parser.add_argument("--year", type=int, default=datetime.now().year)
+    args = parser.parse_args(argv)
+
+    results = [run(args.year, "day"), run(args.year, "hour")]
+    for r in results:
+        print(f"{r['resolution']:<5} points={r['points']:>5}  scalar={r['scalar_ms']:8.2f} ms  "
+              f"batch={r['batch_ms']:7.2f} ms  x{r['speedup']:.1f}  mismatches={r['mismatches']}")
+
+    if get_lunation_table() is not None:
+        error = approximation_error(args.year - 10, args.year + 10)
+        print(f"mean-cycle approximation vs lunation table ({args.year - 10}-{args.year + 10}): "
+              f"new moon max {error['new_moon_max_h']:.1f} h, full moon max {error['full_moon_max_h']:.1f} h, "
+              f"mean {error['mean_h']:.1f} h")
+    return 0 if all(r["mismatches"] == 0 for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""
+スケジュール最適化ベンチマーク
+
+ScheduleOptimizer / GeneticScheduleOptimizer の速度と品質を計測し、
+リリース間で比較できるJSONレポートを出力する。
+
+    python -m benchmarks.schedule_benchmark --output schedule_benchmark.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moon_tasker import __version__
+from moon_tasker.models import Task, LifestyleSettings
+from moon_tasker.logic.schedule_ai import (
+    ScheduleOptimizer, GeneticScheduleOptimizer, AnnealingScheduleOptimizer, PositionWeightModel
+)
+
+
+DEFAULT_SIZES = [5, 20, 100, 500]
+
+# 厳密解を求める上限
+EXACT_PERMUTATION_LIMIT = 7          # 全順列探索（n!）
+EXACT_KNAPSACK_CELL_LIMIT = 20_000_000  # ナップサックDPのセル数（n × 分）
+
+DURATION_CHOICES = [15, 25, 30, 45, 50, 60, 90, 120]
+BREAK_CHOICES = [0, 5, 5, 10, 15]
+
+
+# ===== 合成タスク生成 =====
+
+def generate_tasks(n: int, seed: int = 0) -> List[Task]:
+    """難易度・所要時間・優先度がばらついた合成タスクを生成"""
+    rng = random.Random(seed * 100003 + n)
+    tasks = []
+    for i in range(n):
+        tasks.append(Task(
+            id=i + 1,
+            title=f"synthetic-{i + 1}",
+            difficulty=rng.randint(1, 5),
+            duration=rng.choice(DURATION_CHOICES),
+            break_duration=rng.choice(BREAK_CHOICES),
+            priority=rng.randint(0, 5),
+            status="pending",
+        ))
+    return tasks
+
+
+# ===== 目的関数と厳密解 =====
+
+def alternation_rate(order: List[Task]) -> float:
+    """隣接タスクの難易度帯が切り替わる割合（バランス最適化の品質指標）"""
+    if len(order) < 2:
+        return 1.0
+
+    def band(task):
+        return 0 if task.difficulty <= 2 else (1 if task.difficulty == 3 else 2)
+
+    changes = sum(1 for a, b in zip(order, order[1:]) if band(a) != band(b))
+    return changes / (len(order) - 1)
+
+
+def knapsack_optimum(tasks: List[Task], budget: int, optimizer: ScheduleOptimizer) -> Optional[float]:
+    """時間制限内で優先度スコア合計を最大化する厳密解（0/1ナップサックDP）"""
+    if len(tasks) * (budget + 1) > EXACT_KNAPSACK_CELL_LIMIT:
+        return None
+
+    best = [0.0] * (budget + 1)
+    for task in tasks:
+        score = optimizer._calculate_priority_score(task)
+        if score <= 0:
+            continue
+        weight = task.duration + (task.break_duration or 0)
+        for minutes in range(budget, weight - 1, -1):
+            candidate = best[minutes - weight] + score
+            if candidate > best[minutes]:
+                best[minutes] = candidate
+    return best[budget]
+
+
+def permutation_optimum(n: int, fitness: Callable[[List[int]], float]) -> Optional[float]:
+    """全順列探索による適応度の厳密最大値"""
+    if n > EXACT_PERMUTATION_LIMIT:
+        return None
+    return max(fitness(list(order)) for order in itertools.permutations(range(n)))
+
+
+def _gap(objective: float, optimum: Optional[float]) -> Optional[float]:
+    """厳密解に対する相対ギャップ（0.0 = 最適）"""
+    if optimum is None:
+        return None
+    if optimum == 0:
+        return 0.0 if objective == 0 else None
+    return (optimum - objective) / abs(optimum)
+
+
+# ===== 各オプティマイザの計測 =====
+
+def bench_balanced(tasks: List[Task]) -> dict:
+    optimizer = ScheduleOptimizer()
+    start = time.perf_counter()
+    order = optimizer.generate_balanced_schedule(tasks)
+    elapsed = time.perf_counter() - start
+    return {
+        "optimizer": "ScheduleOptimizer.generate_balanced_schedule",
+        "wall_time_s": elapsed,
+        "fitness_evaluations": None,
+        "evaluations_per_s": None,
+        "objective": alternation_rate(order),
+        "objective_name": "alternation_rate",
+        "optimum": None,
+        "gap": None,
+    }
+
+
+def bench_time_limited(tasks: List[Task]) -> dict:
+    optimizer = ScheduleOptimizer()
+    # 全タスク所要時間の4割を上限とする
+    budget = int(sum(t.duration + (t.break_duration or 0) for t in tasks) * 0.4)
+
+    start = time.perf_counter()
+    selected = optimizer.optimize_schedule(tasks, budget)
+    elapsed = time.perf_counter() - start
+
+    objective = sum(optimizer._calculate_priority_score(t) for t in selected)
+    optimum = knapsack_optimum(tasks, budget, optimizer)
+    return {
+        "optimizer": "ScheduleOptimizer.optimize_schedule",
+        "time_limit": budget,
+        "wall_time_s": elapsed,
+        "fitness_evaluations": len(tasks),
+        "evaluations_per_s": len(tasks) / elapsed if elapsed > 0 else None,
+        "objective": objective,
+        "objective_name": "priority_score_sum",
+        "optimum": optimum,
+        "gap": _gap(objective, optimum),
+    }
+
+
+def bench_genetic(tasks: List[Task], lifestyle: LifestyleSettings, seed: int) -> dict:
+    optimizer = GeneticScheduleOptimizer(lifestyle, seed=seed)
+    available = optimizer._calculate_available_time()
+    blocked = optimizer._get_blocked_times()
+
+    start = time.perf_counter()
+    order = optimizer.optimize(tasks)
+    elapsed = time.perf_counter() - start
+    evaluations = optimizer.fitness_evaluations
+
+    # 返却された順序をインデックス順列に戻して同じ適応度で評価
+    index_of = {t.id: i for i, t in enumerate(tasks)}
+    individual = [index_of[t.id] for t in order]
+    scorer = GeneticScheduleOptimizer(lifestyle, seed=seed)
+    objective = scorer._fitness(individual, available, blocked)
+    optimum = permutation_optimum(
+        len(tasks), lambda ind: scorer._fitness(ind, available, blocked)
+    )
+    return {
+        "optimizer": "GeneticScheduleOptimizer.optimize",
+        "wall_time_s": elapsed,
+        "fitness_evaluations": evaluations,
+        "evaluations_per_s": evaluations / elapsed if elapsed > 0 else None,
+        "objective": objective,
+        "objective_name": "ga_fitness",
+        "optimum": optimum,
+        "gap": _gap(objective, optimum),
+    }
+
+
+def bench_annealing(tasks: List[Task], seed: int) -> dict:
+    optimizer = AnnealingScheduleOptimizer(seed=seed)
+
+    start = time.perf_counter()
+    order = optimizer.optimize(tasks)
+    elapsed = time.perf_counter() - start
+    evaluations = optimizer.fitness_evaluations
+
+    model = PositionWeightModel(tasks)
+    index_of = {t.id: i for i, t in enumerate(tasks)}
+    objective = model.score([index_of[t.id] for t in order])
+    optimum = permutation_optimum(len(tasks), model.score)
+    return {
+        "optimizer": "AnnealingScheduleOptimizer.optimize",
+        "wall_time_s": elapsed,
+        "fitness_evaluations": evaluations,
+        "evaluations_per_s": evaluations / elapsed if elapsed > 0 else None,
+        "objective": objective,
+        "objective_name": "position_weight_score",
+        "optimum": optimum,
+        "gap": _gap(objective, optimum),
+    }
+
+
+# ===== 実行 =====
+
+def run(sizes: List[int], seed: int = 0, repeat: int = 1) -> dict:
+    """全サイズ×全オプティマイザを計測してレポートを返す"""
+    lifestyle = LifestyleSettings()
+    results = []
+
+    for n in sizes:
+        tasks = generate_tasks(n, seed)
+        benches = [
+            lambda: bench_balanced(tasks),
+            lambda: bench_time_limited(tasks),
+            lambda: bench_genetic(tasks, lifestyle, seed),
+            lambda: bench_annealing(tasks, seed),
+        ]
+        for bench in benches:
+            # 複数回実行した場合は最速のものを採用
+            runs = [bench() for _ in range(max(1, repeat))]
+            best = min(runs, key=lambda r: r["wall_time_s"])
+            best["n"] = n
+            best["repeat"] = len(runs)
+            results.append(best)
+
+    return {
+        "benchmark": "schedule_optimizers",
+        "moon_tasker_version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "seed": seed,
+        "sizes": sizes,
+        "results": results,
+    }
+
+
+def format_summary(report: dict) -> str:
+    """人が読むための簡易サマリー"""
+    lines = [f"{'optimizer':<46} {'n':>5} {'time[s]':>9} {'eval/s':>11} {'objective':>11} {'gap':>8}"]
+    for r in report["results"]:
+        eps = f"{r['evaluations_per_s']:.0f}" if r["evaluations_per_s"] else "-"
+        gap = f"{r['gap']:.2%}" if r["gap"] is not None else "-"
+        lines.append(
+            f"{r['optimizer']:<46} {r['n']:>5} {r['wall_time_s']:>9.4f} {eps:>11} "
+            f"{r['objective']:>11.3f} {gap:>8}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="スケジュール最適化ベンチマーク")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="タスク数（デフォルト: 5 20 100 500）")
+    parser.add_argument("--seed", type=int, default=0, help="合成データと最適化の乱数シード")
+    parser.add_argument("--repeat", type=int, default=1, help="各計測の繰り返し回数（最速値を採用）")
+    parser.add_argument("--output", default="schedule_benchmark.json", help="JSONレポートの出力先")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, seed=args.seed, repeat=args.repeat)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+
+    print(format_summary(report))
+    print(f"\nレポートを書き出しました: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+gunicorn（スレッド）と uvicorn（ASGI）の比較
+
+それぞれを別プロセスで起動し（新しいDB・同じ偽Supabaseのポート）、
+benchmarks/load_test.py --url で同じシナリオを流して、スループットとルートごとの
+待ち時間を並べる。friends_fanout は同じプロセスの中で取得方法を比べるだけなので、
+サーバーのスレッド・ワーカー構成を含めた違いはこちらで見る。
+
+- gunicorn: gunicorn --config gunicorn.conf.py "app:create_app()"（gthread、threads=4）
+- uvicorn:  uvicorn asgi:application（ASGI_THREADS のスレッドプール、SSEは非同期）
+
+    python -m benchmarks.server_compare --workers 2 --users 16 --duration 20 --latency 0.05
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVERS = ("gunicorn", "uvicorn")
+
+
+def server_command(name: str, port: int, workers: int) -> List[str]:
+    if name == "gunicorn":
+        return [sys.executable, "-m", "gunicorn", "--config", os.path.join(ROOT, "gunicorn.conf.py"),
+                "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "app:create_app()"]
+    return [sys.executable, "-m", "uvicorn", "asgi:application", "--host", "127.0.0.1",
+            "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with {process.returncode}")
+        try:
+            if httpx.get(url, timeout=2.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server did not start: {url}")
+
+
+def run_against(name: str, args) -> dict:
+    """サーバーを起動して load_test を流し、そのレポートを返す"""
+    workdir = tempfile.mkdtemp(prefix=f"moon-{name}-")
+    url = f"http://127.0.0.1:{args.port}"
+    env = dict(os.environ, PYTHONPATH=ROOT, SUPABASE_URL=f"http://127.0.0.1:{args.supabase_port}",
+               SUPABASE_KEY="benchmark", METRICS_DIR=os.path.join(workdir, "metrics"))
+    log = open(os.path.join(workdir, "server.log"), "w")
+    process = subprocess.Popen(server_command(name, args.port, args.workers), cwd=workdir, env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    try:
+        wait_ready(url, process)
+        output = os.path.join(workdir, "report.json")
+        subprocess.run([sys.executable, "-m", "benchmarks.load_test", "--url", url,
+                        "--supabase-port", str(args.supabase_port), "--users", str(args.users),
+                        "--duration", str(args.duration), "--mix", args.mix,
+                        "--latency", str(args.latency), "--seed", str(args.seed), "--output", output],
+                       cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with open(output, encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        log.close()
+
+
+def summary(report: dict, routes: List[str]) -> dict:
+    return {
+        "requests": report["requests"],
+        "errors": report["errors"],
+        "throughput_rps": report["throughput_rps"],
+        "routes": {route: report["routes"][route] for route in routes if route in report["routes"]},
+        "journeys": report["journeys"],
+        "supabase_requests": report["supabase"]["requests"],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="gunicorn と uvicorn に同じ負荷テストを流して比べる")
+    parser.add_argument("--servers", default=",".join(SERVERS), help="比べるサーバー（カンマ区切り）")
+    parser.add_argument("--workers", type=int, default=2, help="ワーカープロセス数（両方同じ）")
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--mix", default="guest=4,focus=3,playlist=2,cloud=1")
+    parser.add_argument("--latency", type=float, default=0.05, help="偽Supabaseの応答時間（秒）")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--supabase-port", type=int, default=54321)
+    parser.add_argument("--routes", default="GET /friends,POST /friends/login,GET /,POST /timer/complete",
+                        help="待ち時間を出すルート（カンマ区切り）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    routes = [route for route in args.routes.split(",") if route]
+    results: Dict[str, dict] = {}
+    for name in args.servers.split(","):
+        print(f"[SERVER_COMPARE] {name} ...", file=sys.stderr)
+        results[name] = summary(run_against(name, args), routes)
+
+    for name, result in results.items():
+        print(f"{name:9s} {result['throughput_rps']:8.1f} req/s  errors={result['errors']}", file=sys.stderr)
+        for route, stats in result["routes"].items():
+            print(f"  {route:22s} p50={stats['p50_ms']:8.1f} ms  p95={stats['p95_ms']:8.1f} ms  "
+                  f"p99={stats['p99_ms']:8.1f} ms  n={stats['count']}", file=sys.stderr)
+
+    print(json.dumps({"config": {"workers": args.workers, "users": args.users, "duration_s": args.duration,
+                                 "mix": args.mix, "supabase_latency_ms": args.latency * 1000},
+                      "servers": results}, ensure_ascii=False, indent=2))
+    return 1 if any(result["errors"] for result in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
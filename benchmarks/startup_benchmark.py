@@ -0,0 +1,70 @@
+"""
+起動時間と最初のリクエストの待ち時間のベンチマーク
+
+新しいPythonプロセス（空のDB）で app を読み込み、準備なし（従来）と create_app() の準備ありで
+読み込み時間・準備時間と、各ページの1回目・2回目の応答時間を比べる。
+gunicorn --preload では準備は親プロセスで1回だけ行われ、ワーカーの1回目のリクエストが速くなる。
+
+    python -m benchmarks.startup_benchmark --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ("/", "/moon-cycle", "/collection", "/playlist", "/creature")
+
+# 子プロセスで実行するスクリプト
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {root!r})
+import app as web
+result = {{"import_ms": (time.perf_counter() - t0) * 1000, "warmup_ms": 0.0}}
+web.timer_sessions._thread = object()  # タイマーのバックグラウンドスレッドは起動しない
+if {warmup!r}:
+    t0 = time.perf_counter()
+    web.create_app()
+    result["warmup_ms"] = (time.perf_counter() - t0) * 1000
+client = web.app.test_client()
+for label in ("first", "second"):
+    for page in {pages!r}:
+        t0 = time.perf_counter()
+        assert client.get(page, headers={{"Cache-Control": "no-cache"}}).status_code == 200
+        result[label + ":" + page] = (time.perf_counter() - t0) * 1000
+print(json.dumps(result))
+"""
+
+
+def run_child(warmup: bool) -> dict:
+    script = CHILD.format(root=ROOT_DIR, warmup=warmup, pages=PAGES)
+    output = subprocess.run([sys.executable, "-c", script], cwd=tempfile.mkdtemp(),
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="起動時間と最初のリクエストの待ち時間")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    modes = {"cold": False, "warmup": True}
+    results = {mode: [run_child(warmup) for _ in range(args.runs)] for mode, warmup in modes.items()}
+    median = {mode: {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+              for mode, runs in results.items()}
+
+    print(f"median of {args.runs} runs (ms)        cold    warmup")
+    for key in median["cold"]:
+        print(f"  {key:<28} {median['cold'][key]:8.1f}  {median['warmup'][key]:8.1f}")
+    first = {mode: sum(v for k, v in m.items() if k.startswith("first:")) for mode, m in median.items()}
+    print(f"  {'first requests (total)':<28} {first['cold']:8.1f}  {first['warmup']:8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
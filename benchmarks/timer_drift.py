@@ -0,0 +1,114 @@
+"""
+タイマーのずれ（ドリフト）シミュレーション
+
+負荷の高いイベントループを模した仮想時計で TimerController を動かし、
+1時間のカウントダウンが実時間からどれだけずれるかを計測する。
+比較のため、従来の「sleep(1) して1秒引く」方式も同じ条件で計測する。
+
+    python -m benchmarks.timer_drift --hours 1 --max-drift-ms 100
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moon_tasker.models import Task
+from moon_tasker.logic.timer_logic import TimerController
+
+
+class LoadedLoopClock:
+    """
+    負荷のかかったイベントループを模した仮想時計
+
+    sleep は要求時間より遅れて戻り（通常0〜30ms、まれに250msのGC相当の停止）、
+    tick処理（画面更新）にも時間がかかる。
+    """
+
+    def __init__(self, seed: int = 0, tick_cost: float = 0.015):
+        self.now = 1000.0
+        self.rng = random.Random(seed)
+        self.tick_cost = tick_cost
+        self.ticks = 0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def lag(self) -> float:
+        if self.rng.random() < 0.01:
+            return 0.25
+        return self.rng.uniform(0.0, 0.03)
+
+    async def sleep(self, seconds: float):
+        self.now += max(0.0, seconds) + self.lag()
+        await asyncio.sleep(0)
+
+    def on_tick(self, remaining: int, is_break: bool):
+        self.ticks += 1
+        self.now += self.tick_cost
+
+
+async def measure_controller(duration_s: int, seed: int) -> dict:
+    """TimerController の完了時刻のずれを計測"""
+    clock = LoadedLoopClock(seed)
+    timer = TimerController(clock=clock.monotonic, sleep=clock.sleep)
+    timer.on_tick = clock.on_tick
+    finished: List[float] = []
+    timer.on_complete = lambda task: finished.append(clock.now)
+
+    start = clock.now
+    await timer.start_timer(Task(id=1, title="drift", duration=duration_s // 60, break_duration=0))
+    return {
+        "method": "deadline",
+        "drift_s": finished[0] - (start + duration_s),
+        "ticks": clock.ticks,
+    }
+
+
+async def measure_legacy(duration_s: int, seed: int) -> dict:
+    """従来方式（sleep(1) のたびに1秒減らす）のずれを計測"""
+    clock = LoadedLoopClock(seed)
+    start = clock.now
+    remaining = duration_s
+    while remaining > 0:
+        await clock.sleep(1)
+        remaining -= 1
+        clock.on_tick(remaining, False)
+    return {
+        "method": "legacy_sleep_1s",
+        "drift_s": clock.now - (start + duration_s),
+        "ticks": clock.ticks,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="タイマーのずれシミュレーション")
+    parser.add_argument("--hours", type=float, default=1.0, help="カウントダウンの長さ（時間）")
+    parser.add_argument("--seed", type=int, default=0, help="遅延の乱数シード")
+    parser.add_argument("--max-drift-ms", type=float, default=100.0,
+                        help="1時間あたりの許容ずれ（ミリ秒）")
+    args = parser.parse_args(argv)
+
+    duration_s = int(args.hours * 3600) // 60 * 60
+    results = [
+        asyncio.run(measure_controller(duration_s, args.seed)),
+        asyncio.run(measure_legacy(duration_s, args.seed)),
+    ]
+
+    limit_ms = args.max_drift_ms * max(args.hours, 1e-9)
+    for r in results:
+        print(f"{r['method']:<16} drift={r['drift_s'] * 1000:10.1f} ms  ticks={r['ticks']}")
+
+    drift_ms = abs(results[0]["drift_s"]) * 1000
+    if drift_ms >= limit_ms:
+        print(f"NG: ずれ {drift_ms:.1f} ms が許容値 {limit_ms:.1f} ms を超えました")
+        return 1
+    print(f"OK: ずれ {drift_ms:.1f} ms < {limit_ms:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+タイマージャーナルの復元シミュレーション
+
+仮想時計でプレイリストを実行し、ランダムな時刻でアプリが落ちた（メモリ上の
+未書き出しレコードは失われ、最後の行は書きかけ）とみなして再起動・復元する。
+各タスクの完了がちょうど1回ずつ記録されるか、復元で失った進捗が何秒か、
+tickの回数に対してfsyncが何回だったかを計測する。
+
+    python -m benchmarks.timer_journal_recovery --runs 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moon_tasker.models import Task
+from moon_tasker.logic.timer_journal import TimerJournal
+from moon_tasker.logic.timer_logic import TimerController
+
+
+class Crash(Exception):
+    pass
+
+
+class SimClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+        self.crash_at: Optional[float] = None
+        self.ticks = 0
+
+    def time(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.now += max(0.0, seconds)
+        await asyncio.sleep(0)
+
+    def on_tick(self, remaining: int, is_break: bool):
+        self.ticks += 1
+        if self.crash_at is not None and self.now >= self.crash_at:
+            raise Crash()
+
+
+def make_tasks() -> List[Task]:
+    return [Task(id=i + 1, title=f"task{i + 1}", duration=25, break_duration=5) for i in range(4)]
+
+
+async def run_once(directory: str, seed: int, downtime: float) -> dict:
+    rng = random.Random(seed)
+    clock = SimClock()
+    path = os.path.join(directory, f"run{seed}.journal")
+    tasks = make_tasks()
+    # 最後のタスクは休憩なし
+    total_s = sum(t.duration * 60 + t.break_duration * 60 for t in tasks) - tasks[-1].break_duration * 60
+    credited: List[int] = []
+
+    # 1回目: 途中で落ちる
+    journal = TimerJournal(path, clock=clock.time)
+    timer = TimerController(clock=clock.time, sleep=clock.sleep, journal=journal)
+    timer.on_tick = clock.on_tick
+    timer.on_complete = lambda task: credited.append(task.id)
+    clock.crash_at = clock.now + rng.uniform(1, total_s - 1)
+    try:
+        await timer.start_playlist(tasks)
+    except Crash:
+        pass
+    true_index, true_break = timer.current_task_index, timer.is_break
+    true_left = timer._seconds_left()
+    fsyncs = journal.fsyncs
+    # 書きかけの行（fsync前にOSが途中まで書いた状態）
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"op":"pau')
+
+    # 再起動
+    clock.crash_at = None
+    clock.now += downtime
+    recovered_journal = TimerJournal(path, clock=clock.time)
+    state = recovered_journal.recover()
+    restored = TimerController(clock=clock.time, sleep=clock.sleep, journal=recovered_journal)
+    restored.on_tick = clock.on_tick
+    restored.on_complete = lambda task: credited.append(task.id)
+    ok = restored.restore(state)
+    same_phase = ok and (restored.current_task_index, restored.is_break) == (true_index, true_break)
+    lost_s = (restored._seconds_left() - max(0.0, true_left - downtime)) if same_phase else None
+    await restored.resume_countdown()
+
+    return {
+        "restored": ok,
+        "same_phase": same_phase,
+        "lost_s": lost_s,
+        "exactly_once": sorted(credited) == [t.id for t in tasks],
+        "fsyncs": fsyncs + recovered_journal.fsyncs,
+    }
+
+
+async def run(runs: int, downtime: float) -> dict:
+    clock_ticks = 0
+    with tempfile.TemporaryDirectory() as directory:
+        results = [await run_once(directory, seed, downtime) for seed in range(runs)]
+        # 参考: 落ちずに最後まで走った場合のtick数とfsync数
+        clock = SimClock()
+        journal = TimerJournal(os.path.join(directory, "full.journal"), clock=clock.time)
+        timer = TimerController(clock=clock.time, sleep=clock.sleep, journal=journal)
+        timer.on_tick = clock.on_tick
+        await timer.start_playlist(make_tasks())
+        clock_ticks = clock.ticks
+
+    lost = [r["lost_s"] for r in results if r["lost_s"] is not None]
+    return {
+        "runs": runs,
+        "restored": sum(r["restored"] for r in results),
+        "same_phase": sum(bool(r["same_phase"]) for r in results),
+        "exactly_once": sum(r["exactly_once"] for r in results),
+        "max_lost_s": max(lost) if lost else 0.0,
+        "full_run_ticks": clock_ticks,
+        "full_run_fsyncs": journal.fsyncs,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="タイマージャーナルの復元シミュレーション")
+    parser.add_argument("--runs", type=int, default=200, help="クラッシュさせる回数")
+    parser.add_argument("--downtime", type=float, default=30.0, help="再起動までの秒数")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run(args.runs, args.downtime))
+    for key, value in result.items():
+        print(f"{key:<16} {value:.3f}" if isinstance(value, float) else f"{key:<16} {value}")
+    return 0 if result["exactly_once"] == args.runs else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
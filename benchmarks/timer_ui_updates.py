@@ -0,0 +1,140 @@
+"""
+タイマー画面のtick更新の計測（差分計算の時間と送信量）
+
+デスクトップ版のページ（main.py の main）を送信量を数える接続の上に組み立て、
+タイマー画面を集中モードにして tick を流す。TimerView.TARGETED_TICK_UPDATES の
+True（残り時間の表示だけ更新）と False（従来のページ全体の更新）、ウィンドウが
+背面・最小化のときの間引きを比べる。
+
+- 更新回数・間引いた回数・page.update() の時間（差分計算と送信）: 集中モードの終了時に
+  TimerView.last_update_stats に残る UpdateMeter の集計
+- 送信量: Fletのサーバーと同じ形式（CommandEncoder のJSON）にしたメッセージのバイト数
+
+    python -m benchmarks.timer_ui_updates --ticks 600
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import flet as ft
+from flet.core.local_connection import LocalConnection
+from flet.core.protocol import (ClientActions, ClientMessage, CommandEncoder, PageCommandResponsePayload,
+                                PageCommandsBatchResponsePayload)
+
+from moon_tasker import main as desktop
+from moon_tasker.views.timer_view import TimerView
+
+# (名前, TARGETED_TICK_UPDATES, ウィンドウイベント)
+SCENARIOS = (
+    ("full_page", False, None),
+    ("targeted", True, None),
+    ("targeted_blurred", True, "blur"),
+    ("targeted_minimized", True, "minimize"),
+)
+
+
+class CountingConnection(LocalConnection):
+    """クライアントに送るはずのメッセージを数える接続（ソケットには送らない）"""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = 0
+        self.bytes = 0
+
+    def _send(self, message: ClientMessage):
+        self.messages += 1
+        self.bytes += len(json.dumps(message, cls=CommandEncoder, separators=(",", ":")).encode("utf-8"))
+
+    def send_command(self, session_id: str, command):
+        result, message = self._process_command(command)
+        if message:
+            self._send(message)
+        return PageCommandResponsePayload(result=result, error="")
+
+    def send_commands(self, session_id: str, commands):
+        results, messages = [], []
+        for command in commands:
+            result, message = self._process_command(command)
+            if command.name in ("add", "get"):
+                results.append(result)
+            if message:
+                messages.append(message)
+        if messages:
+            self._send(ClientMessage(ClientActions.PAGE_CONTROLS_BATCH, messages))
+        return PageCommandsBatchResponsePayload(results=results, error="")
+
+
+def open_timer_view(targeted: bool):
+    """アプリのページを組み立ててタイマー画面を集中モードにする"""
+    connection = CountingConnection()
+    page = ft.Page(connection, "benchmark", asyncio.new_event_loop())
+    desktop.main(page)
+    page.change_view(1)
+    view = next(c for c in page.controls[0].controls[2].content.controls if isinstance(c, TimerView))
+    view.TARGETED_TICK_UPDATES = targeted
+    view.is_focus_mode = True
+    view._build()
+    page.update()
+    return connection, view
+
+
+def measure(name: str, targeted: bool, window_event: Optional[str], ticks: int) -> dict:
+    """ticks 秒分のtickを流し、画面更新の集計と送信量を返す"""
+    connection, view = open_timer_view(targeted)
+    if window_event:
+        view.on_window_event(SimpleNamespace(data=window_event))
+    messages, sent = connection.messages, connection.bytes
+
+    for remaining in range(ticks, -1, -1):
+        view.timer.remaining_seconds = remaining
+        view.on_timer_tick(remaining, False)
+    messages, sent = connection.messages - messages, connection.bytes - sent
+
+    view._exit_focus_mode()
+    stats = view.last_update_stats
+    return {
+        "scenario": name,
+        "ticks": ticks + 1,
+        "updates": stats["updates"],
+        "skipped": stats["skipped"],
+        "update_ms_total": round(stats["total_ms"], 2),
+        "update_ms_avg": round(stats["avg_ms"], 4),
+        "update_ms_max": round(stats["max_ms"], 4),
+        "messages": messages,
+        "bytes": sent,
+        "bytes_per_update": round(sent / stats["updates"], 1) if stats["updates"] else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="タイマー画面のtick更新の計測")
+    parser.add_argument("--ticks", type=int, default=600, help="流すtickの数（秒）")
+    parser.add_argument("--output", help="JSONの出力先（省略時は標準出力）")
+    args = parser.parse_args(argv)
+
+    os.chdir(tempfile.mkdtemp())  # デスクトップ版のDB・ジャーナルは作業ディレクトリに作られる
+    results = [measure(name, targeted, event, args.ticks) for name, targeted, event in SCENARIOS]
+
+    for r in results:
+        print(f"{r['scenario']:<20} updates={r['updates']:5d} skipped={r['skipped']:5d}  "
+              f"update avg={r['update_ms_avg']:7.3f} ms max={r['update_ms_max']:7.3f} ms  "
+              f"sent={r['bytes']:8d} B ({r['bytes_per_update']:.0f} B/update)", file=sys.stderr)
+
+    output = json.dumps({"ticks": args.ticks, "results": results}, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""
+gunicorn設定
+
+    gunicorn --config gunicorn.conf.py "app:create_app()"
+
+preload_app で親プロセスが1回だけ create_app() を呼び（スキーマ・テンプレート・定義・SSLの準備）、
+ワーカーはそれをforkで引き継ぐ。接続プールとタイマーのスレッドはワーカーごとに作る。
+/metrics はワーカーごとの集計を METRICS_DIR に書き、どのワーカーが答えても全体の合計を返す
+（METRICS_TOKEN を設定したときだけ。Authorization: Bearer <トークン> が必要）。
+SSE（/events）は接続中スレッドを1つ占有するので、ワーカーごとに SSE_MAX_STREAMS 本（既定2）・
+SSE_MAX_SECONDS 秒（既定120）まで。上限を超えた画面は503を受けて30秒ごとに繋ぎ直すだけなので、
+ライブ更新が要るなら asgi.py（uvicorn、Dockerfile の既定）で動かす。
+"""
+import glob
+import os
+import tempfile
+
+# アプリの読み込み（preload）より前に決める
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'moon-tasker-metrics'))
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+threads = 4
+preload_app = True
+
+
+def on_starting(server):
+    # 前回の起動で残ったワーカーの集計を消す
+    for path in glob.glob(os.path.join(os.environ['METRICS_DIR'], '*.json')):
+        os.remove(path)
+
+
+def post_fork(server, worker):
+    # ソケットをワーカー間で共有しないよう、fork後に接続プールを開く
+    from moon_tasker.cloud.supabase_client import get_http_client
+    get_http_client()
@@ -3,10 +3,14 @@ Supabase接続とユーザー認証モジュール（HTTP API版）
 supabaseパッケージの代わりにhttpxで直接APIを呼び出す
 """
 import os
+import asyncio
+import time
 import httpx
 from typing import Optional, Dict, Any
 from dotenv import load_dotenv
 
+from ..logic.metrics import metrics
+
 # 環境変数を読み込み
 load_dotenv()
 
@@ -14,6 +18,68 @@ SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
 
 
+# 接続プール（証明書の読み込みは重いので、SSLコンテキストとClientはプロセスで1つを共有）
+_ssl_context = None
+_http_client: Optional[httpx.Client] = None
+_http_pid: Optional[int] = None
+
+
+def get_ssl_context():
+    """証明書を読み込んだSSLコンテキスト（forkの前に作ってワーカーで共有してよい）"""
+    global _ssl_context
+    if _ssl_context is None:
+        import ssl
+        import certifi
+        _ssl_context = ssl.create_default_context(cafile=certifi.where())
+    return _ssl_context
+
+
+def _record_cloud_request(request: httpx.Request, status: str, started: float):
+    """Supabaseへのリクエストの応答時間を記録（/rest/v1/profiles -> rest/profiles）"""
+    parts = request.url.path.strip("/").split("/")
+    endpoint = f"{parts[0]}/{parts[-1]}" if len(parts) >= 3 else request.url.path
+    metrics.observe("moon_tasker_cloud_request_duration_seconds",
+                    (("endpoint", endpoint), ("method", request.method), ("status", status)),
+                    time.perf_counter() - started)
+
+
+class MeteredTransport(httpx.HTTPTransport):
+    """エンドポイント・ステータスごとに応答時間を記録する（接続できなければ status="error"）"""
+    
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = super().handle_request(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            _record_cloud_request(request, status, started)
+
+
+class AsyncMeteredTransport(httpx.AsyncHTTPTransport):
+    """MeteredTransport の非同期版"""
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = await super().handle_async_request(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            _record_cloud_request(request, status, started)
+
+
+def get_http_client() -> httpx.Client:
+    """このプロセスの接続プール（fork後のワーカーでは作り直す）"""
+    global _http_client, _http_pid
+    if _http_client is None or _http_pid != os.getpid():
+        _http_client = httpx.Client(transport=MeteredTransport(verify=get_ssl_context()))
+        _http_pid = os.getpid()
+    return _http_client
+
+
 class SupabaseAuth:
     """Supabase認証を管理するクラス（HTTP API版）"""
     
@@ -63,7 +129,7 @@ class SupabaseAuth:
         
         try:
             url = f"{SUPABASE_URL}/auth/v1/token?grant_type=password"
-            response = httpx.post(
+            response = get_http_client().post(
                 url,
                 headers=self._get_headers(),
                 json={"email": email, "password": password},
@@ -95,7 +161,7 @@ class SupabaseAuth:
         
         try:
             url = f"{SUPABASE_URL}/auth/v1/signup"
-            response = httpx.post(
+            response = get_http_client().post(
                 url,
                 headers=self._get_headers(),
                 json={"email": email, "password": password},
@@ -156,7 +222,7 @@ class SupabaseDB:
         
         try:
             url = f"{SUPABASE_URL}/rest/v1/profiles?user_id=eq.{user_id}&select=*"
-            response = httpx.get(url, headers=self._get_headers(), timeout=10.0)
+            response = get_http_client().get(url, headers=self._get_headers(), timeout=10.0)
             if response.status_code == 200:
                 data = response.json()
                 return data[0] if data else None
@@ -185,7 +251,7 @@ class SupabaseDB:
             }
             print(f"[UPSERT_PROFILE] Data: {data}")
             
-            response = httpx.post(
+            response = get_http_client().post(
                 url,
                 headers=headers,
                 json=data,
@@ -206,7 +272,7 @@ class SupabaseDB:
         
         try:
             url = f"{SUPABASE_URL}/rest/v1/creatures?user_id=eq.{user_id}&select=*&order=created_at.desc&limit=1"
-            response = httpx.get(url, headers=self._get_headers(), timeout=10.0)
+            response = get_http_client().get(url, headers=self._get_headers(), timeout=10.0)
             if response.status_code == 200:
                 data = response.json()
                 return data[0] if data else None
@@ -224,7 +290,7 @@ class SupabaseDB:
             url = f"{SUPABASE_URL}/rest/v1/creatures"
             headers = self._get_headers()
             headers["Prefer"] = "resolution=merge-duplicates"
-            response = httpx.post(url, headers=headers, json=creature_data, timeout=10.0)
+            response = get_http_client().post(url, headers=headers, json=creature_data, timeout=10.0)
             return response.status_code in [200, 201]
         except Exception as e:
             print(f"生命体保存エラー: {e}")
@@ -239,7 +305,7 @@ class SupabaseDB:
         
         try:
             url = f"{SUPABASE_URL}/rest/v1/friends?user_id=eq.{user_id}&status=eq.accepted&select=friend_id"
-            response = httpx.get(url, headers=self._get_headers(), timeout=10.0)
+            response = get_http_client().get(url, headers=self._get_headers(), timeout=10.0)
             if response.status_code == 200:
                 return response.json()
         except Exception as e:
@@ -253,7 +319,7 @@ class SupabaseDB:
         
         try:
             url = f"{SUPABASE_URL}/rest/v1/friends"
-            response = httpx.post(
+            response = get_http_client().post(
                 url,
                 headers=self._get_headers(),
                 json={"user_id": user_id, "friend_id": friend_id, "status": "pending"},
@@ -272,11 +338,11 @@ class SupabaseDB:
         try:
             # 申請を承認
             url = f"{SUPABASE_URL}/rest/v1/friends?user_id=eq.{friend_id}&friend_id=eq.{user_id}"
-            httpx.patch(url, headers=self._get_headers(), json={"status": "accepted"}, timeout=10.0)
+            get_http_client().patch(url, headers=self._get_headers(), json={"status": "accepted"}, timeout=10.0)
             
             # 相互にフレンド関係を作成
             url = f"{SUPABASE_URL}/rest/v1/friends"
-            httpx.post(
+            get_http_client().post(
                 url,
                 headers=self._get_headers(),
                 json={"user_id": user_id, "friend_id": friend_id, "status": "accepted"},
@@ -302,7 +368,7 @@ class SupabaseDB:
         try:
             url = f"{SUPABASE_URL}/rest/v1/user_playlists?user_id=eq.{user_id}&select=*&order=created_at.desc"
             print(f"[GET_USER_PLAYLISTS] URL: {url}")
-            response = httpx.get(url, headers=self._get_headers(), timeout=10.0)
+            response = get_http_client().get(url, headers=self._get_headers(), timeout=10.0)
             print(f"[GET_USER_PLAYLISTS] Status: {response.status_code}, Response: {response.text[:200] if response.text else 'empty'}")
             if response.status_code == 200:
                 return response.json()
@@ -329,9 +395,9 @@ class SupabaseDB:
             # IDがあれば更新、なければ作成
             if playlist.get("id"):
                 url = f"{SUPABASE_URL}/rest/v1/user_playlists?id=eq.{playlist['id']}"
-                response = httpx.patch(url, headers=headers, json=data, timeout=10.0)
+                response = get_http_client().patch(url, headers=headers, json=data, timeout=10.0)
             else:
-                response = httpx.post(url, headers=headers, json=data, timeout=10.0)
+                response = get_http_client().post(url, headers=headers, json=data, timeout=10.0)
             
             if response.status_code in [200, 201]:
                 result = response.json()
@@ -347,7 +413,7 @@ class SupabaseDB:
         
         try:
             url = f"{SUPABASE_URL}/rest/v1/user_playlists?id=eq.{playlist_id}&user_id=eq.{user_id}"
-            response = httpx.delete(url, headers=self._get_headers(), timeout=10.0)
+            response = get_http_client().delete(url, headers=self._get_headers(), timeout=10.0)
             return response.status_code in [200, 204]
         except Exception as e:
             print(f"プレイリスト削除エラー: {e}")
@@ -364,7 +430,7 @@ class SupabaseDB:
         try:
             url = f"{SUPABASE_URL}/rest/v1/user_tasks?user_id=eq.{user_id}&select=*&order=created_at.desc"
             print(f"[GET_USER_TASKS] URL: {url}")
-            response = httpx.get(url, headers=self._get_headers(), timeout=10.0)
+            response = get_http_client().get(url, headers=self._get_headers(), timeout=10.0)
             print(f"[GET_USER_TASKS] Status: {response.status_code}, Response: {response.text[:200] if response.text else 'empty'}")
             if response.status_code == 200:
                 return response.json()
@@ -397,9 +463,9 @@ class SupabaseDB:
             
             if task.get("id"):
                 url = f"{SUPABASE_URL}/rest/v1/user_tasks?id=eq.{task['id']}"
-                response = httpx.patch(url, headers=headers, json=data, timeout=10.0)
+                response = get_http_client().patch(url, headers=headers, json=data, timeout=10.0)
             else:
-                response = httpx.post(url, headers=headers, json=data, timeout=10.0)
+                response = get_http_client().post(url, headers=headers, json=data, timeout=10.0)
             
             print(f"[SAVE_USER_TASK] Status: {response.status_code}, Response: {response.text[:200] if response.text else 'empty'}")
             
@@ -417,7 +483,7 @@ class SupabaseDB:
         
         try:
             url = f"{SUPABASE_URL}/rest/v1/user_tasks?id=eq.{task_id}&user_id=eq.{user_id}"
-            response = httpx.delete(url, headers=self._get_headers(), timeout=10.0)
+            response = get_http_client().delete(url, headers=self._get_headers(), timeout=10.0)
             return response.status_code in [200, 204]
         except Exception as e:
             print(f"タスク削除エラー: {e}")
@@ -435,7 +501,7 @@ class SupabaseDB:
             # Note: task_orderカラムはSupabaseテーブルに存在しないため除外
             url = f"{SUPABASE_URL}/rest/v1/user_playlist_tasks?playlist_id=eq.{playlist_id}&select=task_id,user_tasks(*)"
             print(f"[GET_PLAYLIST_TASKS] URL: {url}")
-            response = httpx.get(url, headers=self._get_headers(), timeout=10.0)
+            response = get_http_client().get(url, headers=self._get_headers(), timeout=10.0)
             print(f"[GET_PLAYLIST_TASKS] Status: {response.status_code}")
             print(f"[GET_PLAYLIST_TASKS] Response: {response.text}")
             if response.status_code == 200:
@@ -456,7 +522,7 @@ class SupabaseDB:
             data = {"playlist_id": playlist_id, "task_id": task_id}
             print(f"[ADD_TASK_TO_PLAYLIST] URL: {url}")
             print(f"[ADD_TASK_TO_PLAYLIST] Data: {data}")
-            response = httpx.post(
+            response = get_http_client().post(
                 url,
                 headers=self._get_headers(),
                 json=data,
@@ -478,7 +544,7 @@ class SupabaseDB:
         
         try:
             url = f"{SUPABASE_URL}/rest/v1/user_playlist_tasks?playlist_id=eq.{playlist_id}&task_id=eq.{task_id}"
-            response = httpx.delete(url, headers=self._get_headers(), timeout=10.0)
+            response = get_http_client().delete(url, headers=self._get_headers(), timeout=10.0)
             return response.status_code in [200, 204]
         except Exception as e:
             print(f"プレイリストタスク削除エラー: {e}")
@@ -493,7 +559,7 @@ class SupabaseDB:
         
         try:
             url = f"{SUPABASE_URL}/rest/v1/user_badges?user_id=eq.{user_id}&select=*"
-            response = httpx.get(url, headers=self._get_headers(), timeout=10.0)
+            response = get_http_client().get(url, headers=self._get_headers(), timeout=10.0)
             print(f"[GET_USER_BADGES] Status: {response.status_code}")
             if response.status_code == 200:
                 return response.json()
@@ -510,7 +576,7 @@ class SupabaseDB:
             url = f"{SUPABASE_URL}/rest/v1/user_badges"
             headers = self._get_headers()
             headers["Prefer"] = "return=minimal,resolution=merge-duplicates"
-            response = httpx.post(
+            response = get_http_client().post(
                 url + "?on_conflict=user_id,badge_name",
                 headers=headers,
                 json={"user_id": user_id, "badge_name": badge_name},
@@ -540,7 +606,7 @@ class SupabaseDB:
         try:
             # プロフィールテーブルからuser_idの先頭8文字で検索
             url = f"{SUPABASE_URL}/rest/v1/profiles?select=*"
-            response = httpx.get(url, headers=self._get_headers(), timeout=10.0)
+            response = get_http_client().get(url, headers=self._get_headers(), timeout=10.0)
             print(f"[FIND_USER] Status: {response.status_code}")
             if response.status_code == 200:
                 profiles = response.json()
@@ -591,7 +657,7 @@ class SupabaseDB:
             }
             print(f"[SEND_FRIEND_REQUEST] Sending: {data}")
             
-            response = httpx.post(url, headers=headers, json=data, timeout=10.0)
+            response = get_http_client().post(url, headers=headers, json=data, timeout=10.0)
             print(f"[SEND_FRIEND_REQUEST] Status: {response.status_code}, Response: {response.text[:200] if response.text else 'empty'}")
             
             return response.status_code in [200, 201]
@@ -606,7 +672,7 @@ class SupabaseDB:
         
         try:
             url = f"{SUPABASE_URL}/rest/v1/friend_requests?to_user_id=eq.{user_id}&status=eq.pending&select=*"
-            response = httpx.get(url, headers=self._get_headers(), timeout=10.0)
+            response = get_http_client().get(url, headers=self._get_headers(), timeout=10.0)
             if response.status_code == 200:
                 requests = response.json()
                 # 送信者のプロフィールを取得して追加
@@ -627,7 +693,7 @@ class SupabaseDB:
         try:
             # リクエストを承認に更新
             url = f"{SUPABASE_URL}/rest/v1/friend_requests?id=eq.{request_id}&to_user_id=eq.{user_id}"
-            response = httpx.patch(
+            response = get_http_client().patch(
                 url,
                 headers=self._get_headers(),
                 json={"status": "accepted"},
@@ -646,7 +712,7 @@ class SupabaseDB:
         
         try:
             url = f"{SUPABASE_URL}/rest/v1/friend_requests?id=eq.{request_id}&to_user_id=eq.{user_id}"
-            response = httpx.delete(url, headers=self._get_headers(), timeout=10.0)
+            response = get_http_client().delete(url, headers=self._get_headers(), timeout=10.0)
             return response.status_code in [200, 204]
         except Exception as e:
             print(f"拒否エラー: {e}")
@@ -664,7 +730,7 @@ class SupabaseDB:
             
             friends = []
             
-            r1 = httpx.get(url1, headers=self._get_headers(), timeout=10.0)
+            r1 = get_http_client().get(url1, headers=self._get_headers(), timeout=10.0)
             if r1.status_code == 200:
                 for req in r1.json():
                     friend_id = req.get('to_user_id')
@@ -675,7 +741,7 @@ class SupabaseDB:
                         'title': profile.get('constellation_badge', '') if profile else ''
                     })
             
-            r2 = httpx.get(url2, headers=self._get_headers(), timeout=10.0)
+            r2 = get_http_client().get(url2, headers=self._get_headers(), timeout=10.0)
             if r2.status_code == 200:
                 for req in r2.json():
                     friend_id = req.get('from_user_id')
@@ -691,6 +757,103 @@ class SupabaseDB:
             print(f"フレンド一覧取得エラー: {e}")
         return []
 
+def new_async_client() -> httpx.AsyncClient:
+    """AsyncClientを作る（イベントループごと。SSLコンテキストはプロセスで共有）"""
+    return httpx.AsyncClient(transport=AsyncMeteredTransport(verify=get_ssl_context()))
+
+
+class AsyncSupabaseDB:
+    """
+    Supabaseの読み取りの非同期版（フレンド画面など、独立したリクエストを同時に送る）
+    
+    フレンド・リクエスト送信者のプロフィールは1件ずつではなく in.(...) でまとめて取得する。
+    httpx.AsyncClient は呼び出し側で用意する（イベントループごとに new_async_client() で作る）。
+    """
+    
+    def __init__(self, auth: SupabaseAuth, client: httpx.AsyncClient):
+        self.client = client
+        self._headers = SupabaseDB(auth)._get_headers
+    
+    async def _get_rows(self, path: str, label: str) -> list:
+        """GETして行のリストを返す（失敗時は空）"""
+        try:
+            response = await self.client.get(f"{SUPABASE_URL}/rest/v1/{path}",
+                                             headers=self._headers(), timeout=10.0)
+            if response.status_code == 200:
+                return response.json()
+        except Exception as e:
+            print(f"{label}エラー: {e}")
+        return []
+    
+    async def get_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """ユーザープロフィールを取得"""
+        if not SUPABASE_URL:
+            return None
+        rows = await self._get_rows(f"profiles?user_id=eq.{user_id}&select=*", "プロフィール取得")
+        return rows[0] if rows else None
+    
+    async def get_profiles(self, user_ids: list) -> Dict[str, Dict[str, Any]]:
+        """複数ユーザーのプロフィールを1回で取得（user_id -> プロフィール）"""
+        ids = sorted({uid for uid in user_ids if uid})
+        if not SUPABASE_URL or not ids:
+            return {}
+        rows = await self._get_rows(f"profiles?user_id=in.({','.join(ids)})&select=*", "プロフィール取得")
+        return {row.get('user_id'): row for row in rows}
+    
+    async def get_creature(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """ユーザーの生命体を取得"""
+        if not SUPABASE_URL:
+            return None
+        rows = await self._get_rows(
+            f"creatures?user_id=eq.{user_id}&select=*&order=created_at.desc&limit=1", "生命体取得")
+        return rows[0] if rows else None
+    
+    async def get_friends_list(self, user_id: str) -> list:
+        """承認済みフレンド一覧を取得（送信・受信の2つを同時に）"""
+        if not SUPABASE_URL:
+            return []
+        sent, received = await asyncio.gather(
+            self._get_rows(f"friend_requests?from_user_id=eq.{user_id}&status=eq.accepted&select=*",
+                           "フレンド一覧取得"),
+            self._get_rows(f"friend_requests?to_user_id=eq.{user_id}&status=eq.accepted&select=*",
+                           "フレンド一覧取得"),
+        )
+        friend_ids = [req.get('to_user_id') for req in sent] + [req.get('from_user_id') for req in received]
+        profiles = await self.get_profiles(friend_ids)
+        return [{
+            'friend_id': friend_id,
+            'nickname': profiles[friend_id].get('nickname', 'Unknown') if friend_id in profiles else 'Unknown',
+            'title': profiles[friend_id].get('constellation_badge', '') if friend_id in profiles else ''
+        } for friend_id in friend_ids]
+    
+    async def get_pending_requests(self, user_id: str) -> list:
+        """受信したフレンドリクエストを取得"""
+        if not SUPABASE_URL:
+            return []
+        requests = await self._get_rows(
+            f"friend_requests?to_user_id=eq.{user_id}&status=eq.pending&select=*", "リクエスト取得")
+        profiles = await self.get_profiles([req.get('from_user_id') for req in requests])
+        for req in requests:
+            profile = profiles.get(req.get('from_user_id'))
+            req['from_nickname'] = profile.get('nickname', 'Unknown') if profile else 'Unknown'
+        return requests
+    
+    async def get_friends_page(self, user_id: str) -> dict:
+        """フレンド画面のデータ（プロフィール・フレンド・承認待ち・生命体）を同時に取得"""
+        profile, friends_list, pending_requests, creature = await asyncio.gather(
+            self.get_profile(user_id),
+            self.get_friends_list(user_id),
+            self.get_pending_requests(user_id),
+            self.get_creature(user_id),
+        )
+        return {
+            'profile': profile,
+            'friends_list': friends_list,
+            'pending_requests': pending_requests,
+            'creature': creature,
+        }
+
+
 # シングルトンインスタンス
 _auth_instance: Optional[SupabaseAuth] = None
 _db_instance: Optional[SupabaseDB] = None
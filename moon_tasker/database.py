@@ -1,26 +1,158 @@
 """
 データベース操作クラス
 """
+import copy
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Optional
-from .models import Task, Playlist, Creature, Badge, MoonCycle, LifestyleSettings
+from typing import Callable, List, Optional, Tuple
+from .models import (Task, Playlist, Creature, Badge, MoonCycle, LifestyleSettings, TimerSession,
+                     TaskCompletion, DashboardSummary)
+
+
+# 全ゲストの画面に出るテーブル（書き込まれたら共有の版数も上げる）
+SHARED_TABLES = {"badges", "activity_log"}
+SHARED_SCOPE = "*"
+# 画面に出ないテーブル（これだけの書き込みでは版数を上げない）
+UNVERSIONED_TABLES = {"data_versions", "web_sessions", "timer_sessions", "idempotency_keys", "sse_events"}
+_WRITE_ACTIONS = {sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE}
+# スキーマ作成を待つ最長時間（秒）
+INIT_LOCK_TIMEOUT = 60.0
+
+
+@contextmanager
+def _init_process_lock(db_path: str):
+    """
+    スキーマ作成・マイグレーションをプロセス間で1つずつにする
+    
+    preloadなしの複数ワーカー（uvicorn --workers など）は、それぞれが最初のリクエストで
+    マイグレーションを走らせる。隣の <db_path>.lock ファイルで排他トランザクションを
+    取り、その間だけ実行する（fcntlのないWindowsでも同じように動く）。
+    """
+    if db_path == ":memory:":
+        yield
+        return
+    lock = sqlite3.connect(f"{db_path}.lock", timeout=INIT_LOCK_TIMEOUT, isolation_level=None)
+    try:
+        lock.execute("BEGIN EXCLUSIVE")
+        yield
+    finally:
+        lock.close()  # 閉じるとロックも外れる
+
+
+class _Connection(sqlite3.Connection):
+    """
+    commitを通知する接続（書き込みがあったらメモを捨てるため）
+    
+    version_scope が設定されていれば、書き込みを含むcommitの直前に同じトランザクションで
+    data_versions の版数を上げる（共有テーブルへの書き込みなら共有の版数も）。
+    書き込み先はSQLの準備時にauthorizerで調べる。準備済みの文は再利用されて
+    authorizerが呼ばれないことがあるので、フラグは接続を閉じるまで下ろさない。
+    """
+    on_commit: Optional[Callable] = None
+    version_scope: Optional[str] = None
+    data_write = False
+    shared_write = False
+    
+    def track_writes(self, scope: str):
+        self.version_scope = scope
+        self.set_authorizer(self._authorize)
+    
+    def _authorize(self, action, arg1, arg2, db_name, trigger):
+        if action in _WRITE_ACTIONS and arg1 not in UNVERSIONED_TABLES:
+            self.data_write = True
+            if arg1 in SHARED_TABLES:
+                self.shared_write = True
+        return sqlite3.SQLITE_OK
+    
+    def commit(self):
+        bumped = self.version_scope is not None and self.in_transaction and self.data_write
+        if bumped:
+            scopes = [self.version_scope] + ([SHARED_SCOPE] if self.shared_write else [])
+            now = time.time()
+            self.executemany("""
+                INSERT INTO data_versions (scope, version, updated_at) VALUES (?, 1, ?)
+                ON CONFLICT(scope) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at
+            """, [(scope, now) for scope in scopes])
+        super().commit()
+        if self.on_commit:
+            self.on_commit(bumped)
 
 
 class Database:
     """SQLiteデータベース管理クラス"""
     
-    def __init__(self, db_path: str = "moon_tasker.db", guest_id: str = None):
+    # このプロセスでスキーマ作成・マイグレーション済みのDBファイル
+    _initialized_paths: set = set()
+    _init_lock = threading.Lock()
+    
+    def __init__(self, db_path: str = "moon_tasker.db", guest_id: str = None, memoize: bool = False):
         self.db_path = db_path
         self.guest_id = guest_id  # ゲストユーザー識別用
-        self.init_database()
+        # 読み取り結果のメモ（Webのリクエストごとのインスタンスで有効にする。書き込みで破棄）
+        self._memo: Optional[dict] = {} if memoize else None
+        self.write_count = 0  # このインスタンスで書き込みを含むcommitをした回数
+        # スキーマの作成・マイグレーションはプロセスごとに1回（リクエストごとに走らせない）
+        # （最初のリクエストが同時に来ても ALTER TABLE を二重に実行しないよう、スレッド間と
+        # プロセス間の両方でロックする）
+        if db_path not in Database._initialized_paths:
+            with Database._init_lock:
+                if db_path not in Database._initialized_paths:
+                    with _init_process_lock(db_path):
+                        self.init_database()
+                    Database._initialized_paths.add(db_path)
     
     def get_connection(self):
         """データベース接続を取得"""
-        conn = sqlite3.connect(self.db_path)
+        conn = sqlite3.connect(self.db_path, factory=_Connection)
         conn.row_factory = sqlite3.Row
+        conn.on_commit = self._on_commit
+        # スキーマ作成中（data_versionsがまだない）は版数を数えない
+        if self.db_path in Database._initialized_paths:
+            conn.track_writes(self.version_scope)
         return conn
     
+    def _on_commit(self, wrote: bool):
+        if self._memo:
+            self._memo.clear()
+        if wrote:
+            self.write_count += 1
+    
+    @property
+    def version_scope(self) -> str:
+        """データ版数のキー（ゲストID、ログインユーザー・デスクトップは空文字）"""
+        return self.guest_id or ""
+    
+    def get_data_version(self) -> dict:
+        """
+        このゲストのデータ版数と共有テーブルの版数、最終更新時刻（UNIX時刻）を取得
+        
+        どちらも書き込みのたびに増える。画面のETagに使う。
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT scope, version, updated_at FROM data_versions WHERE scope IN (?, ?)",
+                       (self.version_scope, SHARED_SCOPE))
+        rows = {row['scope']: row for row in cursor.fetchall()}
+        conn.close()
+        
+        own, shared = rows.get(self.version_scope), rows.get(SHARED_SCOPE)
+        return {
+            'version': own['version'] if own else 0,
+            'shared_version': shared['version'] if shared else 0,
+            'updated_at': max([row['updated_at'] for row in rows.values()], default=0.0),
+        }
+    
+    def _memoized(self, key: str, loader: Callable):
+        """メモがあれば再利用（呼び出し側が書き換えても影響しないようにコピーを返す）"""
+        if self._memo is None:
+            return loader()
+        if key not in self._memo:
+            self._memo[key] = loader()
+        return copy.copy(self._memo[key])
+    
     def init_database(self):
         """データベースとテーブルの初期化"""
         conn = self.get_connection()
@@ -187,12 +319,79 @@ class Database:
             )
         """)
         
+        # timer_sessionsテーブル（Web版のサーバー側タイマー）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS timer_sessions (
+                id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                plan TEXT NOT NULL,
+                task_index INTEGER DEFAULT 0,
+                is_break INTEGER DEFAULT 0,
+                status TEXT DEFAULT 'running',
+                deadline REAL,
+                remaining REAL DEFAULT 0,
+                credited INTEGER DEFAULT 0,
+                started_at REAL,
+                updated_at REAL
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_timer_sessions_status ON timer_sessions(status)")
+        
+        # idempotency_keysテーブル（再送されたPOSTに保存済みのレスポンスを返す）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                owner TEXT NOT NULL,
+                key TEXT NOT NULL,
+                route TEXT,
+                status_code INTEGER,
+                headers TEXT,
+                body BLOB,
+                created_at REAL,
+                PRIMARY KEY (owner, key)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created ON idempotency_keys(created_at)")
+        
+        # web_sessionsテーブル（Cookieには推測できないIDだけを入れ、中身はここに置く）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS web_sessions (
+                id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_web_sessions_expires ON web_sessions(expires_at)")
+        
+        # sse_eventsテーブル（SSEで送るイベント。どのワーカーの購読者にも届くようにここを経由する）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sse_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                owner TEXT NOT NULL,
+                event TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sse_events_owner ON sse_events(owner, id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_timer_sessions_owner ON timer_sessions(owner, status)")
+        
+        # data_versionsテーブル（ゲストごとの書き込み回数。ETag・304に使う、"*"は共有テーブル）
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS data_versions (
+                scope TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL
+            )
+        """)
+        
         conn.commit()
         conn.close()
         
         # マイグレーション（既存DBへのカラム追加）
         self._migrate_moon_cycles_table()
         self._migrate_guest_id_columns()  # ゲストID分離用マイグレーション
+        self._migrate_activity_log_table()
+        self._migrate_playlist_tasks_table()
         
         # 初期データの作成（生命体が存在しない場合）
         self._init_default_creature()
@@ -220,6 +419,43 @@ class Database:
         conn.commit()
         conn.close()
     
+    def _migrate_activity_log_table(self):
+        """activity_logテーブルのマイグレーション（まとめて完了の再送対策）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("PRAGMA table_info(activity_log)")
+        columns = [row['name'] for row in cursor.fetchall()]
+        if 'idempotency_key' not in columns:
+            cursor.execute("ALTER TABLE activity_log ADD COLUMN idempotency_key TEXT")
+        # NULLは重複可なので、キーなしの従来の記録には影響しない
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_activity_log_idempotency
+            ON activity_log(idempotency_key)
+        """)
+        
+        conn.commit()
+        conn.close()
+    
+    def _migrate_playlist_tasks_table(self):
+        """playlist_tasksテーブルのマイグレーション（同じタスクを二重に追加できないようにする）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        # 以前の重複は最初に追加した行だけを残す
+        cursor.execute("""
+            DELETE FROM playlist_tasks WHERE id NOT IN (
+                SELECT MIN(id) FROM playlist_tasks GROUP BY playlist_id, task_id
+            )
+        """)
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_playlist_tasks_unique
+            ON playlist_tasks(playlist_id, task_id)
+        """)
+        
+        conn.commit()
+        conn.close()
+    
     def _migrate_moon_cycles_table(self):
         """moon_cyclesテーブルのマイグレーション"""
         conn = self.get_connection()
@@ -245,6 +481,12 @@ class Database:
         if 'parent_cycle_id' not in columns:
             cursor.execute("ALTER TABLE moon_cycles ADD COLUMN parent_cycle_id INTEGER")
         
+        # cycle_tasks: 複数日プランナーの割り当て日
+        cursor.execute("PRAGMA table_info(cycle_tasks)")
+        cycle_task_columns = [row['name'] for row in cursor.fetchall()]
+        if 'planned_date' not in cycle_task_columns:
+            cursor.execute("ALTER TABLE cycle_tasks ADD COLUMN planned_date DATE")
+        
         conn.commit()
         conn.close()
     
@@ -375,6 +617,41 @@ class Database:
         conn.commit()
         conn.close()
     
+    def complete_task(self, task_id: int, timer_credit: Optional[Tuple[str, int]] = None) -> Optional[dict]:
+        """
+        タスクの完了（ステータス・アクティビティログ・サイクル進捗）を1トランザクションで記録
+        
+        timer_credit=(タイマーセッションID, タスクの位置) を渡すと、記録権の取得も同じ
+        トランザクションで行う。記録権が取れなければ（記録済み）何も書かずにNoneを返す。
+        
+        Returns:
+            {'task_id', 'cycle_id'}（cycle_id は進捗を進めたアクティブなサイクル、なければNone）
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cycle_id = None
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            if timer_credit and not self._claim_timer_credit(cursor, timer_credit):
+                conn.rollback()
+                return None
+            if task_id and task_id > 0:
+                now = datetime.now()
+                cursor.execute("""
+                    UPDATE tasks SET status = 'completed', completed_at = ? WHERE id = ?
+                """, (now, task_id))
+                cursor.execute("""
+                    INSERT INTO activity_log (task_id, action, timestamp) VALUES (?, 'completed', ?)
+                """, (task_id, now))
+                cycle_id = self._complete_cycle_task(cursor, task_id, now)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return {'task_id': task_id, 'cycle_id': cycle_id}
+    
     def delete_task(self, task_id: int):
         """タスクを削除"""
         conn = self.get_connection()
@@ -387,6 +664,9 @@ class Database:
     
     def get_creature(self) -> Optional[Creature]:
         """生命体を取得（guest_idでフィルタ）"""
+        return self._memoized('creature', self._load_creature)
+    
+    def _load_creature(self) -> Optional[Creature]:
         conn = self.get_connection()
         cursor = conn.cursor()
         if self.guest_id:
@@ -395,8 +675,10 @@ class Database:
             cursor.execute("SELECT * FROM creatures WHERE guest_id IS NULL ORDER BY id DESC LIMIT 1")
         row = cursor.fetchone()
         conn.close()
-        
-        if row:
+        return self._row_to_creature(row)
+    
+    def _row_to_creature(self, row) -> Optional[Creature]:
+        if row and row['id'] is not None:
             return Creature(
                 id=row['id'],
                 name=row['name'],
@@ -599,25 +881,19 @@ class Database:
             tasks.append(task)
         return tasks
     
-    def add_task_to_playlist(self, playlist_id: int, task_id: int):
-        """タスクをプレイリストに追加"""
+    def add_task_to_playlist(self, playlist_id: int, task_id: int) -> bool:
+        """タスクをプレイリストの末尾に追加（追加済みならFalse）"""
         conn = self.get_connection()
         cursor = conn.cursor()
-        # 現在の最大order_indexを取得
-        cursor.execute("""
-            SELECT MAX(order_index) as max_order FROM playlist_tasks 
-            WHERE playlist_id = ?
-        """, (playlist_id,))
-        result = cursor.fetchone()
-        max_order = result['max_order'] if result['max_order'] is not None else -1
-        
-        # 新しいタスクを追加
+        # 重複は一意インデックスで弾く（同時に追加されても1行だけ）
         cursor.execute("""
-            INSERT INTO playlist_tasks (playlist_id, task_id, order_index)
-            VALUES (?, ?, ?)
-        """, (playlist_id, task_id, max_order + 1))
+            INSERT OR IGNORE INTO playlist_tasks (playlist_id, task_id, order_index)
+            SELECT ?, ?, COALESCE(MAX(order_index), -1) + 1 FROM playlist_tasks WHERE playlist_id = ?
+        """, (playlist_id, task_id, playlist_id))
+        added = cursor.rowcount == 1
         conn.commit()
         conn.close()
+        return added
     
     def remove_task_from_playlist(self, playlist_id: int, task_id: int):
         """タスクをプレイリストから削除"""
@@ -666,6 +942,80 @@ class Database:
         conn.commit()
         conn.close()
     
+    def get_recorded_completion_keys(self, keys: List[str]) -> set:
+        """activity_logに記録済みの冪等キーを返す"""
+        if not keys:
+            return set()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        placeholders = ",".join("?" * len(keys))
+        cursor.execute(f"""
+            SELECT idempotency_key FROM activity_log WHERE idempotency_key IN ({placeholders})
+        """, keys)
+        recorded = {row['idempotency_key'] for row in cursor.fetchall()}
+        conn.close()
+        return recorded
+    
+    def complete_tasks_batch(self, completions: List[TaskCompletion],
+                             update_creature: Optional[Callable[[List[TaskCompletion]], Optional[Creature]]] = None
+                             ) -> List[dict]:
+        """
+        複数のタスク完了を1トランザクションで記録する
+        
+        タスクの状態・アクティビティログ・サイクル進捗・生命体のパラメータをまとめて書き込む。
+        冪等キーが記録済みの完了と、timer_credit の記録権が取れなかった完了は飛ばす。
+        
+        Args:
+            update_creature: 実際に記録した完了を受け取り、パラメータを反映した生命体を返す関数
+                （同じトランザクションで保存する。1件も記録しなければ呼ばない）
+        
+        Returns:
+            記録した完了ごとの {'task_id', 'idempotency_key', 'cycle_id'}
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        applied = []
+        applied_completions = []
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for completion in completions:
+                if completion.timer_credit and not self._claim_timer_credit(cursor, completion.timer_credit):
+                    continue
+                completed_at = completion.completed_at or datetime.now()
+                cursor.execute("""
+                    INSERT OR IGNORE INTO activity_log (task_id, action, timestamp, idempotency_key)
+                    VALUES (?, 'completed', ?, ?)
+                """, (completion.task_id, completed_at, completion.idempotency_key or None))
+                if cursor.rowcount == 0:
+                    continue
+                
+                cycle_id = None
+                if completion.task_id and completion.task_id > 0:
+                    cursor.execute("""
+                        UPDATE tasks SET status = 'completed', completed_at = ? WHERE id = ?
+                    """, (completed_at, completion.task_id))
+                    cycle_id = self._complete_cycle_task(cursor, completion.task_id, completed_at)
+                
+                applied.append({
+                    'task_id': completion.task_id,
+                    'idempotency_key': completion.idempotency_key,
+                    'cycle_id': cycle_id
+                })
+                applied_completions.append(completion)
+            
+            creature = update_creature(applied_completions) if update_creature and applied else None
+            if creature:
+                cursor.execute("""
+                    UPDATE creatures SET mood = ?, energy = ?, last_interaction = ? WHERE id = ?
+                """, (creature.mood, creature.energy, datetime.now(), creature.id))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return applied
+    
     # ===== MoonCycle操作 =====
     
     def get_active_moon_cycle(self) -> Optional[MoonCycle]:
@@ -803,7 +1153,7 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT t.*, ct.is_completed as cycle_completed FROM tasks t
+            SELECT t.*, ct.is_completed as cycle_completed, ct.planned_date as planned_date FROM tasks t
             JOIN cycle_tasks ct ON t.id = ct.task_id
             WHERE ct.cycle_id = ?
             ORDER BY ct.id ASC
@@ -827,9 +1177,48 @@ class Database:
             )
             # サイクル内での完了状態を追加属性として設定
             task._cycle_completed = bool(row['cycle_completed'])
+            task._planned_date = row['planned_date']
             tasks.append(task)
         return tasks
     
+    def set_cycle_task_dates(self, cycle_id: int, planned_dates: dict):
+        """サイクル内タスクの割り当て日を更新（{task_id: date or None}）"""
+        if not planned_dates:
+            return
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.executemany("""
+            UPDATE cycle_tasks SET planned_date = ?
+            WHERE cycle_id = ? AND task_id = ?
+        """, [(d.isoformat() if d else None, cycle_id, task_id)
+              for task_id, d in planned_dates.items()])
+        conn.commit()
+        conn.close()
+    
+    def _complete_cycle_task(self, cursor, task_id: int, completed_at) -> Optional[int]:
+        """
+        アクティブなサイクルに含まれる未完了のタスクなら完了にして進捗を進める（完了の記録と同じ
+        トランザクションで呼ぶ）。進めたサイクルのIDを返す
+        """
+        cursor.execute("""
+            SELECT ct.cycle_id FROM cycle_tasks ct
+            JOIN moon_cycles mc ON ct.cycle_id = mc.id
+            WHERE ct.task_id = ? AND mc.status = 'active' AND ct.is_completed = 0
+        """, (task_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        cycle_id = row['cycle_id']
+        cursor.execute("""
+            UPDATE cycle_tasks SET is_completed = 1, completed_at = ?
+            WHERE cycle_id = ? AND task_id = ?
+        """, (completed_at, cycle_id, task_id))
+        cursor.execute("""
+            UPDATE moon_cycles SET completed_task_count = completed_task_count + 1
+            WHERE id = ?
+        """, (cycle_id,))
+        return cycle_id
+    
     def complete_cycle_task(self, cycle_id: int, task_id: int):
         """サイクル内のタスクを完了としてマーク（進捗もインクリメント）"""
         conn = self.get_connection()
@@ -965,7 +1354,11 @@ class Database:
         """)
         dates = [row['completed_date'] for row in cursor.fetchall()]
         conn.close()
-        
+        return self._streak_from_dates(dates)
+    
+    @staticmethod
+    def _streak_from_dates(dates: list) -> dict:
+        """完了日（新しい順）からストリークを計算"""
         if not dates:
             return {"current_streak": 0, "max_streak": 0, "total_days": 0}
         
@@ -1006,6 +1399,66 @@ class Database:
             "total_days": len(dates)
         }
     
+    def get_dashboard_summary(self) -> DashboardSummary:
+        """ホーム画面の集計（未完了数・完了数・ストリーク・生命体）を1回のSQLで取得"""
+        guest_filter = "guest_id = :guest_id" if self.guest_id else "guest_id IS NULL"
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT
+                (SELECT COUNT(*) FROM tasks
+                 WHERE status = 'pending' AND {guest_filter}) AS pending_count,
+                (SELECT COUNT(*) FROM activity_log WHERE action = 'completed') AS completed_count,
+                (SELECT group_concat(completed_date) FROM (
+                    SELECT DISTINCT DATE(timestamp) AS completed_date FROM activity_log
+                    WHERE action = 'completed'
+                 )) AS completed_dates,
+                c.*
+            FROM (SELECT 1) AS one
+            LEFT JOIN (
+                SELECT * FROM creatures WHERE {guest_filter} ORDER BY id DESC LIMIT 1
+            ) AS c ON 1
+        """, {"guest_id": self.guest_id})
+        row = cursor.fetchone()
+        conn.close()
+        
+        dates = sorted(row['completed_dates'].split(','), reverse=True) if row['completed_dates'] else []
+        creature = self._row_to_creature(row)
+        if self._memo is not None:
+            self._memo['creature'] = creature
+        return DashboardSummary(
+            pending_count=row['pending_count'],
+            completed_count=row['completed_count'],
+            streak=self._streak_from_dates(dates),
+            creature=copy.copy(creature)
+        )
+    
+    def get_weekday_throughput(self, weeks: int = 8) -> dict:
+        """曜日別の1日あたり平均完了時間（分）を取得（0=月曜〜6=日曜、活動した日のみで平均）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        from datetime import date, timedelta
+        since = date.today() - timedelta(weeks=weeks)
+        
+        cursor.execute("""
+            SELECT DATE(a.timestamp) as day, SUM(COALESCE(t.duration, 0)) as minutes
+            FROM activity_log a
+            JOIN tasks t ON a.task_id = t.id
+            WHERE a.action = 'completed' AND DATE(a.timestamp) >= ?
+            GROUP BY day
+        """, (since.isoformat(),))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        totals = {}
+        for row in rows:
+            weekday = date.fromisoformat(row['day']).weekday()
+            total, days = totals.get(weekday, (0, 0))
+            totals[weekday] = (total + row['minutes'], days + 1)
+        
+        return {weekday: total / days for weekday, (total, days) in totals.items()}
+    
     def get_weekly_stats(self) -> dict:
         """週間統計を取得"""
         conn = self.get_connection()
@@ -1120,6 +1573,9 @@ class Database:
     
     def get_lifestyle_settings(self) -> Optional[LifestyleSettings]:
         """生活設定を取得"""
+        return self._memoized('lifestyle', self._load_lifestyle_settings)
+    
+    def _load_lifestyle_settings(self) -> LifestyleSettings:
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM lifestyle_settings LIMIT 1")
@@ -1237,4 +1693,261 @@ class Database:
             created_at=now,
             status='active'
         )
-
+    
+    # ===== タイマーセッション（Web版） =====
+    
+    def _row_to_timer_session(self, row) -> TimerSession:
+        return TimerSession(
+            id=row['id'],
+            owner=row['owner'],
+            plan=row['plan'],
+            task_index=row['task_index'],
+            is_break=bool(row['is_break']),
+            status=row['status'],
+            deadline=row['deadline'],
+            remaining=row['remaining'] or 0.0,
+            credited=row['credited'] or 0,
+            started_at=row['started_at'],
+            updated_at=row['updated_at']
+        )
+    
+    def create_timer_session(self, timer_session: TimerSession):
+        """タイマーセッションを作成"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO timer_sessions (id, owner, plan, task_index, is_break, status,
+                deadline, remaining, credited, started_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (timer_session.id, timer_session.owner, timer_session.plan, timer_session.task_index,
+              int(timer_session.is_break), timer_session.status, timer_session.deadline,
+              timer_session.remaining, timer_session.credited, timer_session.started_at,
+              timer_session.updated_at))
+        conn.commit()
+        conn.close()
+    
+    def get_timer_session(self, session_id: str) -> Optional[TimerSession]:
+        """タイマーセッションを取得"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM timer_sessions WHERE id = ?", (session_id,))
+        row = cursor.fetchone()
+        conn.close()
+        return self._row_to_timer_session(row) if row else None
+    
+    def get_running_timer_sessions(self) -> List[TimerSession]:
+        """実行中のタイマーセッションを取得（起動時の再登録用）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM timer_sessions WHERE status = 'running'")
+        rows = cursor.fetchall()
+        conn.close()
+        return [self._row_to_timer_session(row) for row in rows]
+    
+    def update_timer_session(self, timer_session: TimerSession, expected: TimerSession) -> bool:
+        """
+        タイマーセッションを更新（expectedの状態のままの場合のみ）
+        
+        複数ワーカーが同じセッションを進めても、1つだけが成功する。
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE timer_sessions SET task_index = ?, is_break = ?, status = ?,
+                deadline = ?, remaining = ?, updated_at = ?
+            WHERE id = ? AND task_index = ? AND is_break = ? AND status = ?
+        """, (timer_session.task_index, int(timer_session.is_break), timer_session.status,
+              timer_session.deadline, timer_session.remaining, timer_session.updated_at,
+              timer_session.id, expected.task_index, int(expected.is_break), expected.status))
+        updated = cursor.rowcount == 1
+        conn.commit()
+        conn.close()
+        return updated
+    
+    def _claim_timer_credit(self, cursor, timer_credit: Tuple[str, int]) -> bool:
+        """タスク完了の記録権を取得（1つのタスクにつき1回だけTrue。記録と同じトランザクションで呼ぶ）"""
+        session_id, task_index = timer_credit
+        cursor.execute("""
+            UPDATE timer_sessions SET credited = ?
+            WHERE id = ? AND credited <= ?
+        """, (task_index + 1, session_id, task_index))
+        return cursor.rowcount == 1
+    
+    def purge_timer_sessions(self, finished_before: float, paused_before: float) -> int:
+        """終了（完了・中止）したセッションと、長く一時停止したままのセッションを削除"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE FROM timer_sessions
+            WHERE (status IN ('completed', 'aborted') AND updated_at < ?)
+               OR (status = 'paused' AND updated_at < ?)
+        """, (finished_before, paused_before))
+        deleted = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return deleted
+    
+    def get_active_timer_session(self, owner: str) -> Optional[TimerSession]:
+        """所有者の実行中・一時停止中のセッション（最後に更新したもの）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT * FROM timer_sessions WHERE owner = ? AND status IN ('running', 'paused')
+            ORDER BY updated_at DESC LIMIT 1
+        """, (owner,))
+        row = cursor.fetchone()
+        conn.close()
+        return self._row_to_timer_session(row) if row else None
+    
+    # ===== SSEイベント操作 =====
+    
+    def append_events(self, events: List[Tuple[str, str, str]], now: float):
+        """イベント（所有者, イベント名, JSON）を追加"""
+        if not events:
+            return
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.executemany("INSERT INTO sse_events (owner, event, data, created_at) VALUES (?, ?, ?, ?)",
+                           [(owner, event, data, now) for owner, event, data in events])
+        conn.commit()
+        conn.close()
+    
+    def get_events_after(self, after_id: int, owner: Optional[str] = None, limit: int = 500) -> List[dict]:
+        """after_id より後のイベント（ownerを指定すればその所有者の分だけ）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        if owner is None:
+            cursor.execute("SELECT * FROM sse_events WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit))
+        else:
+            cursor.execute("SELECT * FROM sse_events WHERE owner = ? AND id > ? ORDER BY id LIMIT ?",
+                           (owner, after_id, limit))
+        rows = cursor.fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+    
+    def get_last_event_id(self) -> int:
+        """最新のイベントID（なければ0）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(id) FROM sse_events")
+        last_id = cursor.fetchone()[0]
+        conn.close()
+        return last_id or 0
+    
+    def purge_events(self, before: float) -> int:
+        """古いイベントを削除（再接続時の再送に使う分だけ残す）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM sse_events WHERE created_at < ?", (before,))
+        deleted = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return deleted
+    
+    # ===== Webセッション操作 =====
+    
+    def load_web_session(self, session_id: str, now: float) -> Optional[dict]:
+        """期限内のセッション（data: シリアライズ済みの中身, expires_at）、なければNone"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT data, expires_at FROM web_sessions WHERE id = ? AND expires_at >= ?",
+                       (session_id, now))
+        row = cursor.fetchone()
+        conn.close()
+        return dict(row) if row else None
+    
+    def save_web_session(self, session_id: str, data: str, expires_at: float):
+        """セッションを保存（あれば上書き）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO web_sessions (id, data, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at
+        """, (session_id, data, expires_at))
+        conn.commit()
+        conn.close()
+    
+    def delete_web_session(self, session_id: str):
+        """セッションを削除（ログアウトなど）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM web_sessions WHERE id = ?", (session_id,))
+        conn.commit()
+        conn.close()
+    
+    def purge_web_sessions(self, now: float) -> int:
+        """期限切れのセッションをまとめて削除"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM web_sessions WHERE expires_at < ?", (now,))
+        deleted = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return deleted
+    
+    # ===== 冪等キー操作 =====
+    
+    def reserve_idempotency_key(self, owner: str, key: str, route: str, now: float,
+                                stale_before: Optional[float] = None) -> bool:
+        """
+        キーを予約（既に予約・保存済みならFalse）
+        
+        stale_before より前の予約のままレスポンスがないキー（処理中に落ちたリクエスト）は取り直す。
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR IGNORE INTO idempotency_keys (owner, key, route, created_at)
+            VALUES (?, ?, ?, ?)
+        """, (owner, key, route, now))
+        reserved = cursor.rowcount == 1
+        if not reserved and stale_before is not None:
+            cursor.execute("""
+                UPDATE idempotency_keys SET route = ?, created_at = ?
+                WHERE owner = ? AND key = ? AND status_code IS NULL AND created_at < ?
+            """, (route, now, owner, key, stale_before))
+            reserved = cursor.rowcount == 1
+        conn.commit()
+        conn.close()
+        return reserved
+    
+    def get_idempotent_response(self, owner: str, key: str) -> Optional[dict]:
+        """キーに保存済みのレスポンス（処理中ならstatus_codeがNone）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT route, status_code, headers, body, created_at FROM idempotency_keys
+            WHERE owner = ? AND key = ?
+        """, (owner, key))
+        row = cursor.fetchone()
+        conn.close()
+        return dict(row) if row else None
+    
+    def save_idempotent_response(self, owner: str, key: str, status_code: int, headers: str, body: bytes):
+        """予約したキーにレスポンスを保存"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE idempotency_keys SET status_code = ?, headers = ?, body = ?
+            WHERE owner = ? AND key = ?
+        """, (status_code, headers, body, owner, key))
+        conn.commit()
+        conn.close()
+    
+    def release_idempotency_key(self, owner: str, key: str):
+        """処理に失敗したキーの予約を取り消す（同じキーで再試行できるように）"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM idempotency_keys WHERE owner = ? AND key = ?", (owner, key))
+        conn.commit()
+        conn.close()
+    
+    def purge_idempotency_keys(self, before: float) -> int:
+        """期限切れのキーを削除"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (before,))
+        deleted = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return deleted
@@ -0,0 +1,230 @@
+"""
+SSE購読者へのイベント配信
+
+イベントはDB（sse_events）に書き、各プロセスの EventRelay がそれを読んで
+そのプロセスの購読者（Broadcaster）に配る。gunicornの別ワーカーやタイマーのスレッドで
+起きたイベントも、接続を持っているワーカーから届く。
+"""
+import itertools
+import json
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+class Subscription:
+    """購読者1人分の上限付きキュー"""
+
+    def __init__(self, owner: str, max_queue: int):
+        self.owner = owner
+        self.queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def offer(self, item: tuple) -> bool:
+        """イベントを積む。満杯なら一番古いものを捨てて積む（遅い購読者が他を止めない）"""
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return True
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: float) -> Optional[tuple]:
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class Broadcaster:
+    """所有者（ゲスト / ユーザー）ごとの購読者にイベントを配る"""
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, set] = defaultdict(set)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.published = 0
+
+    def subscribe(self, owner: str) -> Subscription:
+        subscription = Subscription(owner, self.max_queue)
+        with self._lock:
+            self._subscribers[owner].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.owner)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.owner]
+
+    def publish(self, owner: str, event: str, data: dict, event_id: Optional[int] = None) -> int:
+        """ownerの全購読者にイベントを配信し、配信先の数を返す（event_id: DBのイベントID）"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(owner, ()))
+        item = (event_id if event_id is not None else next(self._ids), event, data)
+        for subscription in subscribers:
+            subscription.offer(item)
+        self.published += 1
+        return len(subscribers)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            subscriptions = [s for subs in self._subscribers.values() for s in subs]
+        return {
+            "owners": len({s.owner for s in subscriptions}),
+            "subscribers": len(subscriptions),
+            "published": self.published,
+            "dropped": sum(s.dropped for s in subscriptions),
+        }
+
+
+class EventRelay:
+    """
+    DBに書かれたイベントを interval 秒ごとに読み、このプロセスの購読者に配る
+
+    スレッドは最初の購読（start）で起動する（preload_app ではfork後のワーカーで起動する）。
+    """
+
+    def __init__(self, broadcaster: Broadcaster, db_factory: Callable, interval: float = 0.5,
+                 keep_seconds: float = 600.0, clock: Callable[[], float] = time.time):
+        self.broadcaster = broadcaster
+        self._db_factory = db_factory
+        self._db = None
+        self.interval = interval
+        self.keep_seconds = keep_seconds  # 再接続時の再送に使うため残す秒数
+        self.clock = clock
+        self.cursor = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._last_purge = 0.0
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = self._db_factory()
+        return self._db
+
+    def publish(self, events: Iterable[tuple]):
+        """イベント（所有者, イベント名, データ）をDBに書く（どのプロセス・スレッドからでもよい）"""
+        rows = [(owner, event, json.dumps(data, ensure_ascii=False)) for owner, event, data in events]
+        now = self.clock()
+        self.db.append_events(rows, now)
+        self._maybe_purge(now)
+
+    def start(self):
+        """配信スレッドを起動（何度呼んでもよい）"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.cursor = self.db.get_last_event_id()
+            self._thread = threading.Thread(target=self._run, name="sse-relay", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"SSE relay error: {e}")
+
+    def poll(self) -> int:
+        """新しいイベントを配り、配った数を返す（テストから直接呼べる）"""
+        delivered = 0
+        while True:
+            rows = self.db.get_events_after(self.cursor)
+            for row in rows:
+                self.broadcaster.publish(row["owner"], row["event"], json.loads(row["data"]), event_id=row["id"])
+                self.cursor = row["id"]
+            delivered += len(rows)
+            if len(rows) < 500:
+                break
+        self._maybe_purge(self.clock())
+        return delivered
+
+    def _maybe_purge(self, now: float):
+        if now - self._last_purge >= self.keep_seconds:
+            self._last_purge = now
+            self.db.purge_events(now - self.keep_seconds)
+
+
+class EventStream:
+    """
+    1本のSSE接続で送るフレームを作る（WSGIのジェネレータとASGIのハンドラで共用）
+
+    - 接続時: Last-Event-ID より後のイベント（backlog）を先に送る
+    - poll(): 届いたイベント。なければ実行中のタイマーの残り時間（1秒ごと）・keep-alive（15秒ごと）
+    - max_seconds を過ぎたら closed になる（クライアントは Last-Event-ID を付けて再接続する）
+    """
+
+    TICK_SECONDS = 1.0
+    KEEPALIVE_SECONDS = 15.0
+
+    def __init__(self, broadcaster: Broadcaster, owner: str, backlog: Iterable[dict] = (),
+                 timer: Optional[dict] = None, max_seconds: Optional[float] = None,
+                 clock: Callable[[], float] = time.time):
+        self._broadcaster = broadcaster
+        self.subscription = broadcaster.subscribe(owner)
+        self.backlog = list(backlog)
+        self.timer = timer  # 実行中・一時停止中のタイマー（timerイベントで更新）
+        self.clock = clock
+        now = clock()
+        self.deadline = now + max_seconds if max_seconds else None
+        self.closed = False
+        self._last_id = max((row["id"] for row in self.backlog), default=0)
+        self._last_tick = 0.0
+        self._last_sent = now
+
+    def opening(self) -> str:
+        """最初に送るフレーム（再接続の間隔と、取りこぼしたイベント）"""
+        frames = ["retry: 3000\n\n"]
+        for row in self.backlog:
+            frames.append(self._event(row["id"], row["event"], json.loads(row["data"])))
+        return "".join(frames)
+
+    def poll(self, timeout: float) -> List[str]:
+        """送るフレーム（timeout 秒までイベントを待つ）"""
+        if self.deadline is not None and self.clock() >= self.deadline:
+            self.closed = True
+            return []
+        frames = []
+        item = self.subscription.get(timeout)
+        while item is not None:
+            event_id, event, data = item
+            if event_id > self._last_id:  # backlogで送った分は送らない
+                frames.append(self._event(event_id, event, data))
+            item = self.subscription.get(0)
+
+        now = self.clock()
+        timer = self.timer
+        if timer and timer["status"] == "running" and timer["deadline"] and now - self._last_tick >= self.TICK_SECONDS:
+            self._last_tick = now
+            remaining = max(0, int(round(timer["deadline"] - now)))
+            tick = {"session_id": timer["session_id"], "remaining_seconds": remaining, "is_break": timer["is_break"]}
+            frames.append(f"event: tick\ndata: {json.dumps(tick)}\n\n")
+        if frames:
+            self._last_sent = now
+        elif now - self._last_sent >= self.KEEPALIVE_SECONDS:
+            self._last_sent = now
+            frames.append(": keep-alive\n\n")
+        return frames
+
+    def close(self):
+        self._broadcaster.unsubscribe(self.subscription)
+
+    def _event(self, event_id: int, event: str, data: dict) -> str:
+        if event == "timer":
+            self.timer = data if data["status"] in ("running", "paused") else None
+        return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -116,24 +116,27 @@ class CreatureSystem:
         if not creature:
             return
         
-        # 時間に応じてパラメータ上昇（1分 = 1%）
-        mood_increase = duration
-        energy_increase = max(5, duration // 5)
-        
-        creature.mood = min(100, creature.mood + mood_increase)
-        creature.energy = min(100, creature.energy + energy_increase)
-        
-        # 進化判定
+        self.apply_task_completions(creature, [duration])
         self._check_evolution(creature)
-        
-        # プレゼントをランダムで選ぶ（20%の確率）
-        if random.random() < 0.2:
-            self.last_present = random.choice(self.SMALL_PRESENTS)
-        else:
-            self.last_present = None
-        
         self.db.update_creature(creature)
-    
+
+    def apply_task_completions(self, creature: Creature, durations: List[int]) -> List[Tuple[str, str, str]]:
+        """複数タスクの完了をまとめてパラメータに反映（保存と進化判定は呼び出し側で1回だけ行う）
+
+        Returns:
+            もらったプレゼントのリスト
+        """
+        presents = []
+        for duration in durations:
+            # 時間に応じてパラメータ上昇（1分 = 1%）
+            creature.mood = min(100, creature.mood + duration)
+            creature.energy = min(100, creature.energy + max(5, duration // 5))
+            # プレゼントをランダムで選ぶ（20%の確率）
+            if random.random() < 0.2:
+                presents.append(random.choice(self.SMALL_PRESENTS))
+        self.last_present = presents[-1] if presents else None
+        return presents
+
     def on_task_failed(self):
         """タスク中止時の処理 - 機嫌が30%下がる"""
         creature = self.get_creature()
@@ -0,0 +1,212 @@
+"""
+目標サイクルの複数日プランナー（サイクル期間中の各日にタスクを割り当て）
+"""
+import heapq
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+from ..models import Task, LifestyleSettings
+from .timeline import DailyTimeline
+
+
+@dataclass
+class DayLoad:
+    """1日分の割り当て状況"""
+    day: date
+    capacity: int                  # その日に使える時間（分）
+    used: int = 0                  # 割り当て済みの時間（分）
+    task_ids: List[int] = field(default_factory=list)
+
+    @property
+    def remaining(self) -> int:
+        return self.capacity - self.used
+
+    @property
+    def overloaded(self) -> bool:
+        return self.used > self.capacity
+
+
+@dataclass
+class CyclePlan:
+    """サイクル全体の割り当て結果"""
+    days: Dict[date, DayLoad] = field(default_factory=dict)
+    assignments: Dict[int, date] = field(default_factory=dict)  # task_id -> 日付
+    minutes: Dict[int, int] = field(default_factory=dict)       # task_id -> 占有時間（分）
+
+    def day_of(self, task_id: int) -> Optional[date]:
+        return self.assignments.get(task_id)
+
+
+def parse_date(value) -> Optional[date]:
+    """YYYY-MM-DD文字列（またはdate）をdateに変換"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def task_minutes(task: Task) -> int:
+    """タスクが1日の中で占める時間（作業＋休憩）"""
+    return (task.duration or 0) + (task.break_duration or 0)
+
+
+class CyclePlanner:
+    """
+    生活設定と過去の実績から各日の容量を決め、サイクルのタスクを日ごとに割り当てる
+
+    - 日の容量 = min(生活設定の利用可能時間, 曜日ごとの過去の平均完了時間)
+      （実績がない曜日は生活設定の利用可能時間のみ）
+    - 割り当ては「優先度・難易度・所要時間」の高い順に、残り容量が最大の日へ入れる
+      （日をヒープで管理するので O(n log d)）
+    - 変更時は影響する日だけを更新する（replan）
+    """
+
+    def __init__(self, lifestyle: Optional[LifestyleSettings] = None,
+                 throughput: Optional[Dict[int, float]] = None):
+        """
+        Args:
+            lifestyle: 生活設定
+            throughput: 曜日（0=月曜〜6=日曜）ごとの平均完了時間（分）
+        """
+        self.available = max(0, DailyTimeline(lifestyle).available_minutes())
+        self.throughput = throughput or {}
+
+    # ===== 容量 =====
+
+    def day_capacity(self, day: date) -> int:
+        """その日に割り当て可能な時間（分）"""
+        observed = self.throughput.get(day.weekday())
+        if observed and observed > 0:
+            return int(min(self.available, observed))
+        return self.available
+
+    def _build_days(self, cycle_start: date, cycle_end: date) -> Dict[date, DayLoad]:
+        days = {}
+        current = cycle_start
+        while current <= cycle_end:
+            days[current] = DayLoad(current, self.day_capacity(current))
+            current += timedelta(days=1)
+        return days
+
+    # ===== 一括計画 =====
+
+    def plan(self, tasks: List[Task], cycle_start, cycle_end,
+             today: Optional[date] = None) -> CyclePlan:
+        """
+        サイクル期間 [cycle_start, cycle_end] にタスクを割り当てる
+
+        完了済みのタスク（_cycle_completed）は既存の日付をそのまま保持する。
+        今日より前の日には新しく割り当てない。
+        """
+        start = parse_date(cycle_start)
+        end = parse_date(cycle_end) or start
+        if start is None:
+            return CyclePlan()
+        plan = CyclePlan(days=self._build_days(start, end))
+
+        pending = []
+        for task in tasks:
+            if getattr(task, "_cycle_completed", False):
+                self._keep(plan, task)
+            else:
+                pending.append(task)
+
+        self._place_all(plan, pending, today)
+        return plan
+
+    def from_assignments(self, tasks: List[Task], cycle_start, cycle_end) -> CyclePlan:
+        """保存済みの割り当て（task._planned_date）から計画を復元する"""
+        start = parse_date(cycle_start)
+        end = parse_date(cycle_end) or start
+        if start is None:
+            return CyclePlan()
+        plan = CyclePlan(days=self._build_days(start, end))
+        for task in tasks:
+            self._keep(plan, task)
+        return plan
+
+    # ===== 差分再計画 =====
+
+    def replan(self, plan: CyclePlan, added: Iterable[Task] = (),
+               removed: Iterable[int] = (), changed: Iterable[Task] = (),
+               today: Optional[date] = None) -> Set[date]:
+        """
+        タスクの追加・削除・変更を計画に反映し、影響を受けた日付を返す
+
+        他の日に割り当て済みのタスクは動かさない。
+        """
+        affected: Set[date] = set()
+
+        for task_id in removed:
+            day = self._unassign(plan, task_id)
+            if day:
+                affected.add(day)
+
+        to_place = []
+        for task in changed:
+            day = self._unassign(plan, task.id)
+            if day:
+                affected.add(day)
+            if not getattr(task, "_cycle_completed", False):
+                to_place.append(task)
+        to_place.extend(added)
+
+        affected |= self._place_all(plan, to_place, today)
+        return affected
+
+    # ===== 内部処理 =====
+
+    def _keep(self, plan: CyclePlan, task: Task):
+        """既存の日付が期間内ならその日に登録する"""
+        day = parse_date(getattr(task, "_planned_date", None))
+        if day in plan.days:
+            self._assign(plan, task, day)
+
+    def _assign(self, plan: CyclePlan, task: Task, day: date):
+        load = plan.days[day]
+        load.used += task_minutes(task)
+        load.task_ids.append(task.id)
+        plan.assignments[task.id] = day
+        plan.minutes[task.id] = task_minutes(task)
+
+    def _unassign(self, plan: CyclePlan, task_id: int) -> Optional[date]:
+        day = plan.assignments.pop(task_id, None)
+        if day is None or day not in plan.days:
+            return None
+        load = plan.days[day]
+        if task_id in load.task_ids:
+            load.task_ids.remove(task_id)
+        load.used = max(0, load.used - plan.minutes.pop(task_id, 0))
+        return day
+
+    def _place_all(self, plan: CyclePlan, tasks: List[Task],
+                   today: Optional[date]) -> Set[date]:
+        """残り容量が最大の日へ順に入れる（容量を超える場合も最も空いている日に入れる）"""
+        if not tasks:
+            return set()
+        open_days = [d for d in plan.days if today is None or d >= today]
+        if not open_days:
+            # サイクル期間が過ぎている場合は最終日にまとめる
+            open_days = [max(plan.days)] if plan.days else []
+        if not open_days:
+            return set()
+
+        # (-残り容量, 日付) の最小ヒープ ＝ 残り容量が大きく日付が早い順
+        heap = [(-plan.days[d].remaining, d) for d in open_days]
+        heapq.heapify(heap)
+
+        affected = set()
+        ordered = sorted(
+            tasks,
+            key=lambda t: (-(t.priority or 0), -(t.difficulty or 0), -task_minutes(t), t.id or 0),
+        )
+        for task in ordered:
+            _, day = heapq.heappop(heap)
+            self._assign(plan, task, day)
+            heapq.heappush(heap, (-plan.days[day].remaining, day))
+            affected.add(day)
+        return affected
@@ -0,0 +1,39 @@
+"""
+プロセス内イベントバス（タイマー完了などの内部イベント配信）
+"""
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+
+class EventBus:
+    """
+    イベント名ごとにハンドラを登録し、publishで同期的に呼び出す
+
+    "*" で登録したハンドラはすべてのイベントを受け取る。
+    ハンドラの例外は他のハンドラに影響させない。
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Callable]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def subscribe(self, event_type: str, handler: Callable[[str, dict], None]):
+        """ハンドラを登録（handler(event_type, payload)）"""
+        with self._lock:
+            self._handlers[event_type].append(handler)
+
+    def unsubscribe(self, event_type: str, handler: Callable):
+        with self._lock:
+            if handler in self._handlers.get(event_type, []):
+                self._handlers[event_type].remove(handler)
+
+    def publish(self, event_type: str, **payload):
+        """イベントを配信"""
+        with self._lock:
+            handlers = list(self._handlers.get(event_type, [])) + list(self._handlers.get("*", []))
+        for handler in handlers:
+            try:
+                handler(event_type, payload)
+            except Exception as e:
+                print(f"Event handler error ({event_type}): {e}")
@@ -0,0 +1,107 @@
+"""
+描画済みHTML断片のキャッシュ（LRU、バイト数で上限）
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+
+class FragmentCache:
+    """テンプレートの一部・部分テンプレートの描画結果のLRUキャッシュ
+
+    キーは (スコープ, 断片名, 引数) の安定ハッシュ。スコープにはゲストのデータ版数を
+    入れるので、書き込みがあれば古いエントリは参照されなくなりLRUで追い出される。
+    ゲストに依存しない断片（生命体のパネルなど）はスコープなしで全ゲストが共有する。
+    """
+
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()  # key -> (断片名, HTML)
+        self._sizes: Dict[str, int] = {}
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+
+        # メトリクス（断片名ごとのヒット/ミス）
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.evictions = 0
+
+    # ===== キー生成 =====
+
+    def make_key(self, name: str, args: tuple = (), scope=None) -> str:
+        """キャッシュキーを生成（scope=None は全ゲスト共有）"""
+        raw = json.dumps([scope, name, list(args)], ensure_ascii=False,
+                         separators=(",", ":"), default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ===== 参照・登録 =====
+
+    def get(self, key: str, name: str) -> Optional[str]:
+        """キャッシュを参照（ヒット時はLRU順を更新）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses[name] = self.misses.get(name, 0) + 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits[name] = self.hits.get(name, 0) + 1
+            return entry[1]
+
+    def put(self, key: str, name: str, html: str):
+        """描画結果を登録（1件で上限を超えるものは保存しない）"""
+        size = len(key) + len(html.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._sizes[key]
+            self._entries[key] = (name, html)
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            self.total_bytes += size
+
+            # 上限を超えたら古いものから追い出す
+            while self.total_bytes > self.max_bytes:
+                old_key, _ = self._entries.popitem(last=False)
+                self.total_bytes -= self._sizes.pop(old_key)
+                self.evictions += 1
+
+    def get_or_render(self, name: str, args: tuple, render: Callable[[], str], scope=None) -> str:
+        """キャッシュがあれば返し、なければ描画して登録"""
+        key = self.make_key(name, args, scope)
+        html = self.get(key, name)
+        if html is None:
+            html = str(render())
+            self.put(key, name, html)
+        return html
+
+    def clear(self):
+        """全エントリを破棄（メトリクスは保持）"""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.total_bytes = 0
+
+    # ===== メトリクス =====
+
+    def get_stats(self) -> dict:
+        """全体と断片名ごとのヒット率などの統計を取得"""
+        with self._lock:
+            hits = sum(self.hits.values())
+            misses = sum(self.misses.values())
+            fragments = {}
+            for name in sorted(set(self.hits) | set(self.misses)):
+                h, m = self.hits.get(name, 0), self.misses.get(name, 0)
+                fragments[name] = {"hits": h, "misses": m, "hit_ratio": h / (h + m)}
+            return {
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": (hits / (hits + misses)) if hits + misses else 0.0,
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "fragments": fragments,
+            }
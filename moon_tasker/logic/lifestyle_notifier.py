@@ -0,0 +1,125 @@
+"""
+生活時間通知のスケジューラ（毎秒のチェックをやめ、予定時刻にコールバックを呼ぶ）
+"""
+import asyncio
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+from ..models import LifestyleSettings
+
+
+@dataclass
+class LifestyleNotification:
+    """通知1件（show_at〜hide_at の間だけ表示）"""
+    show_at: datetime
+    hide_at: datetime  # イベント時刻
+    message: str
+
+
+class LifestyleNotifier:
+    """
+    生活設定から「これから来る通知」を時刻順に前計算し、イベントループの
+    call_later で表示・非表示を切り替える
+
+    start() はイベントループ上で呼ぶこと（page.run_task 経由）。
+    """
+
+    LEAD_MINUTES = 5  # イベントの何分前から通知するか
+
+    def __init__(self, lifestyle: Optional[LifestyleSettings] = None,
+                 on_change: Optional[Callable[[str], None]] = None):
+        self.on_change = on_change
+        self.notifications: List[LifestyleNotification] = []
+        self._show_times: List[datetime] = []  # 二分探索用
+        self._events = self._parse_events(lifestyle or LifestyleSettings())
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._handles: List[asyncio.TimerHandle] = []
+        self._cancelled = False
+        self.message = ""
+
+    def _parse_events(self, lifestyle: LifestyleSettings) -> List[tuple]:
+        """時刻文字列の解析は生活設定ごとに1回だけ行う"""
+        events = []
+        for time_str, message in (
+            (lifestyle.lunch_time, "🍴 昼食の時間が近づいています！"),
+            (lifestyle.dinner_time, "🍴 夕食の時間が近づいています！"),
+            (lifestyle.bath_time, "🛁 入浴の時間が近づいています！"),
+            (lifestyle.sleep_time, "😴 就寝の時間が近づいています！"),
+        ):
+            try:
+                t = datetime.strptime(time_str, "%H:%M")
+            except (TypeError, ValueError):
+                continue
+            events.append((t.hour, t.minute, message))
+        return events
+
+    def build(self, now: Optional[datetime] = None,
+              horizon: timedelta = timedelta(days=1)) -> List[LifestyleNotification]:
+        """now から horizon 先までの通知を時刻順に作成"""
+        if now is None:
+            now = datetime.now()
+        lead = timedelta(minutes=self.LEAD_MINUTES)
+        notifications = []
+        for day_offset in (0, 1):
+            base = now + timedelta(days=day_offset)
+            for hour, minute, message in self._events:
+                event_time = base.replace(hour=hour, minute=minute, second=0, microsecond=0)
+                if now < event_time <= now + horizon:
+                    notifications.append(LifestyleNotification(event_time - lead, event_time, message))
+        notifications.sort(key=lambda n: (n.show_at, n.hide_at))
+        self.notifications = notifications
+        self._show_times = [n.show_at for n in notifications]
+        return notifications
+
+    def message_at(self, moment: datetime) -> str:
+        """momentに表示すべき通知（なければ空文字）"""
+        idx = bisect_right(self._show_times, moment)
+        for n in reversed(self.notifications[:idx]):
+            if n.show_at <= moment < n.hide_at:
+                return n.message
+        return ""
+
+    # ===== スケジュール実行 =====
+
+    async def start(self, now: Optional[datetime] = None):
+        """通知を前計算し、表示・非表示の切り替えをイベントループに予約する"""
+        if self._cancelled:
+            # start前にcancelされた場合は何も予約しない
+            return
+        for handle in self._handles:
+            handle.cancel()
+        self._handles = []
+        self._loop = asyncio.get_running_loop()
+        if now is None:
+            now = datetime.now()
+        self.build(now)
+
+        # 切り替え時刻（表示開始・終了）ごとに、その時点の表示内容を予約する
+        instants = sorted({n.show_at for n in self.notifications} |
+                          {n.hide_at for n in self.notifications})
+        for instant in instants:
+            delay = max(0.0, (instant - now).total_seconds())
+            self._handles.append(self._loop.call_later(delay, self._fire, instant))
+        self._set_message(self.message_at(now))
+
+    def cancel(self):
+        """予約済みの通知を取り消す（別スレッドからも呼べる）"""
+        self._cancelled = True
+        handles, self._handles = self._handles, []
+        if not handles or self._loop is None:
+            return
+        if self._loop.is_closed():
+            return
+        for handle in handles:
+            self._loop.call_soon_threadsafe(handle.cancel)
+
+    def _fire(self, instant: datetime):
+        self._set_message(self.message_at(instant))
+
+    def _set_message(self, message: str):
+        if message == self.message:
+            return
+        self.message = message
+        if self.on_change:
+            self.on_change(message)
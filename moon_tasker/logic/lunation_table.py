@@ -0,0 +1,182 @@
+"""
+月相表（新月・上弦・満月・下弦の正確な時刻）
+
+ephem で求めた月相の時刻を「1900-01-01 UTC からの分」の uint32 配列として
+assets/lunations.bin に保存し、二分探索で引く。月相は必ず
+新月 → 上弦 → 満月 → 下弦 の順に並ぶので、種類は先頭の種類と添字から求まり保存しない。
+ephem は表を作るときだけ読み込む（表の範囲外は呼び出し側で平均周期で近似する）。
+
+表の作成:
+    python -m moon_tasker.logic.lunation_table --start 1900 --end 2100
+"""
+import argparse
+import os
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timezone
+from typing import List, Optional
+
+NEW_MOON, FIRST_QUARTER, FULL_MOON, LAST_QUARTER = range(4)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets", "lunations.bin")
+
+# ファイル形式: ヘッダー（マジック, 版, 先頭の種類, 件数）+ uint32 リトルエンディアンの配列
+_HEADER = struct.Struct("<4sHBxI")
+_MAGIC = b"LUNA"
+_VERSION = 1
+_EPOCH_TS = datetime(1900, 1, 1, tzinfo=timezone.utc).timestamp()
+
+
+class LunationTable:
+    """月相の時刻表（時刻はUNIX時刻で受け渡す）"""
+
+    def __init__(self, first_kind: int, minutes: array):
+        self.first_kind = first_kind
+        self.minutes = minutes
+
+    def __len__(self) -> int:
+        return len(self.minutes)
+
+    # ===== 読み書き =====
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_PATH) -> Optional["LunationTable"]:
+        """表を読み込む（ファイルがなければNone）"""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        magic, version, first_kind, count = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"unsupported lunation table: {path}")
+        minutes = array("I")
+        minutes.frombytes(data[_HEADER.size:_HEADER.size + count * 4])
+        if sys.byteorder != "little":
+            minutes.byteswap()
+        return cls(first_kind, minutes)
+
+    def save(self, path: str = DEFAULT_PATH):
+        minutes = array("I", self.minutes)
+        if sys.byteorder != "little":
+            minutes.byteswap()
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, self.first_kind, len(minutes)))
+            f.write(minutes.tobytes())
+
+    @classmethod
+    def build(cls, start_year: int, end_year: int) -> "LunationTable":
+        """ephem で start_year 〜 end_year（両端を含む）の月相を計算する"""
+        import ephem
+
+        finders = (ephem.next_new_moon, ephem.next_first_quarter_moon,
+                   ephem.next_full_moon, ephem.next_last_quarter_moon)
+        start = ephem.Date(f"{start_year}/1/1")
+        end = ephem.Date(f"{end_year + 1}/1/1")
+
+        events = []
+        for kind, finder in enumerate(finders):
+            moment = finder(start)
+            while moment < end:
+                events.append((ephem.Date(moment).datetime().replace(tzinfo=timezone.utc).timestamp(), kind))
+                moment = finder(moment + 1)
+        events.sort()
+
+        first_kind = events[0][1]
+        for i, (_, kind) in enumerate(events):
+            if kind != (first_kind + i) % 4:
+                raise ValueError("lunation phases are out of order")
+        return cls(first_kind, array("I", (round((ts - _EPOCH_TS) / 60) for ts, _ in events)))
+
+    # ===== 検索 =====
+
+    def time_at(self, index: int) -> float:
+        return self.minutes[index] * 60 + _EPOCH_TS
+
+    def kind_at(self, index: int) -> int:
+        return (self.first_kind + index) % 4
+
+    @property
+    def start(self) -> float:
+        return self.time_at(0)
+
+    @property
+    def end(self) -> float:
+        return self.time_at(len(self.minutes) - 1)
+
+    def covers(self, ts: float) -> bool:
+        """tsの前後の月相が表に入っているか"""
+        return len(self.minutes) >= 2 and self.start <= ts < self.end
+
+    def next_event(self, kind: int, ts: float) -> Optional[float]:
+        """ts より後で最初の kind の時刻（表の範囲外ならNone）"""
+        index = bisect_right(self.minutes, (ts - _EPOCH_TS) / 60)
+        index += (kind - self.kind_at(index)) % 4
+        if index >= len(self.minutes):
+            return None
+        return self.time_at(index)
+
+    def phase_at(self, ts: float) -> Optional[float]:
+        """月齢（0.0 = 新月, 0.25 = 上弦, 0.5 = 満月, 0.75 = 下弦）を前後の月相の間で補間"""
+        if not self.covers(ts):
+            return None
+        index = bisect_right(self.minutes, (ts - _EPOCH_TS) / 60) - 1
+        before, after = self.time_at(index), self.time_at(index + 1)
+        return ((self.kind_at(index) + (ts - before) / (after - before)) / 4) % 1.0
+
+    def phases_at(self, timestamps):
+        """phase_at のNumPy版（すべて範囲内であること）"""
+        import numpy as np
+
+        minutes = np.frombuffer(self.minutes, dtype=np.uint32).astype(np.float64)
+        keys = (np.asarray(timestamps, dtype=np.float64) - _EPOCH_TS) / 60
+        index = np.searchsorted(minutes, keys, side="right") - 1
+        before, after = minutes[index], minutes[index + 1]
+        kinds = (self.first_kind + index) % 4
+        return ((kinds + (keys - before) / (after - before)) / 4) % 1.0
+
+
+_cache = {"table": None, "loaded": False}
+_load_lock = threading.Lock()
+
+
+def get_lunation_table(ts: Optional[float] = None) -> Optional[LunationTable]:
+    """
+    共有の月相表を返す（初回のみファイルを読む）
+
+    ts が範囲外、または表がなければNone（呼び出し側で平均周期で近似する）。
+    リクエストの中で ephem を使って表を広げることはしない。
+    """
+    if not _cache["loaded"]:
+        with _load_lock:
+            if not _cache["loaded"]:
+                try:
+                    _cache["table"] = LunationTable.load()
+                except (OSError, ValueError) as e:
+                    print(f"Lunation table load error: {e}")
+                _cache["loaded"] = True
+
+    table = _cache["table"]
+    if table is None or ts is None or table.covers(ts):
+        return table
+    return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="月相表を作成（ephemが必要）")
+    parser.add_argument("--start", type=int, default=1900, help="最初の年")
+    parser.add_argument("--end", type=int, default=2100, help="最後の年")
+    parser.add_argument("--output", default=DEFAULT_PATH)
+    args = parser.parse_args(argv)
+
+    table = LunationTable.build(args.start, args.end)
+    table.save(args.output)
+    print(f"{len(table)} phases, {os.path.getsize(args.output)} bytes -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+"""
+メトリクス（Prometheusのテキスト形式）
+
+カウンターとヒストグラムはスレッドごとの領域に書く（記録のたびにロックを取らない）。
+集計は読み出し時に全スレッドの領域を足し合わせる。
+
+gunicornの複数ワーカーでは、各ワーカーが directory/<pid>.json に自分の集計を書き、
+/metrics に答えたワーカーが全ファイルを足し合わせる。終了したワーカーのカウンター・
+ヒストグラムは残す（値が減らないように）。ゲージ（キャッシュの件数など）は
+生きているワーカーの分だけを足す。
+"""
+import bisect
+import glob
+import inspect
+import json
+import os
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# 秒
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    labels = list(labels)
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class MetricsRegistry:
+    """
+    カウンター・ヒストグラム・ゲージの登録と出力
+
+    Args:
+        directory: ワーカー間で集計を共有するディレクトリ（Noneならこのプロセスだけ）
+        flush_interval: 自分の集計をファイルに書く最短間隔（秒）
+    """
+
+    def __init__(self, directory: Optional[str] = None, buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+                 flush_interval: float = 5.0):
+        self.directory = directory
+        self.buckets = tuple(buckets)
+        self.flush_interval = flush_interval
+        self._descriptions: Dict[str, Tuple[str, str]] = {}
+        self._collectors: List[Callable] = []
+        self._shards_lock = threading.Lock()
+        self._reset()
+        if hasattr(os, "register_at_fork"):
+            # preload_app では親プロセスの値をワーカーが引き継がないようにする
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._last_flush = 0.0
+
+    # ===== 定義 =====
+
+    def describe(self, name: str, metric_type: str, help_text: str):
+        """メトリクスの種類（counter / histogram / gauge）と説明（なければ記録の仕方から決める）"""
+        self._descriptions[name] = (metric_type, help_text)
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, Labels, float]]]):
+        """読み出し時に (名前, ラベル, 値) のゲージを返す関数を登録"""
+        self._collectors.append(collector)
+
+    # ===== 記録（ロックなし） =====
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {"counters": {}, "histograms": {}}
+            self._local.shard = shard
+            with self._shards_lock:  # スレッドごとに最初の1回だけ
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name: str, labels: Labels = (), value: float = 1.0):
+        counters = self._shard()["counters"]
+        key = (name, labels)
+        counters[key] = counters.get(key, 0.0) + value
+
+    def observe(self, name: str, labels: Labels, seconds: float):
+        histograms = self._shard()["histograms"]
+        key = (name, labels)
+        entry = histograms.get(key)
+        if entry is None:
+            entry = histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, seconds)] += 1
+        entry[1] += seconds
+
+    # ===== 集計 =====
+
+    def snapshot(self) -> dict:
+        """このプロセスの集計（JSONにできる形）"""
+        counters: Dict[tuple, float] = {}
+        histograms: Dict[tuple, list] = {}
+        for shard in list(self._shards):
+            for key, value in dict(shard["counters"]).items():
+                counters[key] = counters.get(key, 0.0) + value
+            for key, (counts, total) in dict(shard["histograms"]).items():
+                merged = histograms.setdefault(key, [[0] * len(counts), 0.0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+        gauges = []
+        for collector in self._collectors:
+            try:
+                gauges.extend([name, list(labels), value] for name, labels, value in collector())
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+        return {
+            "counters": [[name, list(labels), value] for (name, labels), value in counters.items()],
+            "histograms": [[name, list(labels), counts, total] for (name, labels), (counts, total) in histograms.items()],
+            "gauges": gauges,
+        }
+
+    def flush(self):
+        """自分の集計をファイルに書く（書き換えは置き換えで行い、読み手が途中の内容を見ないように）"""
+        if not self.directory:
+            return
+        self._last_flush = time.time()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Metrics flush error: {e}")
+
+    def maybe_flush(self):
+        """flush_interval 秒に1回だけ書く（リクエストの終わりに呼ぶ）"""
+        if self.directory and time.time() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def collect(self) -> dict:
+        """全ワーカー（directoryがなければこのプロセス）の集計を足し合わせる"""
+        if not self.directory:
+            snapshots = [(os.getpid(), self.snapshot())]
+        else:
+            self.flush()
+            snapshots = []
+            for path in glob.glob(os.path.join(self.directory, "*.json")):
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        snapshots.append((int(os.path.basename(path)[:-5]), json.load(f)))
+                except (OSError, ValueError) as e:
+                    print(f"Metrics read error ({path}): {e}")
+
+        counters: Dict[tuple, float] = {}
+        histograms: Dict[tuple, list] = {}
+        gauges: Dict[tuple, float] = {}
+        for pid, snapshot in snapshots:
+            for name, labels, value in snapshot["counters"]:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0.0) + value
+            for name, labels, counts, total in snapshot["histograms"]:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.setdefault(key, [[0] * len(counts), 0.0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+            if pid == os.getpid() or _pid_alive(pid):
+                for name, labels, value in snapshot["gauges"]:
+                    key = (name, tuple(map(tuple, labels)))
+                    gauges[key] = gauges.get(key, 0.0) + value
+        return {"counters": counters, "histograms": histograms, "gauges": gauges}
+
+    def render(self) -> str:
+        """Prometheusのテキスト形式"""
+        collected = self.collect()
+        by_name: Dict[str, List[str]] = {}
+        types: Dict[str, str] = {}
+
+        for kind in ("counters", "gauges"):
+            for (name, labels), value in sorted(collected[kind].items()):
+                types.setdefault(name, kind[:-1])
+                by_name.setdefault(name, []).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), (counts, total) in sorted(collected["histograms"].items()):
+            types.setdefault(name, "histogram")
+            lines = by_name.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+
+        output = []
+        for name in sorted(by_name):
+            metric_type, help_text = self._descriptions.get(name, (types[name], ""))
+            if help_text:
+                output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {metric_type}")
+            output.extend(by_name[name])
+        return "\n".join(output) + "\n"
+
+
+# アプリ全体で使う登録先（METRICS_DIR があればワーカー間で集計を共有）
+metrics = MetricsRegistry(directory=os.environ.get("METRICS_DIR") or None)
+
+metrics.describe("moon_tasker_http_request_duration_seconds", "histogram", "Flaskのルートごとの処理時間")
+metrics.describe("moon_tasker_http_requests_total", "counter", "ルート・ステータスごとのリクエスト数")
+metrics.describe("moon_tasker_db_call_duration_seconds", "histogram", "Databaseのメソッドごとの処理時間")
+metrics.describe("moon_tasker_db_connections_total", "counter", "Databaseのメソッドごとに開いた接続数")
+metrics.describe("moon_tasker_db_statements_total", "counter", "Databaseのメソッドごとに実行したSQL文の数")
+metrics.describe("moon_tasker_cloud_request_duration_seconds", "histogram",
+                 "Supabaseへのリクエストの応答時間（ヘッダーを受け取るまで）")
+
+
+def stats_collector(component: str, get_stats: Callable[[], dict]) -> Callable:
+    """
+    get_stats() の数値をゲージにする関数を返す
+
+    {"hits": 3, "entries": 2} -> moon_tasker_<component>_hits 3 など。割合は出さない
+    （ワーカー間で足せないため。hits/misses から計算できる）。入れ子の辞書は
+    {"fragments": {"badge_grid": {"hits": 1}}} -> moon_tasker_<component>_fragment_hits{fragment="badge_grid"}。
+    """
+    prefix = f"moon_tasker_{component}"
+
+    def collect():
+        for key, value in get_stats().items():
+            if isinstance(value, dict):
+                label = key[:-1] if key.endswith("s") else key
+                for item, values in value.items():
+                    for stat, number in values.items():
+                        if isinstance(number, (int, float)) and not stat.endswith("ratio"):
+                            yield f"{prefix}_{label}_{stat}", ((label, item),), number
+            elif isinstance(value, (int, float)) and not key.endswith("ratio"):
+                yield f"{prefix}_{key}", (), value
+    return collect
+
+
+# ===== Database の計測 =====
+
+_db_call = threading.local()
+
+
+def instrument_database(cls, registry: MetricsRegistry = metrics):
+    """
+    Databaseクラスの公開メソッドに計測を付ける
+
+    一番外側で呼ばれたメソッドの名前で、処理時間・開いた接続数・実行したSQL文の数を数える
+    （メソッドの中で別のメソッドを呼んでも二重に数えない）。
+    """
+    if getattr(cls, "_metrics_instrumented", False):
+        return cls
+
+    def timed(name, method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            if getattr(_db_call, "method", None) is not None:
+                return method(*args, **kwargs)
+            _db_call.method = name
+            t0 = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                _db_call.method = None
+                registry.observe("moon_tasker_db_call_duration_seconds", (("method", name),),
+                                 time.perf_counter() - t0)
+        return wrapper
+
+    get_connection = cls.get_connection
+
+    @wraps(get_connection)
+    def counted_connection(self, *args, **kwargs):
+        conn = get_connection(self, *args, **kwargs)
+        labels = (("method", getattr(_db_call, "method", None) or "other"),)
+        registry.inc("moon_tasker_db_connections_total", labels)
+        conn.set_trace_callback(lambda sql: registry.inc("moon_tasker_db_statements_total", labels))
+        return conn
+
+    for name, member in list(vars(cls).items()):
+        if name.startswith("_") or name == "get_connection" or not inspect.isfunction(member):
+            continue
+        setattr(cls, name, timed(name, member))
+    cls.get_connection = counted_connection
+    cls._metrics_instrumented = True
+    return cls
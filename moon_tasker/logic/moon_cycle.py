@@ -1,14 +1,75 @@
 """
 月のサイクル計算ロジック
 """
-from datetime import datetime, timedelta
-import math
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Any, List
+from .lunation_table import NEW_MOON, FULL_MOON, get_lunation_table
+
+
+# 月齢の区切り（この値以上で次の名前）と、各区間の名前・絵文字
+PHASE_BOUNDARIES = (0.0625, 0.1875, 0.3125, 0.4375, 0.5625, 0.6875, 0.8125, 0.9375)
+PHASE_NAMES = ("新月 🌑", "三日月 🌒", "上弦の月 🌓", "十日夜の月 🌔", "満月 🌕",
+               "寝待月 🌖", "下弦の月 🌗", "有明月 🌘", "新月 🌑")
+PHASE_EMOJIS = ("🌑", "🌒", "🌓", "🌔", "🌕", "🌖", "🌗", "🌘", "🌑")
+
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+@dataclass
+class MoonCalendar:
+    """期間内の月齢（NumPy配列）"""
+    times: Any      # datetime64[m] の配列
+    phases: Any     # 月齢 0.0〜1.0 の配列
+    buckets: Any    # PHASE_NAMES / PHASE_EMOJIS の添字の配列
+    
+    def __len__(self) -> int:
+        return len(self.phases)
+    
+    def emojis(self) -> List[str]:
+        return [PHASE_EMOJIS[b] for b in self.buckets.tolist()]
+    
+    def names(self) -> List[str]:
+        return [PHASE_NAMES[b] for b in self.buckets.tolist()]
+    
+    def new_moon_mask(self):
+        """新月期間（新月の前後2日）"""
+        return (self.phases < 0.07) | (self.phases > 0.93)
+    
+    def full_moon_mask(self):
+        """満月期間（満月の前後2日）"""
+        return (self.phases > 0.43) & (self.phases < 0.57)
+    
+    def to_rows(self) -> List[dict]:
+        """テンプレート・画面表示用の行に変換"""
+        new_moon = self.new_moon_mask().tolist()
+        full_moon = self.full_moon_mask().tolist()
+        return [
+            {
+                "time": t,
+                "phase": round(p, 4),
+                "emoji": PHASE_EMOJIS[b],
+                "name": PHASE_NAMES[b],
+                "is_new_moon": n,
+                "is_full_moon": f,
+            }
+            for t, p, b, n, f in zip(self.times.astype(datetime).tolist(), self.phases.tolist(),
+                                     self.buckets.tolist(), new_moon, full_moon)
+        ]
 
 
 class MoonCycleCalculator:
-    """月の満ち欠け計算クラス"""
+    """
+    月の満ち欠け計算クラス
     
-    # 既知の新月の日（基準点）
+    実際の新月・満月などの時刻は月相表（lunation_table）から引く。
+    日時はローカル時刻として扱う。表もephemもない場合は平均周期で近似する。
+    """
+    
+    # 既知の新月の日（基準点、近似用）
     KNOWN_NEW_MOON = datetime(2000, 1, 6, 18, 14)
     
     # 月の周期（日）
@@ -24,6 +85,10 @@ class MoonCycleCalculator:
         if date is None:
             date = datetime.now()
         
+        table = get_lunation_table(date.timestamp())
+        if table is not None:
+            return table.phase_at(date.timestamp())
+        
         # 基準点からの経過日数
         days_since = (date - self.KNOWN_NEW_MOON).total_seconds() / 86400
         
@@ -34,55 +99,64 @@ class MoonCycleCalculator:
     
     def get_moon_phase_name(self, date: datetime = None) -> str:
         """月の満ち欠けの名前を取得"""
-        phase = self.get_moon_phase(date)
-        
-        if phase < 0.0625:
-            return "新月 🌑"
-        elif phase < 0.1875:
-            return "三日月 🌒"
-        elif phase < 0.3125:
-            return "上弦の月 🌓"
-        elif phase < 0.4375:
-            return "十日夜の月 🌔"
-        elif phase < 0.5625:
-            return "満月 🌕"
-        elif phase < 0.6875:
-            return "寝待月 🌖"
-        elif phase < 0.8125:
-            return "下弦の月 🌗"
-        elif phase < 0.9375:
-            return "有明月 🌘"
-        else:
-            return "新月 🌑"
+        return PHASE_NAMES[bisect_right(PHASE_BOUNDARIES, self.get_moon_phase(date))]
     
     def get_moon_emoji(self, date: datetime = None) -> str:
         """月の絵文字を取得"""
-        phase = self.get_moon_phase(date)
+        return PHASE_EMOJIS[bisect_right(PHASE_BOUNDARIES, self.get_moon_phase(date))]
+    
+    def get_phase_calendar(self, start: date, end: date, resolution: str = "day") -> "MoonCalendar":
+        """
+        期間内の月齢をまとめて計算（1か月・1年分を1回で）
+        
+        Args:
+            start, end: 期間（両端を含む）
+            resolution: "day"（各日の正午）または "hour"（毎正時）
+        """
+        import numpy as np
         
-        if phase < 0.0625:
-            return "🌑"
-        elif phase < 0.1875:
-            return "🌒"
-        elif phase < 0.3125:
-            return "🌓"
-        elif phase < 0.4375:
-            return "🌔"
-        elif phase < 0.5625:
-            return "🌕"
-        elif phase < 0.6875:
-            return "🌖"
-        elif phase < 0.8125:
-            return "🌗"
-        elif phase < 0.9375:
-            return "🌘"
+        if resolution == "day":
+            step = np.timedelta64(1, "D")
+            first = datetime.combine(_as_date(start), dt_time(12))
+            last = datetime.combine(_as_date(end), dt_time(12))
+        elif resolution == "hour":
+            step = np.timedelta64(1, "h")
+            first = datetime.combine(_as_date(start), dt_time(0))
+            last = datetime.combine(_as_date(end), dt_time(23))
         else:
-            return "🌑"
+            raise ValueError(f"unknown resolution: {resolution}")
+        
+        times = np.arange(np.datetime64(first, "m"), np.datetime64(last, "m") + step, step)
+        
+        # ローカル時刻 → UNIX時刻（期間中に夏時間の切り替えがあれば1点ずつ）
+        seconds = (times - np.datetime64("1970-01-01T00:00", "m")) / np.timedelta64(1, "s")
+        samples = [first + timedelta(days=d) for d in range(0, (last - first).days + 1, 7)] + [last]
+        offsets = {s.astimezone().utcoffset().total_seconds() for s in samples}
+        if len(offsets) == 1:
+            timestamps = seconds - offsets.pop()
+        else:
+            timestamps = seconds - np.array([t.astimezone().utcoffset().total_seconds()
+                                             for t in times.astype(datetime).tolist()])
+        
+        table = get_lunation_table()
+        if table is not None and table.covers(timestamps[0]) and table.covers(timestamps[-1]):
+            phases = table.phases_at(timestamps)
+        else:
+            days_since = (times - np.datetime64(self.KNOWN_NEW_MOON, "m")) / np.timedelta64(1, "D")
+            phases = np.mod(days_since, self.LUNAR_CYCLE) / self.LUNAR_CYCLE
+        buckets = np.searchsorted(np.asarray(PHASE_BOUNDARIES), phases, side="right")
+        return MoonCalendar(times=times, phases=phases, buckets=buckets)
     
     def get_next_new_moon(self, date: datetime = None) -> datetime:
         """次の新月の日を取得"""
         if date is None:
             date = datetime.now()
         
+        table = get_lunation_table(date.timestamp())
+        moment = table.next_event(NEW_MOON, date.timestamp()) if table else None
+        if moment is not None:
+            return datetime.fromtimestamp(moment)
+        
         phase = self.get_moon_phase(date)
         
         # 次の新月までの日数
@@ -95,6 +169,11 @@ class MoonCycleCalculator:
         if date is None:
             date = datetime.now()
         
+        table = get_lunation_table(date.timestamp())
+        moment = table.next_event(FULL_MOON, date.timestamp()) if table else None
+        if moment is not None:
+            return datetime.fromtimestamp(moment)
+        
         phase = self.get_moon_phase(date)
         
         # 次の満月までの日数
@@ -1,10 +1,11 @@
 """
 AIスケジュール生成ロジック（遺伝的アルゴリズム対応）
 """
+import math
 import random
-from typing import List, Tuple
-from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
 from ..models import Task, LifestyleSettings
+from .timeline import DailyTimeline, to_day_minutes
 
 
 class ScheduleOptimizer:
@@ -82,12 +83,16 @@ class ScheduleOptimizer:
 class GeneticScheduleOptimizer:
     """遺伝的アルゴリズムによるスケジュール最適化"""
     
-    def __init__(self, lifestyle: LifestyleSettings):
+    def __init__(self, lifestyle: LifestyleSettings, seed: Optional[int] = None):
         self.lifestyle = lifestyle
         self.population_size = 50
         self.generations = 100
         self.mutation_rate = 0.1
         self.elite_size = 5
+        # シード指定時は再現可能な乱数列を使う
+        self.random = random.Random(seed)
+        # 適応度評価の回数（ベンチマーク用）
+        self.fitness_evaluations = 0
     
     def optimize(self, tasks: List[Task]) -> List[Task]:
         """
@@ -145,53 +150,15 @@ class GeneticScheduleOptimizer:
     
     def _time_to_day_minutes(self, time_str: str) -> int:
         """時刻を分に変換（4:00を0分として計算）"""
-        t = datetime.strptime(time_str, "%H:%M")
-        minutes = t.hour * 60 + t.minute
-        # 4:00を基準（0分）として調整
-        day_start_offset = 4 * 60  # 4:00 = 240分
-        if minutes >= day_start_offset:
-            return minutes - day_start_offset
-        else:
-            return minutes + (24 * 60 - day_start_offset)
+        return to_day_minutes(time_str)
     
     def _calculate_available_time(self) -> int:
         """利用可能時間を計算（分、4:00基準）"""
-        wake_minutes = self._time_to_day_minutes(self.lifestyle.wake_time)
-        sleep_minutes = self._time_to_day_minutes(self.lifestyle.sleep_time)
-        
-        if sleep_minutes < wake_minutes:
-            # 翌日にまたぐ場合（4:00基準で）
-            total_minutes = (24 * 60) - wake_minutes + sleep_minutes
-        else:
-            total_minutes = sleep_minutes - wake_minutes
-        
-        # 食事と入浴の時間を引く
-        total_minutes -= self.lifestyle.meal_duration * 3  # 朝昼夕
-        total_minutes -= self.lifestyle.bath_duration
-        
-        return total_minutes
+        return DailyTimeline(self.lifestyle).available_minutes()
     
     def _get_blocked_times(self) -> List[Tuple[int, int]]:
         """ブロックされる時間帯を取得（分単位、4:00基準）"""
-        blocked = []
-        
-        # 朝食
-        start = self._time_to_day_minutes(self.lifestyle.breakfast_time)
-        blocked.append((start, start + self.lifestyle.meal_duration))
-        
-        # 昼食
-        start = self._time_to_day_minutes(self.lifestyle.lunch_time)
-        blocked.append((start, start + self.lifestyle.meal_duration))
-        
-        # 夕食
-        start = self._time_to_day_minutes(self.lifestyle.dinner_time)
-        blocked.append((start, start + self.lifestyle.meal_duration))
-        
-        # 入浴
-        start = self._time_to_day_minutes(self.lifestyle.bath_time)
-        blocked.append((start, start + self.lifestyle.bath_duration))
-        
-        return blocked
+        return DailyTimeline(self.lifestyle).blocked_intervals()
     
     def _create_initial_population(self, tasks: List[Task]) -> List[List[int]]:
         """初期集団を生成"""
@@ -200,7 +167,7 @@ class GeneticScheduleOptimizer:
         
         for _ in range(self.population_size):
             individual = indices.copy()
-            random.shuffle(individual)
+            self.random.shuffle(individual)
             population.append(individual)
         
         return population
@@ -214,6 +181,7 @@ class GeneticScheduleOptimizer:
         2. 時間効率: 指定時間内に収まる（高スコア）
         3. バランス: 難易度が交互に変化（高スコア）
         """
+        self.fitness_evaluations += 1
         score = 0.0
         
         # 基準時刻（起床時間、4:00基準）
@@ -244,7 +212,7 @@ class GeneticScheduleOptimizer:
     def _tournament_selection(self, fitness_scores: List[Tuple[float, List[int]]]) -> List[int]:
         """トーナメント選択"""
         tournament_size = 3
-        tournament = random.sample(fitness_scores, min(tournament_size, len(fitness_scores)))
+        tournament = self.random.sample(fitness_scores, min(tournament_size, len(fitness_scores)))
         return max(tournament, key=lambda x: x[0])[1]
     
     def _crossover(self, parent1: List[int], parent2: List[int]) -> List[int]:
@@ -253,12 +221,13 @@ class GeneticScheduleOptimizer:
         if size < 2:
             return parent1.copy()
         
-        start, end = sorted(random.sample(range(size), 2))
+        start, end = sorted(self.random.sample(range(size), 2))
         
         child = [-1] * size
         child[start:end] = parent1[start:end]
         
-        remaining = [x for x in parent2 if x not in child]
+        taken = set(child[start:end])
+        remaining = [x for x in parent2 if x not in taken]
         
         j = 0
         for i in range(size):
@@ -270,7 +239,198 @@ class GeneticScheduleOptimizer:
     
     def _mutate(self, individual: List[int]) -> List[int]:
         """突然変異（スワップ）"""
-        if random.random() < self.mutation_rate and len(individual) > 1:
-            i, j = random.sample(range(len(individual)), 2)
+        if self.random.random() < self.mutation_rate and len(individual) > 1:
+            i, j = self.random.sample(range(len(individual)), 2)
             individual[i], individual[j] = individual[j], individual[i]
         return individual
+
+
+class PositionWeightModel:
+    """
+    順序の評価モデル（局所探索の差分評価用）
+
+    F(順序) = Σ w[p]·v[タスク] + 交互ボーナス × (隣接タスクの難易度帯が変わる回数)
+
+    - w[p] = 1 - p/n : 先頭ほど重い位置の重み（集中力の高い時間帯）
+    - v = 難易度 × 2 + 優先度 : 早く着手したいタスクほど大きい
+    w が線形なので、挿入で位置が1つずれる区間の変化は「区間のv合計 / n」になり、
+    現在の順序に対するvの累積和があればスワップ・挿入ともにO(1)で差分が求まる。
+    """
+
+    ALTERNATION_BONUS = 2.0
+
+    def __init__(self, tasks: List[Task]):
+        self.n = len(tasks)
+        self.values = [(t.difficulty or 0) * 2 + (t.priority or 0) for t in tasks]
+        self.bands = [self._band(t.difficulty or 0) for t in tasks]
+        self.weights = [1.0 - p / self.n for p in range(self.n)] if self.n else []
+        self.order: List[int] = []
+        self.prefix: List[float] = [0.0]
+
+    @staticmethod
+    def _band(difficulty: int) -> int:
+        """難易度帯（generate_balanced_schedule と同じ区分）"""
+        return 0 if difficulty <= 2 else (1 if difficulty == 3 else 2)
+
+    # ===== 全体評価 =====
+
+    def score(self, order: List[int]) -> float:
+        """順序全体を評価（O(n)）"""
+        total = sum(self.weights[p] * self.values[t] for p, t in enumerate(order))
+        total += self.ALTERNATION_BONUS * sum(
+            1 for a, b in zip(order, order[1:]) if self.bands[a] != self.bands[b]
+        )
+        return total
+
+    def load(self, order: List[int]):
+        """差分評価の基準となる現在の順序を設定"""
+        self.order = list(order)
+        self._rebuild_prefix(0)
+
+    def _rebuild_prefix(self, start: int, end: Optional[int] = None):
+        """位置 start..end の累積和を作り直す（受理した手が動かした範囲だけ）"""
+        if len(self.prefix) != self.n + 1:
+            self.prefix = [0.0] * (self.n + 1)
+            start, end = 0, None
+        stop = self.n if end is None else end + 1
+        for p in range(start, stop):
+            self.prefix[p + 1] = self.prefix[p] + self.values[self.order[p]]
+
+    def _edge(self, a: int, b: int) -> float:
+        return self.ALTERNATION_BONUS if self.bands[a] != self.bands[b] else 0.0
+
+    # ===== スワップ =====
+
+    def swap_delta(self, i: int, j: int) -> float:
+        """位置iとjを入れ替えたときの評価の変化量（O(1)）"""
+        if i == j:
+            return 0.0
+        if i > j:
+            i, j = j, i
+        order = self.order
+        a, b = order[i], order[j]
+        delta = (self.weights[i] - self.weights[j]) * (self.values[b] - self.values[a])
+
+        # 影響する隣接ペアだけを再計算
+        def at(p):
+            if p == i:
+                return b
+            if p == j:
+                return a
+            return order[p]
+
+        edges = {i - 1, i, j - 1, j}
+        for e in edges:
+            if 0 <= e < self.n - 1:
+                delta += self._edge(at(e), at(e + 1)) - self._edge(order[e], order[e + 1])
+        return delta
+
+    def apply_swap(self, i: int, j: int):
+        if i > j:
+            i, j = j, i
+        self.order[i], self.order[j] = self.order[j], self.order[i]
+        self._rebuild_prefix(i, j)
+
+    # ===== 挿入 =====
+
+    def insert_delta(self, i: int, j: int) -> float:
+        """位置iのタスクを取り出して位置jに入れたときの評価の変化量（O(1)）"""
+        if i == j:
+            return 0.0
+        order = self.order
+        x = order[i]
+        step = 1.0 / self.n  # 隣接位置の重みの差
+        delta = self.values[x] * (self.weights[j] - self.weights[i])
+        if i < j:
+            # i+1..j が1つ前にずれる
+            delta += (self.prefix[j + 1] - self.prefix[i + 1]) * step
+        else:
+            # j..i-1 が1つ後ろにずれる
+            delta -= (self.prefix[i] - self.prefix[j]) * step
+
+        # 隣接ペアの変化: 取り出し位置の両隣がつながり、挿入位置の両隣との間にxが入る
+        last = self.n - 1
+        if i < j:
+            left, right = order[j], (order[j + 1] if j < last else None)
+        else:
+            left, right = (order[j - 1] if j > 0 else None), order[j]
+        prev_i = order[i - 1] if i > 0 else None
+        next_i = order[i + 1] if i < last else None
+
+        if prev_i is not None:
+            delta -= self._edge(prev_i, x)
+        if next_i is not None:
+            delta -= self._edge(x, next_i)
+        if prev_i is not None and next_i is not None:
+            delta += self._edge(prev_i, next_i)
+        if left is not None and right is not None:
+            delta -= self._edge(left, right)
+        if left is not None:
+            delta += self._edge(left, x)
+        if right is not None:
+            delta += self._edge(x, right)
+        return delta
+
+    def apply_insert(self, i: int, j: int):
+        x = self.order.pop(i)
+        self.order.insert(j, x)
+        self._rebuild_prefix(min(i, j), max(i, j))
+
+
+class AnnealingScheduleOptimizer:
+    """焼きなまし法によるスケジュール最適化（スワップ・挿入の近傍をO(1)で差分評価）"""
+
+    def __init__(self, seed: Optional[int] = None, iterations: Optional[int] = None):
+        self.random = random.Random(seed)
+        self.iterations = iterations
+        self.start_temperature = 5.0
+        self.end_temperature = 0.01
+        # 近傍の評価回数（ベンチマーク用）
+        self.fitness_evaluations = 0
+
+    def optimize(self, tasks: List[Task]) -> List[Task]:
+        """
+        焼きなまし法でタスク順序を最適化
+
+        Args:
+            tasks: タスクのリスト
+
+        Returns:
+            最適化されたタスク順序
+        """
+        n = len(tasks)
+        if n <= 1:
+            return tasks
+
+        model = PositionWeightModel(tasks)
+        # 初期解: 値の大きい順（位置の重みに対する貪欲解）
+        model.load(sorted(range(n), key=lambda t: model.values[t], reverse=True))
+
+        current = model.score(model.order)
+        best, best_order = current, list(model.order)
+
+        iterations = self.iterations or min(200_000, max(2_000, 200 * n))
+        cooling = (self.end_temperature / self.start_temperature) ** (1.0 / iterations)
+        temperature = self.start_temperature
+        rng = self.random
+
+        for _ in range(iterations):
+            i = rng.randrange(n)
+            j = rng.randrange(n - 1)
+            if j >= i:
+                j += 1
+            use_swap = rng.random() < 0.5
+            delta = model.swap_delta(i, j) if use_swap else model.insert_delta(i, j)
+            self.fitness_evaluations += 1
+
+            if delta >= 0 or rng.random() < math.exp(delta / temperature):
+                if use_swap:
+                    model.apply_swap(i, j)
+                else:
+                    model.apply_insert(i, j)
+                current += delta
+                if current > best + 1e-9:
+                    best, best_order = current, list(model.order)
+            temperature *= cooling
+
+        return [tasks[i] for i in best_order]
@@ -0,0 +1,172 @@
+"""
+スケジュール最適化結果キャッシュ（LRU）
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+from ..models import Task, LifestyleSettings
+
+
+class ScheduleCache:
+    """最適化結果のLRUキャッシュ
+
+    キーは (タスクID＋属性, 生活設定, モード, 制限時間, シード) の安定ハッシュ。
+    値は最適化後のタスクID順序。
+    """
+
+    # キーに含めるタスク属性（順序に影響するもののみ）
+    TASK_FIELDS = ("id", "difficulty", "duration", "break_duration", "priority", "status")
+
+    # キーに含める生活設定の項目
+    LIFESTYLE_FIELDS = (
+        "wake_time", "sleep_time", "min_sleep_hours", "bath_time", "bath_duration",
+        "breakfast_time", "lunch_time", "dinner_time", "meal_duration",
+    )
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, List[int]]" = OrderedDict()
+        # 無効化用の逆引きインデックス
+        self._keys_by_task: Dict[int, Set[str]] = {}
+        self._keys_by_lifestyle: Dict[str, Set[str]] = {}
+        self._owners: Dict[str, tuple] = {}  # key -> (タスクID群, 生活設定FP)
+        self._lock = threading.Lock()
+
+        # メトリクス
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # ===== キー生成 =====
+
+    def lifestyle_fingerprint(self, lifestyle: Optional[LifestyleSettings]) -> str:
+        """生活設定のフィンガープリント"""
+        if lifestyle is None:
+            lifestyle = LifestyleSettings()
+        fields = [getattr(lifestyle, name) for name in self.LIFESTYLE_FIELDS]
+        return self._digest(fields)
+
+    def make_key(self, tasks: List[Task], lifestyle: Optional[LifestyleSettings], mode: str,
+                 time_limit: Optional[int] = None, seed: Optional[int] = None) -> str:
+        """キャッシュキーを生成（タスクの並び順には依存しない）"""
+        task_rows = sorted(
+            [getattr(task, name) for name in self.TASK_FIELDS]
+            for task in tasks
+        )
+        return self._digest([
+            task_rows,
+            self.lifestyle_fingerprint(lifestyle),
+            mode,
+            time_limit,
+            seed,
+        ])
+
+    def _digest(self, payload) -> str:
+        """JSON化してSHA-256を取る（dict順・プロセスに依存しない安定ハッシュ）"""
+        raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ===== 参照・登録 =====
+
+    def get(self, key: str) -> Optional[List[int]]:
+        """キャッシュを参照（ヒット時はLRU順を更新）"""
+        with self._lock:
+            task_ids = self._entries.get(key)
+            if task_ids is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(task_ids)
+
+    def put(self, key: str, tasks: List[Task], lifestyle: Optional[LifestyleSettings],
+            optimized: List[Task]):
+        """最適化結果を登録"""
+        lifestyle_fp = self.lifestyle_fingerprint(lifestyle)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = [t.id for t in optimized]
+
+            task_ids = tuple(t.id for t in tasks)
+            for task_id in task_ids:
+                self._keys_by_task.setdefault(task_id, set()).add(key)
+            self._keys_by_lifestyle.setdefault(lifestyle_fp, set()).add(key)
+            self._owners[key] = (task_ids, lifestyle_fp)
+
+            # 上限を超えたら古いものから追い出す
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._unindex(old_key)
+                self.evictions += 1
+
+    def apply(self, task_ids: List[int], tasks: List[Task]) -> Optional[List[Task]]:
+        """キャッシュされたID順序をタスクリストに適用（集合が一致しなければNone）"""
+        by_id = {t.id: t for t in tasks}
+        if len(task_ids) > len(by_id) or any(tid not in by_id for tid in task_ids):
+            return None
+        return [by_id[tid] for tid in task_ids]
+
+    # ===== 無効化 =====
+
+    def invalidate_task(self, task_id: int):
+        """タスクが変更・削除されたとき、そのタスクを含むエントリを破棄"""
+        with self._lock:
+            for key in self._keys_by_task.pop(task_id, set()):
+                self._drop(key)
+
+    def invalidate_lifestyle(self):
+        """生活設定が変更されたとき、生活設定に依存する全エントリを破棄"""
+        with self._lock:
+            for keys in list(self._keys_by_lifestyle.values()):
+                for key in list(keys):
+                    self._drop(key)
+
+    def clear(self):
+        """全エントリを破棄（メトリクスは保持）"""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_task.clear()
+            self._keys_by_lifestyle.clear()
+            self._owners.clear()
+
+    def _drop(self, key: str):
+        """エントリを1件削除（ロック取得済みで呼ぶこと）"""
+        if self._entries.pop(key, None) is not None:
+            self.invalidations += 1
+            self._unindex(key)
+
+    def _unindex(self, key: str):
+        """逆引きインデックスからキーを除去（ロック取得済みで呼ぶこと）"""
+        task_ids, lifestyle_fp = self._owners.pop(key, ((), None))
+        for task_id in task_ids:
+            self._discard(self._keys_by_task, task_id, key)
+        self._discard(self._keys_by_lifestyle, lifestyle_fp, key)
+
+    def _discard(self, index: dict, owner, key: str):
+        """インデックスの集合からキーを外し、空になったら所有者ごと削除"""
+        keys = index.get(owner)
+        if keys is None:
+            return
+        keys.discard(key)
+        if not keys:
+            del index[owner]
+
+    # ===== メトリクス =====
+
+    def get_stats(self) -> dict:
+        """ヒット/ミス数などの統計を取得"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,172 @@
+"""
+サーバー側のWebセッション（Flaskのsession_interface）
+
+Cookieには推測できないセッションIDだけを入れ、中身（guest_id・ログイン情報・
+アクセストークン・new_badgesなど）はDBの web_sessions テーブルに置く。
+変更があったときだけ保存し、期限切れのセッションは一定間隔でまとめて削除する。
+Cookieをまだ返してこないクライアントのセッションは短い期限で保存する（Cookieを
+持たないクライアントのリクエストごとに長く残る行を作らない）。
+ログイン時は regenerate() でIDを付け替える（セッション固定化の対策）。
+以前の署名付きCookieのセッションは、初回のアクセスでサーバー側に移す。
+"""
+import secrets
+import threading
+import time
+from typing import Callable, Optional
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSessionInterface, SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """中身がサーバー側にあるセッション"""
+
+    def __init__(self, initial=None, sid: str = None, new: bool = False, expires_at: float = 0.0):
+        def on_update(session):
+            session.modified = True
+            session.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid or secrets.token_urlsafe(32)
+        self.new = new
+        self.expires_at = expires_at
+        self.previous_sid: Optional[str] = None
+        self.modified = False
+        self.accessed = False
+
+    def regenerate(self):
+        """新しいIDに付け替える（ログイン時に呼ぶ。古いIDの行は保存時に削除）"""
+        if not self.new:
+            self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.modified = True
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+
+class DatabaseSessionInterface(SessionInterface):
+    """
+    web_sessions テーブルを使うセッション
+
+    有効期限は最後の保存から PERMANENT_SESSION_LIFETIME。変更がなくても
+    期限の延長は touch_interval 秒に1回だけ書き込む（毎リクエスト書かない）。
+    新しく発行したセッションの期限は new_session_ttl 秒で、クライアントが
+    Cookieを返してきたときに（延長の書き込みで）通常の期限になる。
+    静的ファイルのリクエストではDBを読まない。
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, db_factory: Callable, sweep_interval: float = 600.0,
+                 touch_interval: float = 24 * 3600, new_session_ttl: float = 3600.0,
+                 skip_prefixes=("/static/", "/assets/")):
+        self.db_factory = db_factory
+        self.sweep_interval = sweep_interval
+        self.touch_interval = touch_interval
+        self.new_session_ttl = new_session_ttl
+        self.skip_prefixes = tuple(skip_prefixes)
+        self._legacy = SecureCookieSessionInterface()
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+
+    # ===== 読み込み =====
+
+    def open_session(self, app, request) -> ServerSession:
+        if request.path.startswith(self.skip_prefixes):
+            return ServerSession(new=True)
+
+        now = time.time()
+        self._maybe_sweep(now)
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid:
+            return ServerSession(new=True)
+
+        row = self.db_factory().load_web_session(sid, now)
+        if row is not None:
+            try:
+                return ServerSession(self.serializer.loads(row['data']), sid=sid, expires_at=row['expires_at'])
+            except ValueError as e:
+                print(f"Session load error: {e}")
+                return ServerSession(new=True)
+
+        legacy = self._load_legacy(app, sid)
+        if legacy:
+            # 署名付きCookieの中身を引き継いで新しいIDで保存する
+            session = ServerSession(legacy, new=True)
+            session.modified = True
+            return session
+        return ServerSession(new=True)
+
+    def _load_legacy(self, app, value: str) -> Optional[dict]:
+        """以前の署名付きCookie（検証できなければNone）"""
+        serializer = self._legacy.get_signing_serializer(app)
+        if serializer is None:
+            return None
+        try:
+            return serializer.loads(value, max_age=int(app.permanent_session_lifetime.total_seconds()))
+        except Exception:
+            return None
+
+    # ===== 保存 =====
+
+    def save_session(self, app, session: ServerSession, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.previous_sid:
+            # regenerate() された: 古いIDでは読めないようにする
+            self.db_factory().delete_web_session(session.previous_sid)
+            session.previous_sid = None
+
+        if not session:
+            # 空にされた（ログアウトなど）: サーバー側も消す
+            if session.modified and not session.new:
+                self.db_factory().delete_web_session(session.sid)
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        now = time.time()
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        touch = session.expires_at - now < lifetime - self.touch_interval
+        if not (session.modified or touch):
+            return
+
+        # Cookieを返してくるまでは短い期限（返ってきたら上の延長で通常の期限になる）
+        ttl = min(lifetime, self.new_session_ttl) if session.new else lifetime
+        self.db_factory().save_web_session(session.sid, self.serializer.dumps(dict(session)), now + ttl)
+        if session.new or (session.permanent and self.should_set_cookie(app, session)):
+            response.set_cookie(name, session.sid,
+                                expires=self.get_expiration_time(app, session),
+                                httponly=self.get_cookie_httponly(app),
+                                domain=domain, path=path,
+                                secure=self.get_cookie_secure(app),
+                                samesite=self.get_cookie_samesite(app))
+
+    # ===== 掃除 =====
+
+    def _maybe_sweep(self, now: float):
+        """期限切れのセッションを sweep_interval 秒に1回まとめて削除"""
+        with self._lock:
+            if now - self._last_sweep < self.sweep_interval:
+                return
+            self._last_sweep = now
+        self.db_factory().purge_web_sessions(now)
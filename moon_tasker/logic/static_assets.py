@@ -0,0 +1,193 @@
+"""
+静的ファイルのビルド（ファイル名にハッシュ・事前圧縮・WebP変換）
+
+static/ のCSSと生命体の画像を static/dist/ に「名前.ハッシュ.拡張子」でコピーし、
+CSSなどテキストは .gz / .br、PNGは .webp も作って manifest.json に対応を書く。
+ハッシュが中身で変わるので、配信側は Cache-Control: immutable で1年キャッシュさせてよい。
+brotli・Pillow がなければその形式だけ作らない。
+
+ビルド:
+    python -m moon_tasker.logic.static_assets
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+from typing import Dict, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+STATIC_DIR = os.path.join(ROOT_DIR, "static")
+DIST_NAME = "dist"
+MANIFEST_NAME = "manifest.json"
+
+# ビルド対象（static/ からの相対パスの先頭）
+SOURCES = ("css/", "images/creature/")
+COMPRESSIBLE = (".css", ".js", ".svg", ".json")
+WEBP_QUALITY = 85
+
+
+def _fingerprint(relpath: str, data: bytes) -> str:
+    """css/style.css -> css/style.1a2b3c4d5e.css"""
+    stem, ext = os.path.splitext(relpath)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+
+
+def _write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _to_webp(data: bytes) -> Optional[bytes]:
+    """PNG → WebP（Pillowがなければ None）"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    with Image.open(io.BytesIO(data)) as image:
+        out = io.BytesIO()
+        image.save(out, "WEBP", quality=WEBP_QUALITY, method=6)
+    return out.getvalue()
+
+
+def _compress(path: str, data: bytes, brotli) -> List[str]:
+    """.gz（と .br）を書き、作った形式を返す"""
+    encodings = []
+    # mtime=0 で同じ入力から同じ .gz にする
+    _write(path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+    encodings.append("gzip")
+    if brotli is not None:
+        _write(path + ".br", brotli.compress(data, quality=11))
+        encodings.append("br")
+    return encodings
+
+
+def build(static_dir: str = STATIC_DIR) -> Dict[str, dict]:
+    """static_dir/dist にビルドして manifest を返す（前回のビルドは消す）"""
+    try:
+        import brotli
+    except ImportError:
+        print("brotli is not installed: skipping .br files")
+        brotli = None
+
+    dist_dir = os.path.join(static_dir, DIST_NAME)
+    shutil.rmtree(dist_dir, ignore_errors=True)
+
+    manifest = {}
+    for root, _, files in os.walk(static_dir):
+        if os.path.commonpath([root, dist_dir]) == dist_dir:
+            continue
+        for name in sorted(files):
+            relpath = os.path.relpath(os.path.join(root, name), static_dir).replace(os.sep, "/")
+            if not relpath.startswith(SOURCES):
+                continue
+            with open(os.path.join(static_dir, relpath), "rb") as f:
+                data = f.read()
+
+            entry = {"path": _fingerprint(relpath, data), "size": len(data), "encodings": []}
+            out_path = os.path.join(dist_dir, entry["path"])
+            _write(out_path, data)
+            if relpath.endswith(COMPRESSIBLE):
+                entry["encodings"] = _compress(out_path, data, brotli)
+            if relpath.endswith(".png"):
+                webp = _to_webp(data)
+                if webp is not None and len(webp) < len(data):
+                    entry["webp"] = _fingerprint(os.path.splitext(relpath)[0] + ".webp", webp)
+                    entry["webp_size"] = len(webp)
+                    _write(os.path.join(dist_dir, entry["webp"]), webp)
+            manifest[relpath] = entry
+
+    _write(os.path.join(dist_dir, MANIFEST_NAME),
+           json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True).encode("utf-8"))
+    return manifest
+
+
+class AssetManifest:
+    """ビルド済みファイルの対応表（元のパス → ハッシュ付きのパス）"""
+
+    def __init__(self, entries: Dict[str, dict], dist_dir: str):
+        self.entries = entries
+        self.dist_dir = dist_dir
+        # ハッシュ付きのパス → (元のパス, WebPかどうか)
+        self._by_output = {}
+        for relpath, entry in entries.items():
+            self._by_output[entry["path"]] = (relpath, False)
+            if entry.get("webp"):
+                self._by_output[entry["webp"]] = (relpath, True)
+
+    @classmethod
+    def load(cls, static_dir: str = STATIC_DIR) -> "AssetManifest":
+        """manifest.json を読む（未ビルドなら空）"""
+        dist_dir = os.path.join(static_dir, DIST_NAME)
+        try:
+            with open(os.path.join(dist_dir, MANIFEST_NAME), encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            entries = {}
+        except (OSError, ValueError) as e:
+            print(f"Asset manifest load error: {e}")
+            entries = {}
+        return cls(entries, dist_dir)
+
+    def __bool__(self) -> bool:
+        return bool(self.entries)
+
+    def lookup(self, filename: str) -> Optional[str]:
+        """元のパスに対応するハッシュ付きのパス（ビルド対象外ならNone）"""
+        entry = self.entries.get(filename.lstrip("/"))
+        return entry["path"] if entry else None
+
+    def resolve(self, output: str, accept: str = "", accept_encoding: str = "") -> Optional[dict]:
+        """
+        ハッシュ付きのパスへのリクエストに返すファイルを選ぶ
+
+        PNGはAcceptにimage/webpがあればWebPを、テキストはAccept-Encodingに応じて .br / .gz を返す。
+        Returns:
+            {"path": 実ファイル, "mimetype": ..., "encoding": ... or None, "vary": [...]}、知らないパスならNone
+        """
+        found = self._by_output.get(output)
+        if found is None:
+            return None
+        relpath, is_webp = found
+        entry = self.entries[relpath]
+
+        chosen = {"path": os.path.join(self.dist_dir, output), "mimetype": None,
+                  "encoding": None, "vary": []}
+        if entry.get("webp") and not is_webp:
+            chosen["vary"].append("Accept")
+            if "image/webp" in accept:
+                chosen["path"] = os.path.join(self.dist_dir, entry["webp"])
+                chosen["mimetype"] = "image/webp"
+        if entry["encodings"]:
+            chosen["vary"].append("Accept-Encoding")
+            accepted = {part.split(";")[0].strip() for part in accept_encoding.split(",")}
+            for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+                if encoding in entry["encodings"] and encoding in accepted:
+                    chosen["path"] += suffix
+                    chosen["encoding"] = encoding
+                    break
+        return chosen
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="静的ファイルをビルド（ハッシュ付きの名前・gzip/brotli・WebP）")
+    parser.add_argument("--static-dir", default=STATIC_DIR)
+    args = parser.parse_args(argv)
+
+    manifest = build(args.static_dir)
+    original = sum(entry["size"] for entry in manifest.values())
+    webp = sum(entry.get("webp_size", entry["size"]) for entry in manifest.values()
+               if entry["path"].endswith(".png"))
+    png = sum(entry["size"] for entry in manifest.values() if entry["path"].endswith(".png"))
+    print(f"{len(manifest)} files, {original} bytes -> {os.path.join(args.static_dir, DIST_NAME)}")
+    if png:
+        print(f"png {png} bytes, webp {webp} bytes ({webp / png:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
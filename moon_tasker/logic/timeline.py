@@ -0,0 +1,204 @@
+"""
+1日のタイムライン投影エンジン（生活時間のブロックを避けてタスクを配置）
+"""
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from ..models import Task, LifestyleSettings
+
+
+# 1日の開始時刻（4:00）。これより前の時刻は前日の続きとして扱う
+DAY_START_HOUR = 4
+MINUTES_PER_DAY = 24 * 60
+
+
+def to_day_minutes(time_str: str) -> int:
+    """時刻文字列（HH:MM）を4:00基準の分に変換"""
+    hour, minute = (int(part) for part in time_str.split(":")[:2])
+    minutes = hour * 60 + minute
+    return (minutes - DAY_START_HOUR * 60) % MINUTES_PER_DAY
+
+
+def day_start_of(moment: datetime) -> datetime:
+    """momentが属する論理日の開始時刻（4:00）を取得"""
+    start = moment.replace(hour=DAY_START_HOUR, minute=0, second=0, microsecond=0)
+    if moment < start:
+        start -= timedelta(days=1)
+    return start
+
+
+@dataclass
+class BlockedInterval:
+    """生活時間でブロックされる区間（4:00基準の分）"""
+    start: int
+    end: int
+    type: str  # meal, bath
+    name: str
+
+
+@dataclass
+class _BlockGroup:
+    """重なり合うブロックをまとめたもの（区間は互いに素）"""
+    start: int
+    end: int
+    members: List[BlockedInterval] = field(default_factory=list)
+
+
+@dataclass
+class TimelineEntry:
+    """投影結果の1項目"""
+    type: str  # task, meal, bath
+    name: str
+    start: datetime
+    end: datetime
+    task: Optional[Task] = None
+    break_duration: int = 0  # endに含まれる休憩時間（分）
+
+
+class DailyTimeline:
+    """生活設定からブロック区間を作り、タスク列を時間軸に投影する"""
+
+    def __init__(self, lifestyle: Optional[LifestyleSettings] = None):
+        self.lifestyle = lifestyle or LifestyleSettings()
+        self.blocks = self._build_blocks()
+        self._groups = self._merge(self.blocks)
+        # 二分探索用の開始位置リスト
+        self._group_starts = [g.start for g in self._groups]
+
+    # ===== ブロック区間 =====
+
+    def _build_blocks(self) -> List[BlockedInterval]:
+        """食事・入浴のブロック区間を開始順に並べて作成"""
+        ls = self.lifestyle
+        blocks = []
+        for type_, name, time_str, duration in (
+            ("meal", "🍴 朝食", ls.breakfast_time, ls.meal_duration),
+            ("meal", "🍴 昼食", ls.lunch_time, ls.meal_duration),
+            ("meal", "🍴 夕食", ls.dinner_time, ls.meal_duration),
+            ("bath", "🛁 入浴", ls.bath_time, ls.bath_duration),
+        ):
+            if not time_str or not duration or duration <= 0:
+                continue
+            start = to_day_minutes(time_str)
+            blocks.append(BlockedInterval(start, start + duration, type_, name))
+        blocks.sort(key=lambda b: (b.start, b.end))
+        return blocks
+
+    def _merge(self, blocks: List[BlockedInterval]) -> List[_BlockGroup]:
+        """重なるブロックを1つのグループにまとめる"""
+        groups: List[_BlockGroup] = []
+        for block in blocks:
+            if groups and block.start < groups[-1].end:
+                groups[-1].end = max(groups[-1].end, block.end)
+                groups[-1].members.append(block)
+            else:
+                groups.append(_BlockGroup(block.start, block.end, [block]))
+        return groups
+
+    def blocked_intervals(self) -> List[Tuple[int, int]]:
+        """ブロック区間を (開始分, 終了分) のリストで取得（4:00基準）"""
+        return [(b.start, b.end) for b in self.blocks]
+
+    def available_minutes(self) -> int:
+        """起床〜就寝のうち、食事・入浴を除いた利用可能時間（分）"""
+        wake = to_day_minutes(self.lifestyle.wake_time)
+        sleep = to_day_minutes(self.lifestyle.sleep_time)
+        awake = (sleep - wake) % MINUTES_PER_DAY
+        blocked = sum(b.end - b.start for b in self.blocks)
+        return awake - blocked
+
+    # ===== 投影 =====
+
+    def _next_group(self, cursor: float, span: float) -> Optional[Tuple[float, _BlockGroup]]:
+        """
+        (cursor, cursor + span) と重なる最初のブロックを探す（cursorは基準日からの分）
+
+        cursorがすでにブロックの途中にある場合（直前に始まったブロックや、前日から
+        4:00をまたいで続くブロック）はそのブロックを返す。
+        """
+        if not self._groups:
+            return None
+        day = int(cursor // MINUTES_PER_DAY)
+        idx = bisect_right(self._group_starts, cursor - day * MINUTES_PER_DAY)
+
+        # 始まっているブロックの途中か（日をまたぐのは最後のグループだけ）
+        started = [(day - 1, self._groups[-1])]
+        if idx > 0:
+            started.append((day, self._groups[idx - 1]))
+        for group_day, group in started:
+            offset = group_day * MINUTES_PER_DAY
+            if offset + group.start <= cursor < offset + group.end:
+                return offset + group.start, group
+
+        if idx == len(self._groups):
+            day += 1
+            idx = 0
+        group_start = day * MINUTES_PER_DAY + self._groups[idx].start
+        if group_start < cursor + span:
+            return group_start, self._groups[idx]
+        return None
+
+    def project(self, tasks: List[Task], start: Optional[datetime] = None,
+                skip_last_break: bool = True) -> List[TimelineEntry]:
+        """
+        タスク列を start から順に配置する
+
+        タスク（＋休憩）の途中にブロックが始まる場合は、ブロックを先に入れて
+        タスクをその後ろにずらす。日付をまたぐ場合も4:00基準で繰り返し判定する。
+
+        Args:
+            tasks: 実行順のタスクリスト
+            start: 開始時刻（省略時は現在時刻）
+            skip_last_break: 最後のタスクの休憩を含めない（TimerControllerと同じ）
+        """
+        if start is None:
+            start = datetime.now()
+        origin = day_start_of(start)
+        cursor = (start - origin).total_seconds() / 60
+
+        def at(minutes: float) -> datetime:
+            return origin + timedelta(minutes=minutes)
+
+        entries: List[TimelineEntry] = []
+        for idx, task in enumerate(tasks):
+            is_last = idx == len(tasks) - 1
+            break_time = 0 if (skip_last_break and is_last) else (task.break_duration or 0)
+            span = task.duration + break_time
+
+            placed_from = len(entries)
+            origin_cursor = cursor
+            skips_left = len(self._groups) + 1  # 途中にいるブロックの分も
+            hit = self._next_group(cursor, span)
+            while hit:
+                if skips_left == 0:
+                    # 1日のどの隙間にも収まらない長いタスクは、ずらさずそのまま重ねて配置する
+                    del entries[placed_from:]
+                    cursor = origin_cursor
+                    break
+                skips_left -= 1
+                group_start, group = hit
+                day_offset = group_start - group.start
+                for block in group.members:
+                    entries.append(TimelineEntry(
+                        type=block.type, name=block.name,
+                        start=at(day_offset + block.start),
+                        end=at(day_offset + block.end),
+                    ))
+                cursor = day_offset + group.end
+                hit = self._next_group(cursor, span)
+
+            entries.append(TimelineEntry(
+                type="task", name=f"📝 {task.title}",
+                start=at(cursor), end=at(cursor + span),
+                task=task, break_duration=break_time,
+            ))
+            cursor += span
+
+        return entries
+
+    def estimated_end(self, entries: List[TimelineEntry], start: Optional[datetime] = None) -> datetime:
+        """投影結果の終了時刻（空なら開始時刻）"""
+        if entries:
+            return entries[-1].end
+        return start or datetime.now()
@@ -0,0 +1,178 @@
+"""
+タイマージャーナル（アプリ再起動後にタイマーを復元するための追記ログ）
+
+区間の開始・一時停止・再開・休憩・完了を1行1レコード（JSON）で追記する。
+残り時間は壁時計の締め切りとして記録するので、毎秒のtickは書かない。
+書き込みはメモリにためて一定間隔でまとめてfsyncし、
+完了・終了など取りこぼすと困るレコードだけはその場でfsyncする。
+レコードが増えたら現在の状態をスナップショットに書き出してジャーナルを空にする。
+"""
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+from ..models import Task
+
+
+# プレイリストの復元に必要なタスクの項目（クイックモードのタスクはDBにないので中身ごと保存する）
+TASK_FIELDS = ("id", "title", "category", "difficulty", "duration", "break_duration", "priority")
+
+
+@dataclass
+class TimerJournalState:
+    """ジャーナルから復元したタイマーの状態"""
+    active: bool = False
+    is_playlist: bool = False
+    tasks: List[dict] = field(default_factory=list)
+    task_index: int = 0
+    is_break: bool = False
+    paused: bool = False
+    deadline: Optional[float] = None    # 壁時計（実行中のみ）
+    remaining: float = 0.0              # 一時停止中の残り秒数
+    completed: List[int] = field(default_factory=list)  # 完了を記録したタスクの番号
+
+    def remaining_at(self, now: float) -> float:
+        """nowの時点での現在区間の残り秒数"""
+        if self.paused or self.deadline is None:
+            return self.remaining
+        return max(0.0, self.deadline - now)
+
+    def build_tasks(self) -> List[Task]:
+        return [Task(**{k: t[k] for k in TASK_FIELDS if k in t}) for t in self.tasks]
+
+    def apply(self, record: dict):
+        """レコード1件を状態に反映"""
+        op = record["op"]
+        if op == "snapshot":
+            restored = TimerJournalState(**record["state"])
+            self.__dict__.update(restored.__dict__)
+        elif op == "start":
+            self.__dict__.update(TimerJournalState(
+                active=True, is_playlist=record["playlist"], tasks=record["tasks"]
+            ).__dict__)
+        elif op in ("task", "break"):
+            self.task_index = record["index"]
+            self.is_break = op == "break"
+            self.paused = False
+            self.deadline = record["deadline"]
+        elif op == "pause":
+            self.paused = True
+            self.deadline = None
+            self.remaining = record["remaining"]
+        elif op == "resume":
+            self.paused = False
+            self.deadline = record["deadline"]
+        elif op == "complete":
+            if record["index"] not in self.completed:
+                self.completed.append(record["index"])
+        elif op == "end":
+            self.__dict__.update(TimerJournalState().__dict__)
+
+
+class TimerJournal:
+    """タイマーの追記ログとスナップショット"""
+
+    def __init__(self, path: str, flush_interval: float = 5.0, snapshot_every: int = 50,
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.snapshot_path = path + ".snapshot"
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+        self.clock = clock
+
+        self.state = TimerJournalState()
+        self._buffer: List[str] = []
+        self._first_buffered_at: Optional[float] = None
+        self._records_since_snapshot = 0
+        self.fsyncs = 0
+
+    @classmethod
+    def for_database(cls, db_path: str, **kwargs) -> "TimerJournal":
+        """DBファイルの隣にジャーナルを置く"""
+        base, _ = os.path.splitext(db_path)
+        return cls(base + "_timer.journal", **kwargs)
+
+    # ===== 書き込み =====
+
+    def record(self, op: str, durable: bool = False, **fields):
+        """レコードを追記（durable=Trueならすぐにfsync）"""
+        record = {"op": op, "at": round(self.clock(), 3), **fields}
+        self.state.apply(record)
+        self._buffer.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        if self._first_buffered_at is None:
+            self._first_buffered_at = self.clock()
+        self._records_since_snapshot += 1
+
+        if op == "end" or self._records_since_snapshot >= self.snapshot_every:
+            self.snapshot()
+        elif durable:
+            self.flush()
+        else:
+            self.maybe_flush()
+
+    def maybe_flush(self):
+        """前回のfsyncから flush_interval 秒たっていればまとめて書き出す（tickから呼んでよい）"""
+        if self._buffer and self.clock() - self._first_buffered_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """ためたレコードを追記してfsync"""
+        if not self._buffer:
+            return
+        data = "\n".join(self._buffer) + "\n"
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.fsyncs += 1
+        self._buffer = []
+        self._first_buffered_at = None
+
+    def snapshot(self):
+        """現在の状態をスナップショットに書き出し、ジャーナルを空にする"""
+        record = {"op": "snapshot", "at": round(self.clock(), 3), "state": self.state.__dict__}
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        # スナップショットが先に置き換わっていれば、ここで落ちても二重適用にはならない
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self.fsyncs += 2
+        self._buffer = []
+        self._first_buffered_at = None
+        self._records_since_snapshot = 0
+
+    # ===== 復元 =====
+
+    def recover(self) -> TimerJournalState:
+        """スナップショットとジャーナルを読み直して状態を復元"""
+        state = TimerJournalState()
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                state.apply(json.load(f))
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Timer snapshot read error: {e}")
+
+        records = 0
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 書き込み途中で落ちた最後の行は捨てる
+                        break
+                    state.apply(record)
+                    records += 1
+        except FileNotFoundError:
+            pass
+
+        self.state = state
+        self._records_since_snapshot = records
+        return state
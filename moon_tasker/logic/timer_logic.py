@@ -2,24 +2,48 @@
 タイマー制御ロジック
 """
 import asyncio
-from typing import Callable, Optional, List
+import math
+import time
+from typing import Awaitable, Callable, Optional, List
 from ..models import Task
+from .timer_journal import TASK_FIELDS, TimerJournal, TimerJournalState
 
 
 class TimerController:
-    """連続タイマー制御クラス（プレイリスト対応）"""
+    """
+    連続タイマー制御クラス（プレイリスト対応）
+
+    残り時間は単調時計の締め切り（deadline - clock()）から求めるので、
+    イベントループの遅延やGC、画面更新の時間が積み重なってもずれない。
+    journalを渡すと区間の切り替えを記録し、再起動後に restore で続きから再開できる。
+    """
     
-    def __init__(self):
+    def __init__(self, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Awaitable] = asyncio.sleep,
+                 journal: Optional[TimerJournal] = None):
+        # 時計と待機関数（シミュレーション用に差し替え可能）
+        self.clock = clock
+        self.sleep = sleep
+        self.journal = journal
+        
         # 現在のタスク
         self.current_task: Optional[Task] = None
         self.is_running: bool = False
         self.is_break: bool = False
-        self.remaining_seconds: int = 0
+        self.remaining_seconds: int = 0  # 表示用（秒、切り上げ）
+        
+        # 締め切り（単調時計の時刻）。一時停止中はNoneで、残りを _remaining_exact に保持
+        self._deadline: Optional[float] = None
+        self._remaining_exact: float = 0.0
+        # カウントダウンの世代（一時停止・停止で古いループを確実に抜けさせる）
+        self._generation: int = 0
         
         # プレイリスト連続実行用
         self.playlist_tasks: List[Task] = []
         self.current_task_index: int = 0
         self.is_playlist_mode: bool = False
+        # 完了を記録済みのタスク番号（復元時の二重記録防止）
+        self._completed_indices: set = set()
         
         # コールバック
         self.on_tick: Optional[Callable] = None
@@ -35,6 +59,9 @@ class TimerController:
         self.is_playlist_mode = False
         self.playlist_tasks = []
         self.current_task_index = 0
+        self._deadline = None
+        self._completed_indices = set()
+        self._journal_start([task])
         await self._start_task(task)
     
     async def start_playlist(self, tasks: List[Task]):
@@ -45,6 +72,9 @@ class TimerController:
         self.is_playlist_mode = True
         self.playlist_tasks = tasks
         self.current_task_index = 0
+        self._deadline = None
+        self._completed_indices = set()
+        self._journal_start(tasks)
         await self._start_task(tasks[0])
     
     async def _start_task(self, task: Task):
@@ -52,35 +82,89 @@ class TimerController:
         self.current_task = task
         self.is_running = True
         self.is_break = False
-        self.remaining_seconds = task.duration * 60
+        self._set_phase(task.duration * 60)
+        self._journal("task", index=self.current_task_index, deadline=self._wall_deadline())
         
         if self.on_task_start:
             self.on_task_start(task)
         
         await self._countdown()
     
+    def _set_phase(self, seconds: int):
+        """作業・休憩の区間を開始（前の区間が満了していればその締め切りから続ける）"""
+        anchor = self._deadline if self._deadline is not None else self.clock()
+        self._deadline = anchor + seconds
+        self._remaining_exact = float(seconds)
+        self.remaining_seconds = seconds
+    
+    def _seconds_left(self) -> float:
+        """残り時間（秒、小数）"""
+        if self._deadline is None:
+            return self._remaining_exact
+        return max(0.0, self._deadline - self.clock())
+    
     async def _countdown(self):
-        """カウントダウン処理"""
-        while self.is_running and self.remaining_seconds > 0:
-            await asyncio.sleep(1)
-            if self.is_running:
-                self.remaining_seconds -= 1
-                
+        """カウントダウン処理（秒の境目に合わせて起き、遅れた分のtickはまとめて1回にする）"""
+        self._generation += 1
+        generation = self._generation
+        if self._deadline is None:
+            self._deadline = self.clock() + self._remaining_exact
+        
+        while self.is_running and generation == self._generation:
+            left = self._deadline - self.clock()
+            if left <= 0:
+                break
+            # 表示の秒が次に変わる瞬間まで待つ
+            await self.sleep(left - (math.ceil(left) - 1))
+            if not self.is_running or generation != self._generation:
+                return
+            
+            shown = max(0, math.ceil(self._deadline - self.clock()))
+            if shown != self.remaining_seconds:
+                self.remaining_seconds = shown
                 if self.on_tick:
                     self.on_tick(self.remaining_seconds, self.is_break)
+                if self.journal:
+                    self.journal.maybe_flush()
         
-        if self.remaining_seconds == 0 and self.is_running:
-            await self._on_timer_complete()
+        if generation != self._generation or not self.is_running:
+            return
+        if self.remaining_seconds != 0:
+            self.remaining_seconds = 0
+            if self.on_tick:
+                self.on_tick(0, self.is_break)
+        await self._on_timer_complete()
+    
+    @staticmethod
+    def next_phase(tasks: List[Task], index: int, is_break: bool,
+                   is_playlist: bool = True) -> Optional[tuple]:
+        """
+        現在の区間が終わったあとの区間を (タスク番号, 休憩か) で返す（終了ならNone）
+
+        作業のあとは休憩（最後のタスクと休憩0分は除く）、休憩のあとは次のタスク。
+        サーバー側のタイマーセッションも同じ規則で進める。
+        """
+        if not is_break:
+            task = tasks[index]
+            is_last_task = is_playlist and index >= len(tasks) - 1
+            if (task.break_duration or 0) > 0 and not is_last_task:
+                return (index, True)
+        if is_playlist and index + 1 < len(tasks):
+            return (index + 1, False)
+        return None
     
     async def _on_timer_complete(self):
         """タイマー完了時の処理"""
         if not self.is_break:
             # タスク作業完了 → 休憩開始（ただし最後のタスクは休憩スキップ）
-            is_last_task = self.is_playlist_mode and (self.current_task_index >= len(self.playlist_tasks) - 1)
+            tasks = self.playlist_tasks if self.is_playlist_mode else [self.current_task]
+            index = self.current_task_index if self.is_playlist_mode else 0
+            following = self.next_phase(tasks, index, False, self.is_playlist_mode) if self.current_task else None
             
-            if self.current_task and self.current_task.break_duration > 0 and not is_last_task:
+            if following and following[1]:
                 self.is_break = True
-                self.remaining_seconds = self.current_task.break_duration * 60
+                self._set_phase(self.current_task.break_duration * 60)
+                self._journal("break", index=self.current_task_index, deadline=self._wall_deadline())
                 
                 if self.on_break_start:
                     self.on_break_start(self.current_task)
@@ -95,9 +179,12 @@ class TimerController:
     
     async def _on_task_finished(self):
         """タスク（+休憩）完了時の処理"""
-        # 個別タスク完了コールバック
-        if self.on_complete:
-            self.on_complete(self.current_task)
+        # 個別タスク完了コールバック（復元前に記録済みなら呼ばない）
+        if self.current_task_index not in self._completed_indices:
+            if self.on_complete:
+                self.on_complete(self.current_task)
+            self._completed_indices.add(self.current_task_index)
+            self._journal("complete", durable=True, index=self.current_task_index)
         
         # プレイリストモードの場合、次のタスクへ
         if self.is_playlist_mode:
@@ -116,18 +203,28 @@ class TimerController:
                 self.remaining_seconds = 0
                 if self.on_tick:
                     self.on_tick(0, False)
+                self._journal("end")
                 
                 if self.on_playlist_complete:
                     self.on_playlist_complete()
-    
+        else:
+            self._journal("end")
+
     def pause(self):
         """タイマーを一時停止"""
+        if self.is_running:
+            self._remaining_exact = self._seconds_left()
+            self._deadline = None
+            self._journal("pause", durable=True, remaining=round(self._remaining_exact, 3))
         self.is_running = False
+        self._generation += 1
     
     def resume(self):
         """タイマーを再開"""
         if self.remaining_seconds > 0 and not self.is_running:
             self.is_running = True
+            self._deadline = self.clock() + self._remaining_exact
+            self._journal("resume", durable=True, deadline=self._wall_deadline())
             if self.on_resume:
                 self.on_resume()
     
@@ -137,13 +234,58 @@ class TimerController:
     
     def stop(self):
         """タイマーを停止"""
+        if self.current_task is not None:
+            self._journal("end")
         self.is_running = False
         self.remaining_seconds = 0
+        self._deadline = None
+        self._remaining_exact = 0.0
+        self._generation += 1
         self.current_task = None
         self.playlist_tasks = []
         self.current_task_index = 0
         self.is_playlist_mode = False
     
+    def restore(self, state: TimerJournalState) -> bool:
+        """
+        ジャーナルから復元した状態を読み込む（実行中だった場合は resume_countdown で続きを始める）
+
+        停止中に締め切りを過ぎた区間は残り0秒として、再開直後に完了させる。
+        """
+        tasks = state.build_tasks()
+        if not state.active or not tasks or state.task_index >= len(tasks):
+            return False
+        
+        self.is_playlist_mode = state.is_playlist
+        self.playlist_tasks = tasks if state.is_playlist else []
+        self.current_task_index = state.task_index if state.is_playlist else 0
+        self.current_task = tasks[state.task_index]
+        self.is_break = state.is_break
+        self._completed_indices = set(state.completed)
+        
+        now = self.journal.clock() if self.journal else time.time()
+        self._remaining_exact = state.remaining_at(now)
+        self.remaining_seconds = math.ceil(self._remaining_exact)
+        self._deadline = None
+        self.is_running = not state.paused
+        if state.paused:
+            # 一時停止中のまま再開ボタンを待つ（resumeは残り0秒だと動かないので最低1秒残す）
+            self.remaining_seconds = max(1, self.remaining_seconds)
+        return True
+    
+    def _journal(self, op: str, durable: bool = False, **fields):
+        if self.journal:
+            self.journal.record(op, durable=durable, **fields)
+    
+    def _journal_start(self, tasks: List[Task]):
+        if self.journal:
+            self.journal.record("start", durable=True, playlist=self.is_playlist_mode,
+                                tasks=[{k: getattr(t, k) for k in TASK_FIELDS} for t in tasks])
+    
+    def _wall_deadline(self) -> float:
+        """現在区間の締め切りを壁時計で（単調時計は再起動をまたげないため）"""
+        return round(self.journal.clock() + self._seconds_left(), 3) if self.journal else 0.0
+    
     def get_formatted_time(self) -> str:
         """残り時間を整形（MM:SS）"""
         minutes = self.remaining_seconds // 60
@@ -0,0 +1,325 @@
+"""
+サーバー側タイマーセッション管理（Web版）
+
+区間（作業・休憩）の締め切りは階層型タイミングホイールで管理し、
+1つのバックグラウンドスレッドが毎秒ホイールを進めて期限切れのセッションだけを処理する。
+DBが正であり、ホイールは「いつ見に行くか」を覚えているだけなので、
+再起動後は実行中のセッションを読み直して再登録すればよい。
+"""
+import json
+import threading
+import time
+import uuid
+from typing import Callable, List, Optional, Tuple
+from ..models import Task, TimerSession
+from .event_bus import EventBus
+from .timer_logic import TimerController
+from .timing_wheel import HierarchicalTimingWheel
+
+
+class TimerSessionError(Exception):
+    """タイマーセッション操作のエラー"""
+    pass
+
+
+class TimerSessionManager:
+    """
+    タイマーセッションの開始・一時停止・再開・完了を管理する
+
+    セッションはサーバーの時計で進むので、タブを閉じても実行中（running）のままなら
+    作業区間が終わった時点で完了となり、猶予後にサーバー側で記録される。
+    一時停止中・中止したセッションは進まないので記録されない。
+    """
+
+    # 作業区間の終了後、クライアントからの完了報告を待つ秒数（過ぎたらサーバーが記録する）
+    CREDIT_GRACE_SECONDS = 10.0
+    # クライアントの時計がサーバーより早く終わった場合に許容する秒数
+    EARLY_TOLERANCE_SECONDS = 3.0
+    # 終了したセッションを残す秒数・一時停止のまま放置されたセッションを残す秒数
+    FINISHED_TTL_SECONDS = 24 * 3600
+    PAUSED_TTL_SECONDS = 7 * 24 * 3600
+    PURGE_INTERVAL_SECONDS = 600
+
+    def __init__(self, db_factory: Callable, bus: EventBus,
+                 clock: Callable[[], float] = time.time, resolution: float = 1.0):
+        self._db_factory = db_factory
+        self._db = None
+        self.bus = bus
+        self.clock = clock
+        self.resolution = resolution
+        self.wheel = HierarchicalTimingWheel(resolution=resolution, start=clock())
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._last_purge = 0.0
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = self._db_factory()
+        return self._db
+
+    # ===== 起動 =====
+
+    def start(self):
+        """実行中のセッションを読み込んでホイールに登録し、処理スレッドを起動（何度呼んでもよい）"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="timer-sessions", daemon=True)
+
+        for timer_session in self.db.get_running_timer_sessions():
+            self._schedule_phase(timer_session)
+            # 再起動で記録が漏れたタスクも猶予後に記録する
+            for index in range(timer_session.credited, self._work_done_count(timer_session)):
+                self._schedule_credit(timer_session.id, index, self.clock())
+        self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = self.clock()
+            # 次の秒の境目まで待つ
+            self._stop.wait(self.resolution - (now % self.resolution))
+            self.tick()
+            if self.clock() - self._last_purge >= self.PURGE_INTERVAL_SECONDS:
+                self.purge()
+
+    def purge(self, now: Optional[float] = None) -> int:
+        """終了したセッションと放置された一時停止中のセッションを削除"""
+        if now is None:
+            now = self.clock()
+        self._last_purge = now
+        try:
+            return self.db.purge_timer_sessions(now - self.FINISHED_TTL_SECONDS,
+                                                now - self.PAUSED_TTL_SECONDS)
+        except Exception as e:
+            print(f"Timer session purge error: {e}")
+            return 0
+
+    def tick(self, now: Optional[float] = None):
+        """ホイールを進め、期限切れのキーを処理（テスト・ベンチマークから直接呼べる）"""
+        if now is None:
+            now = self.clock()
+        with self._lock:
+            expired = self.wheel.advance(now)
+        for key in expired:
+            try:
+                if key[0] == "phase":
+                    self._on_phase_deadline(key[1], now)
+                elif key[0] == "credit":
+                    self._on_credit_deadline(key[1], key[2])
+            except Exception as e:
+                print(f"Timer session error ({key}): {e}")
+
+    # ===== 操作 =====
+
+    def create(self, owner: str, tasks: List[Task]) -> TimerSession:
+        """セッションを開始"""
+        if not tasks:
+            raise TimerSessionError("タスクがありません")
+        now = self.clock()
+        plan = [[t.id, t.duration, t.break_duration or 0] for t in tasks]
+        timer_session = TimerSession(
+            id=uuid.uuid4().hex,
+            owner=owner,
+            plan=json.dumps(plan, separators=(",", ":")),
+            deadline=now + plan[0][1] * 60,
+            started_at=now,
+            updated_at=now,
+        )
+        self.db.create_timer_session(timer_session)
+        self._schedule_phase(timer_session)
+        self._publish("timer.started", timer_session)
+        return timer_session
+
+    def get(self, owner: str, session_id: str) -> TimerSession:
+        """セッションを取得（所有者が違う場合はエラー）"""
+        timer_session = self.db.get_timer_session(session_id)
+        if timer_session is None or timer_session.owner != owner:
+            raise TimerSessionError("セッションが見つかりません")
+        return timer_session
+
+    def pause(self, owner: str, session_id: str) -> TimerSession:
+        current = self.get(owner, session_id)
+        if current.status != "running":
+            return current
+        now = self.clock()
+        paused = self._copy(current, status="paused", deadline=None,
+                            remaining=max(0.0, current.deadline - now), updated_at=now)
+        if not self.db.update_timer_session(paused, current):
+            return self.get(owner, session_id)
+        with self._lock:
+            self.wheel.cancel(("phase", session_id))
+        self._publish("timer.paused", paused)
+        return paused
+
+    def resume(self, owner: str, session_id: str) -> TimerSession:
+        current = self.get(owner, session_id)
+        if current.status != "paused":
+            return current
+        now = self.clock()
+        resumed = self._copy(current, status="running", deadline=now + current.remaining,
+                             remaining=0.0, updated_at=now)
+        if not self.db.update_timer_session(resumed, current):
+            return self.get(owner, session_id)
+        self._schedule_phase(resumed)
+        self._publish("timer.resumed", resumed)
+        return resumed
+
+    def abort(self, owner: str, session_id: str) -> TimerSession:
+        current = self.get(owner, session_id)
+        if current.status not in ("running", "paused"):
+            return current
+        aborted = self._copy(current, status="aborted", deadline=None, updated_at=self.clock())
+        if not self.db.update_timer_session(aborted, current):
+            return self.get(owner, session_id)
+        with self._lock:
+            self.wheel.cancel(("phase", session_id))
+        self._publish("timer.aborted", aborted)
+        return aborted
+
+    def verify_task(self, owner: str, session_id: str, task_id: int) -> Tuple[str, Optional[int], Optional[list]]:
+        """
+        クライアントからのタスク完了報告を検証する（記録権はまだ取らない）
+
+        Returns:
+            ("ready", 位置, [task_id, 作業分, 休憩分]) … 呼び出し側で timer_credit=(session_id, 位置)
+                                                       として記録権の取得と完了の記録を同時に行う
+            ("recorded", None, None)  … サーバー側で記録済み（二重記録しない）
+            ("too_early", None, None) … まだ作業時間が終わっていない
+        """
+        timer_session = self.get(owner, session_id)
+        plan = json.loads(timer_session.plan)
+        index = next((i for i in range(timer_session.credited, len(plan)) if plan[i][0] == task_id), None)
+        if index is None:
+            return ("recorded", None, None)
+
+        if index >= self._work_done_count(timer_session):
+            # 作業中: 締め切り直前ならその場で区間を終わらせる
+            remaining = (timer_session.deadline or 0) - self.clock()
+            if (timer_session.status != "running" or index != timer_session.task_index
+                    or remaining > self.EARLY_TOLERANCE_SECONDS):
+                return ("too_early", None, None)
+            self._advance(timer_session, force=True)
+
+        return ("ready", index, plan[index])
+
+    def credit_recorded(self, session_id: str, index: int):
+        """クライアントの報告で記録できたタスクの、サーバー側の記録予約を取り消す"""
+        with self._lock:
+            self.wheel.cancel(("credit", session_id, index))
+
+    def remaining_seconds(self, timer_session: TimerSession) -> float:
+        """現在の区間の残り秒数"""
+        if timer_session.status == "running" and timer_session.deadline is not None:
+            return max(0.0, timer_session.deadline - self.clock())
+        if timer_session.status == "paused":
+            return timer_session.remaining
+        return 0.0
+
+    def to_dict(self, timer_session: TimerSession) -> dict:
+        """クライアント向けの状態"""
+        plan = json.loads(timer_session.plan)
+        return {
+            "id": timer_session.id,
+            "status": timer_session.status,
+            "task_index": timer_session.task_index,
+            "task_id": plan[timer_session.task_index][0] if plan else None,
+            "is_break": timer_session.is_break,
+            "remaining_seconds": round(self.remaining_seconds(timer_session), 3),
+            "deadline": timer_session.deadline,
+            "total_tasks": len(plan),
+            "credited": timer_session.credited,
+        }
+
+    # ===== 期限切れの処理 =====
+
+    def _on_phase_deadline(self, session_id: str, now: float):
+        timer_session = self.db.get_timer_session(session_id)
+        if timer_session is None or timer_session.status != "running":
+            return
+        if timer_session.deadline > now + 1e-6:
+            # 一時停止→再開などで締め切りが延びていた
+            self._schedule_phase(timer_session)
+            return
+        self._advance(timer_session)
+
+    def _advance(self, timer_session: TimerSession, force: bool = False):
+        """締め切りを過ぎた区間を次の区間へ進める（遅れていれば複数区間まとめて進める）"""
+        plan = json.loads(timer_session.plan)
+        tasks = [Task(id=p[0], title="", duration=p[1], break_duration=p[2]) for p in plan]
+        now = self.clock()
+        current = timer_session
+
+        while current.status == "running" and (force or current.deadline <= now):
+            # 強制終了（クライアントの完了報告）の場合は今を区間の終わりとする
+            phase_end = now if force else current.deadline
+            force = False
+
+            following = TimerController.next_phase(tasks, current.task_index, current.is_break)
+            if following is None:
+                updated = self._copy(current, status="completed", deadline=None, updated_at=now)
+            else:
+                index, is_break = following
+                minutes = tasks[index].break_duration if is_break else tasks[index].duration
+                updated = self._copy(current, task_index=index, is_break=is_break,
+                                     deadline=phase_end + minutes * 60, updated_at=now)
+
+            if not self.db.update_timer_session(updated, current):
+                # 他のワーカー・リクエストが先に進めた
+                return
+            if not current.is_break:
+                self._schedule_credit(current.id, current.task_index, phase_end)
+                self._publish("timer.work_finished", current, task_id=plan[current.task_index][0])
+            self._publish("timer.completed" if updated.status == "completed" else "timer.phase_started",
+                          updated)
+            current = updated
+
+        if current.status == "running":
+            self._schedule_phase(current)
+
+    def _on_credit_deadline(self, session_id: str, index: int):
+        """
+        猶予内にクライアントから完了報告がなかったタスクをサーバー側で記録する
+
+        記録権は受け取り側が記録と同じトランザクションで取る（timer_credit=(session_id, index)）。
+        記録に失敗すれば credited は進まないので、再起動時に再び予約される。
+        """
+        timer_session = self.db.get_timer_session(session_id)
+        if timer_session is None or timer_session.credited > index:
+            return
+        plan = json.loads(timer_session.plan)
+        task_id, duration, _ = plan[index]
+        self.bus.publish("timer.credit_due", owner=timer_session.owner, session_id=session_id,
+                         index=index, task_id=task_id, duration=duration)
+
+    # ===== 内部処理 =====
+
+    def _schedule_phase(self, timer_session: TimerSession):
+        if timer_session.status == "running" and timer_session.deadline is not None:
+            with self._lock:
+                self.wheel.schedule(("phase", timer_session.id), timer_session.deadline)
+
+    def _schedule_credit(self, session_id: str, index: int, work_end: float):
+        with self._lock:
+            self.wheel.schedule(("credit", session_id, index), work_end + self.CREDIT_GRACE_SECONDS)
+
+    def _work_done_count(self, timer_session: TimerSession) -> int:
+        """作業区間が終わったタスクの数"""
+        plan_size = len(json.loads(timer_session.plan))
+        if timer_session.status == "completed":
+            return plan_size
+        return timer_session.task_index + (1 if timer_session.is_break else 0)
+
+    def _copy(self, timer_session: TimerSession, **changes) -> TimerSession:
+        values = dict(timer_session.__dict__)
+        values.update(changes)
+        return TimerSession(**values)
+
+    def _publish(self, event_type: str, timer_session: TimerSession, **extra):
+        self.bus.publish(event_type, owner=timer_session.owner, session_id=timer_session.id,
+                         task_index=timer_session.task_index, is_break=timer_session.is_break,
+                         status=timer_session.status, deadline=timer_session.deadline, **extra)
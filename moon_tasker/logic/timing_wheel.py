@@ -0,0 +1,137 @@
+"""
+階層型タイミングホイール（大量のタイマーの締め切りを O(1) で登録・取消）
+"""
+import math
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+class HierarchicalTimingWheel:
+    """
+    秒単位の階層型タイミングホイール
+
+    レベル0は1スロット=1tick、レベルLは1スロット=slots^L tick。
+    遠い締め切りは上位レベルに置き、そのスロットの時刻になったら下位レベルへ
+    振り分け直す（カスケード）。登録・取消はO(1)、advanceは経過tick数に比例する。
+
+    デフォルト（64スロット×4レベル、1秒）で約194日先まで扱える。
+    それより遠い締め切りは最上位レベルに置いて、カスケードのたびに置き直す。
+    """
+
+    def __init__(self, resolution: float = 1.0, slots: int = 64, levels: int = 4,
+                 start: float = 0.0):
+        self.resolution = resolution
+        self.slots = slots
+        self.levels = levels
+        self.current_tick = int(start // resolution)
+        self._spans = [slots ** level for level in range(levels + 1)]
+        # スロット: {key: 締め切りtick}
+        self._wheels: List[List[Dict[Hashable, int]]] = [
+            [{} for _ in range(slots)] for _ in range(levels)
+        ]
+        self._where: Dict[Hashable, Tuple[int, int]] = {}
+        self._due: List[Hashable] = []
+
+    def __len__(self) -> int:
+        return len(self._where) + len(self._due)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._where or key in self._due
+
+    # ===== 登録・取消 =====
+
+    def schedule(self, key: Hashable, deadline: float):
+        """keyの締め切りを登録（既に登録済みなら置き換え）"""
+        self.cancel(key)
+        tick = math.ceil(deadline / self.resolution)
+        self._place(key, tick)
+
+    def cancel(self, key: Hashable) -> bool:
+        """keyの登録を取り消す"""
+        where = self._where.pop(key, None)
+        if where is not None:
+            level, slot = where
+            del self._wheels[level][slot][key]
+            return True
+        if key in self._due:
+            self._due.remove(key)
+            return True
+        return False
+
+    def _place(self, key: Hashable, tick: int):
+        current = self.current_tick
+        if tick <= current:
+            # 期限切れ（次のadvanceで返す）
+            self._due.append(key)
+            return
+
+        if tick - current < self.slots:
+            level = 0
+        else:
+            level = None
+            for candidate in range(1, self.levels):
+                span = self._spans[candidate]
+                if tick // span - current // span < self.slots:
+                    level = candidate
+                    break
+            if level is None:
+                # 範囲外: 最上位レベルの一番遠いスロットに置き、カスケード時に置き直す
+                level = self.levels - 1
+                span = self._spans[level]
+                slot = (current // span + self.slots - 1) % self.slots
+                self._wheels[level][slot][key] = tick
+                self._where[key] = (level, slot)
+                return
+
+        slot = (tick // self._spans[level]) % self.slots
+        self._wheels[level][slot][key] = tick
+        self._where[key] = (level, slot)
+
+    # ===== 時間を進める =====
+
+    def next_deadline(self) -> Optional[float]:
+        """次に処理が必要になる時刻の目安（空ならNone）"""
+        if self._due:
+            return self.current_tick * self.resolution
+        if not self._where:
+            return None
+        return (self.current_tick + 1) * self.resolution
+
+    def advance(self, now: float) -> List[Hashable]:
+        """nowまで時間を進め、締め切りを過ぎたkeyを締め切り順に返す"""
+        expired, self._due = self._due, []
+        target = int(now // self.resolution)
+
+        while self.current_tick < target:
+            if not self._where:
+                # 何も登録されていなければ一気に進める
+                self.current_tick = target
+                break
+            self.current_tick += 1
+            tick = self.current_tick
+
+            # 上位レベルから順に、このtickで担当が来たスロットを下位へ振り分け直す
+            for level in range(self.levels - 1, 0, -1):
+                span = self._spans[level]
+                if tick % span:
+                    continue
+                slot = (tick // span) % self.slots
+                bucket = self._wheels[level][slot]
+                if not bucket:
+                    continue
+                self._wheels[level][slot] = {}
+                for key, key_tick in bucket.items():
+                    del self._where[key]
+                    self._place(key, key_tick)
+
+            slot = tick % self.slots
+            bucket = self._wheels[0][slot]
+            if bucket:
+                self._wheels[0][slot] = {}
+                for key in bucket:
+                    del self._where[key]
+                    expired.append(key)
+            if self._due:
+                expired.extend(self._due)
+                self._due = []
+
+        return expired
@@ -0,0 +1,88 @@
+"""
+タイマー画面の更新頻度制御と更新コストの計測
+"""
+import time
+from contextlib import contextmanager
+
+
+class RefreshPolicy:
+    """
+    ウィンドウの状態に応じてtickごとの画面更新を間引く
+
+    - 前面（focus）: 毎秒更新
+    - 背面（blur）: 分が変わるときだけ更新
+    - 最小化: 更新しない（復帰時にまとめて更新）
+    """
+
+    FOCUSED = "focused"
+    BLURRED = "blurred"
+    MINIMIZED = "minimized"
+
+    # Fletのウィンドウイベント名 → 状態
+    WINDOW_EVENTS = {
+        "focus": FOCUSED,
+        "restore": FOCUSED,
+        "maximize": FOCUSED,
+        "unmaximize": FOCUSED,
+        "blur": BLURRED,
+        "minimize": MINIMIZED,
+    }
+
+    def __init__(self):
+        self.state = self.FOCUSED
+
+    def on_window_event(self, event: str) -> bool:
+        """ウィンドウイベントを反映。前面に戻ったとき True（すぐに再描画すべき）"""
+        new_state = self.WINDOW_EVENTS.get(event)
+        if new_state is None or new_state == self.state:
+            return False
+        was_hidden = self.state != self.FOCUSED
+        self.state = new_state
+        return was_hidden and new_state == self.FOCUSED
+
+    def should_refresh(self, remaining_seconds: int) -> bool:
+        """このtickで画面を更新するか"""
+        if remaining_seconds <= 0 or self.state == self.FOCUSED:
+            return True
+        if self.state == self.BLURRED:
+            return remaining_seconds % 60 == 0
+        return False
+
+
+class UpdateMeter:
+    """画面更新の回数（種類別）と所要時間（差分計算と送信）を集計する"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.updates = 0
+        self.by_kind = {}
+        self.skipped = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    @contextmanager
+    def measure(self, kind: str = "targeted"):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.updates += 1
+            self.by_kind[kind] = self.by_kind.get(kind, 0) + 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    def skip(self):
+        self.skipped += 1
+
+    def summary(self) -> dict:
+        return {
+            "updates": self.updates,
+            "skipped": self.skipped,
+            "by_kind": dict(self.by_kind),
+            "total_ms": self.total_seconds * 1000,
+            "avg_ms": (self.total_seconds / self.updates * 1000) if self.updates else 0.0,
+            "max_ms": self.max_seconds * 1000,
+        }
@@ -5,6 +5,7 @@ NavigationRailの代わりにボタンベースナビゲーションを使用
 import flet as ft
 import os
 from .database import Database
+from .logic.timer_journal import TimerJournal
 from .views.home_view import HomeView
 from .views.timer_view import TimerView
 from .views.creature_view import CreatureView
@@ -35,6 +36,11 @@ def main(page: ft.Page):
     # データベース初期化
     db = Database()
     
+    # タイマージャーナル（前回途中で終了していればタイマー画面で続きから再開する）
+    page.timer_journal = TimerJournal.for_database(db.db_path)
+    recovered = page.timer_journal.recover()
+    page.recovered_timer = recovered if recovered.active else None
+    
     # ナビゲーション状態
     current_view = {"index": 0}
     
@@ -121,11 +127,27 @@ def main(page: ft.Page):
     )
     
     # 初期画面を表示
-    content_area.controls.append(HomeView(db, page))
+    if page.recovered_timer:
+        nav_buttons[0].bgcolor = "#1e3a5f"
+        nav_buttons[0].color = "#90caf9"
+        nav_buttons[1].bgcolor = "#7c4dff"
+        nav_buttons[1].color = "white"
+        content_area.controls.append(TimerView(db, page))
+    else:
+        content_area.controls.append(HomeView(db, page))
     
     # タイマーからchange_viewにアクセスできるようにpageに保存
     page.change_view = change_view
     
+    # ウィンドウイベント（フォーカス・最小化）は表示中の画面に渡す
+    def on_window_event(e):
+        for view in content_area.controls:
+            handler = getattr(view, "on_window_event", None)
+            if handler:
+                handler(e)
+    
+    page.on_window_event = on_window_event
+    
     # レイアウト
     layout = ft.Row([
         side_nav,
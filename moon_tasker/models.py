@@ -1,9 +1,9 @@
 """
 データモデル定義
 """
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Tuple
 
 
 @dataclass
@@ -91,3 +91,38 @@ class LifestyleSettings:
     lunch_time: str = "12:00"  # 昼食時間
     dinner_time: str = "19:00"  # 夕食時間
     meal_duration: int = 30  # 食事時間（分）
+
+
+@dataclass
+class TimerSession:
+    """サーバー側タイマーセッションモデル（Web版）"""
+    id: str
+    owner: str                          # "guest:<guest_id>" または "user:<user_id>"
+    plan: str = "[]"                    # [[task_id, 作業分, 休憩分], ...] のJSON
+    task_index: int = 0                 # 実行中のタスク番号
+    is_break: bool = False              # 休憩中か
+    status: str = "running"             # running, paused, completed, aborted
+    deadline: Optional[float] = None    # 実行中の区間の締め切り（UNIX時刻）
+    remaining: float = 0.0              # 一時停止中の残り秒数
+    credited: int = 0                   # 完了を記録済みのタスク数
+    started_at: Optional[float] = None
+    updated_at: Optional[float] = None
+
+
+@dataclass
+class TaskCompletion:
+    """まとめて記録するタスク完了1件（/timer/complete-batch）"""
+    task_id: int
+    duration: int = 25                  # 作業時間（分）
+    completed_at: Optional[datetime] = None  # クライアントでの完了時刻
+    idempotency_key: str = ""           # 再送で二重に記録しないためのキー
+    timer_credit: Optional[Tuple[str, int]] = None  # (タイマーセッションID, 位置) 記録権も同時に取る
+
+
+@dataclass
+class DashboardSummary:
+    """ホーム画面の集計（1回のクエリで取得）"""
+    pending_count: int = 0
+    completed_count: int = 0
+    streak: dict = field(default_factory=dict)
+    creature: Optional[Creature] = None
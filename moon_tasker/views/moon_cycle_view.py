@@ -42,11 +42,28 @@ class MoonCycleView(ft.Column):
         moon_emoji = self.moon_calc.get_moon_emoji()
         moon_phase_name = self.moon_calc.get_moon_phase_name()
         
+        # 今月の月齢（1回の計算で1か月分）
+        today = datetime.now().date()
+        month_start = today.replace(day=1)
+        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        month_days = self.moon_calc.get_phase_calendar(month_start, month_end).to_rows()
+        month_row = ft.Row([
+            ft.Column([
+                ft.Text(str(day["time"].day), size=10,
+                        color="#7c4dff" if day["time"].date() == today else "#9e9e9e"),
+                ft.Text(day["emoji"], size=16, tooltip=day["name"]),
+            ], spacing=0, horizontal_alignment=ft.CrossAxisAlignment.CENTER)
+            for day in month_days
+        ], wrap=True, spacing=4, alignment=ft.MainAxisAlignment.CENTER)
+        
         moon_info = ft.Container(
-            content=ft.Row([
-                ft.Text(moon_emoji, size=24),
-                ft.Text(f"現在の月: {moon_phase_name}", size=14, color="#9e9e9e"),
-            ], alignment=ft.MainAxisAlignment.CENTER),
+            content=ft.Column([
+                ft.Row([
+                    ft.Text(moon_emoji, size=24),
+                    ft.Text(f"現在の月: {moon_phase_name}", size=14, color="#9e9e9e"),
+                ], alignment=ft.MainAxisAlignment.CENTER),
+                month_row,
+            ], spacing=8),
             bgcolor="#1e3a5f",
             border_radius=10,
             padding=10
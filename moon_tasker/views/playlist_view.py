@@ -4,7 +4,7 @@
 import flet as ft
 from ..database import Database
 from ..models import Task, Playlist, LifestyleSettings
-from ..logic.schedule_ai import ScheduleOptimizer, GeneticScheduleOptimizer
+from ..logic.schedule_ai import ScheduleOptimizer, GeneticScheduleOptimizer, AnnealingScheduleOptimizer
 
 
 class PlaylistView(ft.Column):
@@ -448,6 +448,10 @@ class PlaylistView(ft.Column):
             dialog.open = False
             self.apply_ai_optimization("genetic", None)
         
+        def apply_annealing(e):
+            dialog.open = False
+            self.apply_ai_optimization("annealing", None)
+        
         def show_lifestyle_settings(e):
             dialog.open = False
             self._page.update()
@@ -469,12 +473,16 @@ class PlaylistView(ft.Column):
                 ft.Text("🧬 遺伝的アルゴリズム（生活最適化）", weight=ft.FontWeight.BOLD),
                 ft.Text(f"起床{lifestyle.wake_time} / 就寝{lifestyle.sleep_time} を考慮", size=12, color="#9e9e9e"),
                 ft.TextButton("⚙️ 生活設定を変更", on_click=show_lifestyle_settings),
+                ft.Divider(),
+                ft.Text("🔥 焼きなまし法", weight=ft.FontWeight.BOLD),
+                ft.Text("難しいタスクを前半に寄せつつ難易度を交互に配置", size=12, color="#9e9e9e"),
             ], tight=True, spacing=10),
             actions=[
                 ft.TextButton("キャンセル", on_click=close_dialog),
                 ft.ElevatedButton("🔄 バランス型", on_click=apply_balanced),
                 ft.ElevatedButton("⏰ 時間制限", on_click=apply_time_limited),
                 ft.ElevatedButton("🧬 GA最適化", on_click=apply_genetic),
+                ft.ElevatedButton("🔥 焼きなまし", on_click=apply_annealing),
             ],
             actions_alignment=ft.MainAxisAlignment.END,
         )
@@ -559,6 +567,8 @@ class PlaylistView(ft.Column):
             lifestyle = self.db.get_lifestyle_settings()
             ga_optimizer = GeneticScheduleOptimizer(lifestyle)
             optimized = ga_optimizer.optimize(tasks)
+        elif mode == "annealing":
+            optimized = AnnealingScheduleOptimizer().optimize(tasks)
         else:
             if time_limit:
                 optimized = self.optimizer.optimize_schedule(tasks, time_limit)
@@ -571,7 +581,7 @@ class PlaylistView(ft.Column):
         self._build_playlist_tasks()
         self._page.update()
         
-        mode_names = {"balanced": "バランス型", "genetic": "遺伝的アルゴリズム", "priority": "優先度"}
+        mode_names = {"balanced": "バランス型", "genetic": "遺伝的アルゴリズム", "annealing": "焼きなまし法", "priority": "優先度"}
         snackbar = ft.SnackBar(
             content=ft.Text(f"🧬 {mode_names.get(mode, mode)}で{len(optimized)}個のタスクを最適化しました！"),
             action="OK"
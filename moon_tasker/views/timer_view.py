@@ -2,22 +2,29 @@
 タイマー画面（集中モード対応・生活時間連携機能付き）
 """
 import flet as ft
-from datetime import datetime, timedelta
+from datetime import datetime
 from ..database import Database
 from ..models import Task
 from ..logic.timer_logic import TimerController
 from ..logic.creature_logic import CreatureSystem
 from ..logic.badge_logic import BadgeSystem
+from ..logic.timeline import DailyTimeline
+from ..logic.lifestyle_notifier import LifestyleNotifier
+from ..logic.ui_refresh import RefreshPolicy, UpdateMeter
 
 
 class TimerView(ft.Column):
     """タイマー画面"""
     
+    # False にするとtickごとにページ全体を更新する（従来の動作。benchmarks/timer_ui_updates.py で比較）
+    TARGETED_TICK_UPDATES = True
+    
     def __init__(self, db: Database, page: ft.Page):
         super().__init__()
         self.db = db
         self._page = page
-        self.timer = TimerController()
+        # ジャーナルはアプリ起動時に1つ作ってpageに置く（main.py）
+        self.timer = TimerController(journal=getattr(page, 'timer_journal', None))
         self.creature_system = CreatureSystem(db)
         self.spacing = 20
         self.expand = True
@@ -31,6 +38,14 @@ class TimerView(ft.Column):
         self.schedule_items = []
         self.estimated_end_time = None
         
+        # 生活時間通知（タイマー開始時に予約する）
+        self.notifier: LifestyleNotifier = None
+        
+        # tickの画面更新（ウィンドウが背面・最小化のときは間引く）
+        self.refresh_policy = RefreshPolicy()
+        self.update_meter = UpdateMeter()
+        self.last_update_stats = None  # 直前の集中モードの画面更新の計測結果（UpdateMeter.summary）
+        
         # UIコンポーネント
         self.timer_display = ft.Text("00:00", size=96, weight=ft.FontWeight.BOLD, font_family="Consolas")
         self.status_text = ft.Text("プレイリストを選択してください", size=20, color="#9e9e9e")
@@ -74,6 +89,12 @@ class TimerView(ft.Column):
         if hasattr(page, 'quick_start_mode') and page.quick_start_mode:
             page.quick_start_mode = False  # フラグをリセット
             self._start_quick_mode()
+        
+        # 前回の起動で途中だったタイマーの復元
+        if getattr(page, 'recovered_timer', None):
+            recovered = page.recovered_timer
+            page.recovered_timer = None  # フラグをリセット
+            self._resume_recovered_timer(recovered)
     
     def _build(self):
         """画面を構築"""
@@ -255,6 +276,33 @@ class TimerView(ft.Column):
         self.status_text.value = "🚀 クイック集中タイム！"
         self._page.update()
     
+    def _resume_recovered_timer(self, state):
+        """ジャーナルから復元したタイマーを集中モードで再開"""
+        if not self.timer.restore(state):
+            return
+        if not self.timer.is_playlist_mode and self.timer.current_task.id == -1:
+            self.timer.on_complete = self._on_quick_task_complete
+        
+        self.is_focus_mode = True
+        self.stop_warning_count = 0
+        current, total = self.timer.get_progress()
+        self.progress_text.value = f"{current} / {total}"
+        next_task = self.timer.get_next_task()
+        self.next_task_text.value = f"次: {next_task.title}" if next_task else ""
+        self.timer_display.value = self.timer.get_formatted_time()
+        
+        if not self.timer.is_running:
+            self.status_text.value = "⏸️ 一時停止中（前回の続き）"
+        elif self.timer.is_break:
+            self.status_text.value = f"休憩中 ☕ ({self.timer.current_task.break_duration}分)"
+        else:
+            self.status_text.value = f"作業中: {self.timer.current_task.title}"
+        
+        self._build()
+        self._schedule_lifestyle_notifications()
+        if self.timer.is_running:
+            self._page.run_task(self.timer.resume_countdown)
+    
     def _on_quick_task_complete(self, task):
         """クイックタスク完了コールバック"""
         self.db.log_activity(-1, "completed")  # アクティビティログに記録
@@ -304,76 +352,27 @@ class TimerView(ft.Column):
             self.schedule_column.controls.append(ft.Text("タスクがありません", color="#9e9e9e"))
             return
         
+        # 生活時間のブロックを避けてタスクを配置
+        timeline = DailyTimeline(lifestyle)
         current_time = datetime.now()
+        schedule = timeline.project(tasks, current_time, skip_last_break=True)
         
-        def parse_time(time_str):
-            t = datetime.strptime(time_str, "%H:%M")
-            return current_time.replace(hour=t.hour, minute=t.minute, second=0, microsecond=0)
-        
-        lunch = parse_time(lifestyle.lunch_time)
-        dinner = parse_time(lifestyle.dinner_time)
-        bath = parse_time(lifestyle.bath_time)
-        sleep = parse_time(lifestyle.sleep_time)
-        
-        # 日の開始時間（4:00）を考慮した就寝時間の補正
-        # 就寝時間が4:00より前（例: 0:00, 1:00など）の場合は翌日として扱う
-        day_start_hour = 4
-        if sleep.hour < day_start_hour:
-            sleep = sleep + timedelta(days=1)
-        
-        schedule = []
-        time_cursor = current_time
-        
-        for task in tasks:
-            task_end = time_cursor + timedelta(minutes=task.duration + task.break_duration)
-            
-            if time_cursor < lunch <= task_end:
-                schedule.append({
-                    "type": "meal", "name": "🍴 昼食",
-                    "start": lunch, "duration": lifestyle.meal_duration
-                })
-                time_cursor = lunch + timedelta(minutes=lifestyle.meal_duration)
-            
-            if time_cursor < dinner <= task_end:
-                schedule.append({
-                    "type": "meal", "name": "🍴 夕食",
-                    "start": dinner, "duration": lifestyle.meal_duration
-                })
-                time_cursor = dinner + timedelta(minutes=lifestyle.meal_duration)
-            
-            if time_cursor < bath <= task_end:
-                schedule.append({
-                    "type": "bath", "name": "🛁 入浴",
-                    "start": bath, "duration": lifestyle.bath_duration
-                })
-                time_cursor = bath + timedelta(minutes=lifestyle.bath_duration)
-            
-            schedule.append({
-                "type": "task", "name": f"📝 {task.title}",
-                "start": time_cursor, "duration": task.duration,
-                "break_duration": task.break_duration
-            })
-            time_cursor += timedelta(minutes=task.duration + task.break_duration)
-        
-        self.estimated_end_time = time_cursor
+        self.estimated_end_time = timeline.estimated_end(schedule, current_time)
         
         for item in schedule:
-            start_str = item["start"].strftime("%H:%M")
-            end_time = item["start"] + timedelta(minutes=item["duration"])
-            if item["type"] == "task" and item.get("break_duration", 0) > 0:
-                end_time += timedelta(minutes=item["break_duration"])
-            end_str = end_time.strftime("%H:%M")
+            start_str = item.start.strftime("%H:%M")
+            end_str = item.end.strftime("%H:%M")
             
-            if item["type"] == "meal":
+            if item.type == "meal":
                 color = "#ffeb3b"
-            elif item["type"] == "bath":
+            elif item.type == "bath":
                 color = "#64b5f6"
             else:
                 color = "#ffffff"
             
             row = ft.Row([
                 ft.Text(f"{start_str}", size=12, width=50, color="#9e9e9e"),
-                ft.Text(item["name"], size=14, color=color, expand=True),
+                ft.Text(item.name, size=14, color=color, expand=True),
                 ft.Text(f"~{end_str}", size=12, color="#9e9e9e"),
             ])
             self.schedule_column.controls.append(row)
@@ -425,6 +424,9 @@ class TimerView(ft.Column):
         self._build()
         self._page.update()
         
+        # 生活時間通知を予約（以降のtickではDBを読まない）
+        self._schedule_lifestyle_notifications()
+        
         # プレイリスト連続タイマー開始
         self._page.run_task(self.timer.start_playlist, tasks)
     
@@ -537,6 +539,10 @@ class TimerView(ft.Column):
     
     def stop_timer(self, e):
         """タイマー停止"""
+        # 作業途中のタスクは in_progress のまま残さず未着手に戻す
+        task = self.timer.current_task
+        if task and task.id > 0 and self.timer.current_task_index not in self.timer._completed_indices:
+            self.db.update_task_status(task.id, "pending")
         self.timer.stop()
         self._exit_focus_mode()
         self.status_text.value = "中止しました"
@@ -544,6 +550,8 @@ class TimerView(ft.Column):
     
     def _exit_focus_mode(self):
         """集中モードを終了"""
+        self._cancel_lifestyle_notifications()
+        self._report_update_stats()
         self.is_focus_mode = False
         self.stop_warning_count = 0
         
@@ -564,35 +572,51 @@ class TimerView(ft.Column):
         self.start_button.disabled = False
         self.playlist_dropdown.disabled = False
     
-    def _check_lifestyle_notifications(self):
-        """生活時間通知をチェック"""
+    def _schedule_lifestyle_notifications(self):
+        """生活設定から通知時刻を前計算して予約"""
+        self._cancel_lifestyle_notifications()
         lifestyle = self.db.get_lifestyle_settings()
-        now = datetime.now()
-        
-        def parse_time(time_str):
-            t = datetime.strptime(time_str, "%H:%M")
-            return now.replace(hour=t.hour, minute=t.minute, second=0, microsecond=0)
-        
-        events = [
-            (parse_time(lifestyle.lunch_time), "🍴 昼食の時間が近づいています！"),
-            (parse_time(lifestyle.dinner_time), "🍴 夕食の時間が近づいています！"),
-            (parse_time(lifestyle.bath_time), "🛁 入浴の時間が近づいています！"),
-            (parse_time(lifestyle.sleep_time), "😴 就寝の時間が近づいています！"),
-        ]
-        
-        for event_time, message in events:
-            time_until = (event_time - now).total_seconds() / 60
-            if 0 < time_until <= 5:
-                self.notification_text.value = message
-                return
-        
-        self.notification_text.value = ""
+        self.notifier = LifestyleNotifier(lifestyle, on_change=self._on_lifestyle_notification)
+        self._page.run_task(self.notifier.start)
+    
+    def _cancel_lifestyle_notifications(self):
+        """予約済みの生活時間通知を取り消す"""
+        if self.notifier:
+            self.notifier.cancel()
+            self.notifier = None
+    
+    def _on_lifestyle_notification(self, message: str):
+        """生活時間通知の表示切り替え（予約時刻に呼ばれる）"""
+        self.notification_text.value = message
+        self._page.update()
     
     def on_timer_tick(self, remaining_seconds: int, is_break: bool):
-        """タイマー更新コールバック"""
+        """タイマー更新コールバック（変化したコントロールだけを送る）"""
+        if not self.refresh_policy.should_refresh(remaining_seconds):
+            self.update_meter.skip()
+            return
+        self._refresh_timer_display()
+    
+    def _refresh_timer_display(self):
+        """残り時間の表示だけを更新"""
         self.timer_display.value = self.timer.get_formatted_time()
-        self._check_lifestyle_notifications()
-        self._page.update()
+        if self.TARGETED_TICK_UPDATES:
+            with self.update_meter.measure("targeted"):
+                self._page.update(self.timer_display)
+        else:
+            with self.update_meter.measure("full_page"):
+                self._page.update()
+    
+    def on_window_event(self, e):
+        """ウィンドウのフォーカス・最小化に合わせて更新頻度を切り替える（main.pyから呼ばれる）"""
+        if self.refresh_policy.on_window_event(e.data) and self.is_focus_mode:
+            # 前面に戻ったら間引いていた分をすぐに反映
+            self._refresh_timer_display()
+    
+    def _report_update_stats(self):
+        """セッション中の画面更新の計測結果を残して計測をリセット"""
+        self.last_update_stats = self.update_meter.summary()
+        self.update_meter.reset()
     
     def on_task_start(self, task: Task):
         """タスク開始コールバック"""
@@ -0,0 +1,84 @@
+"""
+Database のテスト（プレイリストの重複防止・冪等キーの予約・スキーマ作成の排他）
+"""
+import multiprocessing
+import sqlite3
+
+import pytest
+
+from moon_tasker.database import Database
+from moon_tasker.models import Playlist, Task
+
+
+@pytest.fixture
+def db(tmp_path):
+    return Database(str(tmp_path / "moon.db"))
+
+
+def playlist_rows(db, playlist_id):
+    conn = sqlite3.connect(db.db_path)
+    rows = conn.execute("SELECT task_id, order_index FROM playlist_tasks WHERE playlist_id = ? ORDER BY id",
+                        (playlist_id,)).fetchall()
+    conn.close()
+    return rows
+
+
+def test_task_is_added_to_playlist_once(db):
+    playlist_id = db.create_playlist(Playlist(name="朝"))
+    first, second = db.create_task(Task(title="a")), db.create_task(Task(title="b"))
+    assert db.add_task_to_playlist(playlist_id, first)
+    assert not db.add_task_to_playlist(playlist_id, first)
+    assert db.add_task_to_playlist(playlist_id, second)
+    assert playlist_rows(db, playlist_id) == [(first, 0), (second, 1)]
+
+
+def test_migration_removes_existing_duplicates(db):
+    playlist_id = db.create_playlist(Playlist(name="朝"))
+    task_id = db.create_task(Task(title="a"))
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("DROP INDEX idx_playlist_tasks_unique")
+    conn.executemany("INSERT INTO playlist_tasks (playlist_id, task_id, order_index) VALUES (?, ?, ?)",
+                     [(playlist_id, task_id, 0), (playlist_id, task_id, 1)])
+    conn.commit()
+    conn.close()
+
+    db.init_database()
+    assert playlist_rows(db, playlist_id) == [(task_id, 0)]
+    assert not db.add_task_to_playlist(playlist_id, task_id)
+
+
+def test_stale_idempotency_reservation_can_be_taken_over(db):
+    assert db.reserve_idempotency_key("guest:a", "k", "/timer/complete", now=100.0)
+    # 処理中の予約は取れない
+    assert not db.reserve_idempotency_key("guest:a", "k", "/timer/complete", now=110.0, stale_before=50.0)
+    # 応答が保存されないまま時間が過ぎた予約は取り直せる
+    assert db.reserve_idempotency_key("guest:a", "k", "/timer/complete", now=200.0, stale_before=140.0)
+    # 応答が保存済みなら取り直さない
+    db.save_idempotent_response("guest:a", "k", 200, "{}", b"ok")
+    assert not db.reserve_idempotency_key("guest:a", "k", "/timer/complete", now=900.0, stale_before=800.0)
+
+
+def _open_database(path, barrier, results):
+    barrier.wait()
+    try:
+        Database(path)
+        results.put(None)
+    except Exception as e:
+        results.put(repr(e))
+
+
+def test_processes_initialize_the_same_file_one_at_a_time(tmp_path, capfd):
+    # preloadなしの複数ワーカーが同時に新しいDBを開く
+    path = str(tmp_path / "moon.db")
+    workers = 6
+    barrier, results = multiprocessing.Barrier(workers), multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_open_database, args=(path, barrier, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    errors = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join()
+
+    assert errors == [None] * workers
+    assert "Migration error" not in capfd.readouterr().out
@@ -0,0 +1,30 @@
+"""
+月齢カレンダーのテスト（月相表の範囲外は平均周期で近似し、表を広げない）
+"""
+import time
+from datetime import date
+
+import pytest
+
+from moon_tasker.logic import lunation_table
+from moon_tasker.logic.moon_cycle import MoonCycleCalculator
+
+
+@pytest.mark.parametrize("year", [1850, 2400])
+def test_out_of_table_range_uses_mean_cycle(year):
+    table = lunation_table.get_lunation_table()
+    calc = MoonCycleCalculator()
+    t0 = time.perf_counter()
+    calendar = calc.get_phase_calendar(date(year, 1, 1), date(year, 1, 31))
+    assert time.perf_counter() - t0 < 1.0
+    rows = calendar.to_rows()
+    assert len(rows) == 31
+    assert all(0.0 <= row["phase"] < 1.0 for row in rows)
+    assert lunation_table.get_lunation_table() is table  # 表は広げない
+
+
+def test_in_range_matches_table():
+    calc = MoonCycleCalculator()
+    rows = calc.get_phase_calendar(date(2026, 1, 1), date(2026, 1, 31)).to_rows()
+    assert len(rows) == 31
+    assert sum(row["is_full_moon"] for row in rows) >= 1
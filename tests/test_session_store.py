@@ -0,0 +1,80 @@
+"""
+DatabaseSessionInterface のテスト（ログイン時のID付け替え・新しいセッションの期限）
+"""
+import sqlite3
+import time
+
+import pytest
+from flask import Flask, session
+
+from moon_tasker.database import Database
+from moon_tasker.logic.session_store import DatabaseSessionInterface
+
+NEW_SESSION_TTL = 60
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "moon.db")
+    Database(path)
+    return path
+
+
+@pytest.fixture
+def client(db_path):
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.session_interface = DatabaseSessionInterface(lambda: Database(db_path), new_session_ttl=NEW_SESSION_TTL)
+
+    @app.route("/guest")
+    def guest():
+        session.setdefault("guest_id", "g1")
+        return session["guest_id"]
+
+    @app.route("/login")
+    def login():
+        session.regenerate()
+        session["user_id"] = "u1"
+        return "ok"
+
+    @app.route("/whoami")
+    def whoami():
+        return session.get("user_id") or "-"
+
+    return app.test_client()
+
+
+def session_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = dict(conn.execute("SELECT id, expires_at FROM web_sessions").fetchall())
+    conn.close()
+    return rows
+
+
+def sid_of(client):
+    return client.get_cookie("session").value
+
+
+def test_new_session_is_kept_briefly_until_the_cookie_comes_back(client, db_path):
+    client.get("/guest")
+    sid = sid_of(client)
+    assert session_rows(db_path)[sid] <= time.time() + NEW_SESSION_TTL
+
+    client.get("/guest")
+    assert session_rows(db_path)[sid] > time.time() + 24 * 3600
+
+
+def test_login_regenerates_session_id(client, db_path):
+    client.get("/guest")
+    client.get("/guest")
+    old_sid = sid_of(client)
+
+    client.get("/login")
+    new_sid = sid_of(client)
+    assert new_sid != old_sid
+    assert set(session_rows(db_path)) == {new_sid}
+    assert client.get("/whoami").text == "u1"
+
+    # 固定化された古いIDではログイン状態にならない
+    client.set_cookie("session", old_sid)
+    assert client.get("/whoami").text == "-"
@@ -0,0 +1,36 @@
+"""DailyTimeline の投影（生活時間のブロックを避ける）"""
+from datetime import datetime
+
+from moon_tasker.logic.timeline import DailyTimeline
+from moon_tasker.models import LifestyleSettings, Task
+
+
+def _task_entry(entries):
+    return next(e for e in entries if e.type == "task")
+
+
+def test_task_starting_inside_lunch_moves_after_it():
+    timeline = DailyTimeline(LifestyleSettings(lunch_time="12:00", meal_duration=30))
+    entries = timeline.project([Task(title="a", duration=25)], datetime(2026, 1, 10, 12, 10))
+
+    task = _task_entry(entries)
+    assert task.start == datetime(2026, 1, 10, 12, 30)
+    assert entries[0].name == "🍴 昼食"
+
+
+def test_bath_wrapping_past_day_start_is_avoided():
+    # 03:30から60分の入浴は4:00（論理日の境目）をまたいで04:30まで
+    lifestyle = LifestyleSettings(bath_time="03:30", bath_duration=60)
+    timeline = DailyTimeline(lifestyle)
+
+    for start in (datetime(2026, 1, 10, 3, 40), datetime(2026, 1, 10, 4, 10), datetime(2026, 1, 10, 3, 20)):
+        task = _task_entry(timeline.project([Task(title="a", duration=25)], start))
+        assert task.start == datetime(2026, 1, 10, 4, 30), start
+
+
+def test_task_before_block_is_not_moved():
+    timeline = DailyTimeline(LifestyleSettings(lunch_time="12:00", meal_duration=30))
+    entries = timeline.project([Task(title="a", duration=25)], datetime(2026, 1, 10, 11, 0))
+
+    assert [e.type for e in entries] == ["task"]
+    assert entries[0].start == datetime(2026, 1, 10, 11, 0)
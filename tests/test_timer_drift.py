@@ -0,0 +1,28 @@
+"""
+TimerController のずれ（ドリフト）のテスト
+
+benchmarks.timer_drift の仮想時計（sleepが遅れて戻る・tick処理に時間がかかる）で
+1時間のカウントダウンを動かし、完了時刻のずれが100ms未満であることを確認する。
+"""
+import asyncio
+
+import pytest
+
+from benchmarks.timer_drift import measure_controller, measure_legacy
+
+ONE_HOUR = 3600
+MAX_DRIFT_S = 0.1
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2, 3, 4])
+def test_one_hour_countdown_drifts_less_than_100ms(seed):
+    result = asyncio.run(measure_controller(ONE_HOUR, seed))
+    assert abs(result["drift_s"]) < MAX_DRIFT_S
+    # 画面更新は1秒に1回程度（遅れを取り戻すために tick を飛ばしすぎない）
+    assert ONE_HOUR * 0.9 <= result["ticks"] <= ONE_HOUR + 1
+
+
+def test_simulated_clock_makes_sleep_based_countdown_drift():
+    # 仮想時計が実際に遅延を起こしていること（従来方式では大きくずれる）
+    result = asyncio.run(measure_legacy(ONE_HOUR, 0))
+    assert result["drift_s"] > 10 * MAX_DRIFT_S
@@ -0,0 +1,127 @@
+"""
+TimerJournal.recover() と TimerController.restore() のテスト
+
+書きかけの最後の行・スナップショットと続きのレコードの読み直し、
+benchmarks.timer_journal_recovery のクラッシュ再現で各タスクの完了が1回ずつ
+記録されることを確認する。
+"""
+import asyncio
+import json
+import os
+
+import pytest
+
+from benchmarks.timer_journal_recovery import make_tasks, run_once
+from moon_tasker.logic.timer_journal import TASK_FIELDS, TimerJournal
+from moon_tasker.logic.timer_logic import TimerController
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def start_record(journal: TimerJournal):
+    tasks = [{k: getattr(t, k) for k in TASK_FIELDS} for t in make_tasks()]
+    journal.record("start", durable=True, playlist=True, tasks=tasks)
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "timer.journal")
+    journal = TimerJournal(path, clock=clock)
+    start_record(journal)
+    journal.record("task", index=0, deadline=clock.now + 1500)
+    journal.record("complete", durable=True, index=0)
+    journal.record("break", index=0, deadline=clock.now + 1800)
+    journal.flush()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"op":"pau')
+
+    state = TimerJournal(path, clock=clock).recover()
+    assert state.active and state.is_break and not state.paused
+    assert state.task_index == 0
+    assert state.completed == [0]
+    assert state.deadline == clock.now + 1800
+
+
+def test_snapshot_and_tail_are_replayed(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "timer.journal")
+    journal = TimerJournal(path, snapshot_every=3, clock=clock)
+    start_record(journal)
+    journal.record("task", index=0, deadline=clock.now + 1500)
+    journal.record("complete", durable=True, index=0)  # 3件目でスナップショット
+    assert os.path.exists(journal.snapshot_path)
+    assert os.path.getsize(path) == 0
+
+    clock.now += 1500
+    journal.record("break", index=0, deadline=clock.now + 300)
+    clock.now += 60
+    journal.record("pause", durable=True, remaining=240.0)
+
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["op"] for line in f] == ["break", "pause"]
+    state = TimerJournal(path, clock=clock).recover()
+    assert state.__dict__ == journal.state.__dict__
+    assert state.paused and state.remaining == 240.0 and state.completed == [0]
+
+
+def test_restore_resumes_from_the_recorded_deadline(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "timer.journal")
+    journal = TimerJournal(path, clock=clock)
+    start_record(journal)
+    journal.record("task", durable=True, index=1, deadline=clock.now + 600)
+
+    clock.now += 100  # 停止していた時間も締め切りに向かって進む
+    recovered = TimerJournal(path, clock=clock)
+    timer = TimerController(journal=recovered)
+    assert timer.restore(recovered.recover())
+    assert timer.current_task_index == 1 and not timer.is_break
+    assert timer.is_running
+    assert timer.remaining_seconds == 500
+
+    # 停止中に締め切りを過ぎていれば残り0秒
+    clock.now += 1000
+    assert timer.restore(recovered.recover())
+    assert timer.remaining_seconds == 0
+
+
+def test_restore_keeps_a_paused_timer_paused(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "timer.journal")
+    journal = TimerJournal(path, clock=clock)
+    start_record(journal)
+    journal.record("task", index=0, deadline=clock.now + 1500)
+    journal.record("pause", durable=True, remaining=0.2)
+
+    recovered = TimerJournal(path, clock=clock)
+    timer = TimerController(journal=recovered)
+    assert timer.restore(recovered.recover())
+    assert not timer.is_running
+    assert timer.remaining_seconds == 1
+
+
+def test_finished_playlist_is_not_restored(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "timer.journal")
+    journal = TimerJournal(path, clock=clock)
+    start_record(journal)
+    journal.record("end")
+
+    recovered = TimerJournal(path, clock=clock)
+    assert not TimerController(journal=recovered).restore(recovered.recover())
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_each_task_is_credited_exactly_once_after_a_crash(tmp_path, seed):
+    result = asyncio.run(run_once(str(tmp_path), seed, downtime=30.0))
+    assert result["restored"]
+    assert result["exactly_once"]
+    if result["same_phase"]:
+        # 締め切りを記録しているので、停止していた時間以外の進捗は失わない
+        assert result["lost_s"] == pytest.approx(0.0, abs=1e-3)
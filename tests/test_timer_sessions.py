@@ -0,0 +1,166 @@
+"""
+TimerSessionManager のテスト（完了の記録権と記録が同じトランザクションで行われること、
+1件ずつの完了とまとめた完了が同じようにサイクル・生命体に反映されること）
+"""
+import sqlite3
+
+import pytest
+
+from moon_tasker.database import Database
+from moon_tasker.logic.event_bus import EventBus
+from moon_tasker.logic.timer_sessions import TimerSessionManager
+from moon_tasker.models import MoonCycle, Task, TaskCompletion
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def setup(tmp_path):
+    db = Database(str(tmp_path / "timer.db"))
+    task = Task(title="集中", duration=1, break_duration=0)
+    task.id = task_id = db.create_task(task)
+    clock = FakeClock()
+    bus = EventBus()
+    manager = TimerSessionManager(lambda: db, bus, clock=clock)
+    credits = []
+
+    def on_credit_due(event_type, payload):
+        if db.complete_task(payload["task_id"], timer_credit=(payload["session_id"], payload["index"])):
+            credits.append(payload["task_id"])
+
+    bus.subscribe("timer.credit_due", on_credit_due)
+    timer_session = manager.create("guest:a", [task])
+    return db, manager, clock, timer_session, task, credits
+
+
+def completed_count(db, task_id):
+    conn = db.get_connection()
+    count = conn.execute("SELECT COUNT(*) FROM activity_log WHERE task_id = ? AND action = 'completed'",
+                         (task_id,)).fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_failed_client_record_is_credited_by_server(setup, monkeypatch):
+    db, manager, clock, timer_session, task, credits = setup
+    task_id = task.id
+    clock.now += 60
+    manager.tick(clock.now)
+    outcome, index, _ = manager.verify_task("guest:a", timer_session.id, task_id)
+    assert outcome == "ready"
+
+    # クライアントの報告の記録が失敗しても記録権は消費されない
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("""CREATE TRIGGER fail_log BEFORE INSERT ON activity_log
+                    BEGIN SELECT RAISE(ABORT, 'disk I/O error'); END""")
+    conn.commit()
+    with pytest.raises(sqlite3.DatabaseError):
+        db.complete_task(task_id, timer_credit=(timer_session.id, index))
+    conn.execute("DROP TRIGGER fail_log")
+    conn.commit()
+    conn.close()
+    assert db.get_timer_session(timer_session.id).credited == 0
+
+    # 猶予後にサーバー側で記録される
+    clock.now += manager.CREDIT_GRACE_SECONDS + 1
+    manager.tick(clock.now)
+    assert credits == [task_id]
+    assert completed_count(db, task_id) == 1
+
+
+def test_client_and_server_record_only_once(setup):
+    db, manager, clock, timer_session, task, credits = setup
+    task_id = task.id
+    clock.now += 60
+    manager.tick(clock.now)
+    _, index, _ = manager.verify_task("guest:a", timer_session.id, task_id)
+    assert db.complete_task(task_id, timer_credit=(timer_session.id, index))
+    assert not db.complete_task(task_id, timer_credit=(timer_session.id, index))
+
+    clock.now += manager.CREDIT_GRACE_SECONDS + 1
+    manager.tick(clock.now)
+    assert credits == []
+    assert completed_count(db, task_id) == 1
+    assert manager.verify_task("guest:a", timer_session.id, task_id)[0] == "recorded"
+
+
+def test_batch_takes_credit_with_its_transaction(setup):
+    db, manager, clock, timer_session, task, credits = setup
+    clock.now += 60
+    manager.tick(clock.now)
+    _, index, _ = manager.verify_task("guest:a", timer_session.id, task.id)
+    completion = TaskCompletion(task_id=task.id, duration=1, timer_credit=(timer_session.id, index))
+
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("""CREATE TRIGGER fail_log BEFORE INSERT ON activity_log
+                    BEGIN SELECT RAISE(ABORT, 'disk I/O error'); END""")
+    conn.commit()
+    with pytest.raises(sqlite3.DatabaseError):
+        db.complete_tasks_batch([completion])
+    conn.execute("DROP TRIGGER fail_log")
+    conn.commit()
+    conn.close()
+    assert db.get_timer_session(timer_session.id).credited == 0
+
+    # 同じタスクの報告が2件あっても1件だけ記録する
+    applied = db.complete_tasks_batch([completion, completion])
+    assert [a["task_id"] for a in applied] == [task.id]
+    assert completed_count(db, task.id) == 1
+
+
+def test_purge_removes_finished_sessions_only(setup):
+    db, manager, clock, timer_session, task, credits = setup
+    task_id = task.id
+    running = manager.create("guest:b", [task])
+    manager.abort("guest:a", timer_session.id)
+    assert manager.purge(clock.now + manager.FINISHED_TTL_SECONDS + 1) == 1
+    assert db.get_timer_session(timer_session.id) is None
+    assert db.get_timer_session(running.id) is not None
+
+
+def test_single_and_batch_completions_advance_the_cycle_alike(tmp_path):
+    db = Database(str(tmp_path / "cycle.db"))
+    cycle_id = db.create_moon_cycle(MoonCycle(cycle_start="2026-10-01", cycle_end="2026-10-29",
+                                              target_task_count=2))
+    first, second = db.create_task(Task(title="a")), db.create_task(Task(title="b"))
+    db.add_task_to_cycle(cycle_id, first)
+    db.add_task_to_cycle(cycle_id, second)
+
+    assert db.complete_task(first)["cycle_id"] == cycle_id
+    applied = db.complete_tasks_batch([TaskCompletion(task_id=second, idempotency_key="k2")])
+    assert applied[0]["cycle_id"] == cycle_id
+    assert db.get_active_moon_cycle().completed_task_count == 2
+
+    # 完了済みのタスクをもう一度完了してもサイクルは進まない
+    assert db.complete_task(first)["cycle_id"] is None
+    assert db.get_active_moon_cycle().completed_task_count == 2
+
+
+def test_batch_creature_update_sees_only_applied_completions(setup):
+    db, manager, clock, timer_session, task, credits = setup
+    clock.now += 60
+    manager.tick(clock.now)
+    _, index, _ = manager.verify_task("guest:a", timer_session.id, task.id)
+    credited = TaskCompletion(task_id=task.id, duration=1, idempotency_key="a",
+                              timer_credit=(timer_session.id, index))
+    other = TaskCompletion(task_id=-1, duration=5, idempotency_key="b")
+    seen = []
+
+    def update_creature(applied):
+        seen.append([c.idempotency_key for c in applied])
+        return None
+
+    # 記録権を取られた完了・記録済みのキーは渡さない
+    assert db.complete_task(task.id, timer_credit=(timer_session.id, index))
+    db.complete_tasks_batch([credited, other], update_creature)
+    assert seen == [["b"]]
+
+    # 1件も記録しなければ呼ばない
+    db.complete_tasks_batch([other], update_creature)
+    assert seen == [["b"]]